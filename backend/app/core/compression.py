@@ -0,0 +1,257 @@
+"""
+Response compression negotiated from Accept-Encoding: zstd, br or gzip.
+
+The encoding is the one the client weights highest (q-values). Ties go to
+COMPRESSION_ENCODINGS order, limited to those whose library is installed.
+Only textual types are compressed: JSON, NDJSON exports, text and XML.
+Responses smaller than COMPRESSION_MIN_SIZE go out as-is. Responses that
+are ranged or already encoded (Accept-Ranges, Content-Range,
+Content-Encoding) are left alone, so byte ranges of file downloads stay
+valid.
+
+Streamed bodies (NDJSON/JSON exports) are compressed chunk by chunk and
+flushed after each one, so clients can decode rows as they arrive.
+"""
+
+import threading
+import zlib
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import (
+    COMPRESSION_ENABLED,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_ZSTD_LEVEL,
+)
+
+_COMPRESSIBLE = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+# Representation-specific headers: any of these means the body must pass through untouched
+_SKIP_HEADERS = {b"content-encoding", b"content-range", b"accept-ranges"}
+
+
+# ---------------- encoders ----------------
+class _Gzip:
+    def __init__(self):
+        self._c = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        import brotli
+
+        self._c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.process(data) + self._c.flush()
+
+    def finish(self) -> bytes:
+        return self._c.finish()
+
+
+class _Zstd:
+    def __init__(self):
+        import zstandard
+
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._c = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data) + self._c.flush(self._flush_block)
+
+    def finish(self) -> bytes:
+        return self._c.flush()
+
+
+def _installed(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+_ENCODERS: Dict[str, Callable] = {"gzip": _Gzip}
+if _installed("brotli"):
+    _ENCODERS["br"] = _Brotli
+if _installed("zstandard"):
+    _ENCODERS["zstd"] = _Zstd
+
+# Server preference among what is available
+_PREFERENCE: List[str] = [e for e in COMPRESSION_ENCODINGS if e in _ENCODERS]
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for an Accept-Encoding value, or None for identity."""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding.strip()] = q
+
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in _PREFERENCE:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compressible(content_type: str) -> bool:
+    media = content_type.split(";", 1)[0].strip().lower()
+    return media.startswith("text/") or media in _COMPRESSIBLE or media.endswith(("+json", "+xml"))
+
+
+# ---------------- stats ----------------
+_stats = {"responses": 0, "bytes_in": 0, "bytes_out": 0}
+_stats_lock = threading.Lock()
+
+
+def _record(bytes_in: int, bytes_out: int) -> None:
+    with _stats_lock:
+        _stats["responses"] += 1
+        _stats["bytes_in"] += bytes_in
+        _stats["bytes_out"] += bytes_out
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+# ---------------- middleware ----------------
+class CompressionMiddleware:
+    """Pure ASGI, so streamed responses stay streamed; added by app/main.py."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        accept = b""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value
+                break
+        encoding = negotiate(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await self.app(scope, receive, _Responder(send, encoding, self.minimum_size).send)
+
+
+class _Responder:
+    def __init__(self, send, encoding: str, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start: Optional[dict] = None
+        # None until the first body chunk decides: True compresses, False passes through
+        self.active: Optional[bool] = None
+        self.encoder = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def send(self, message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            if not self._eligible(message):
+                self.active = False
+                await self._send(message)
+            return
+        if message["type"] != "http.response.body" or self.active is False:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.active is None:
+            if not more_body and len(body) < self.minimum_size:
+                self.active = False
+                await self._send(self._headers(self.start))
+                await self._send(message)
+                return
+            self.active = True
+            self.encoder = _ENCODERS[self.encoding]()
+            start = self._headers(self.start, encoded=True)
+            if not more_body:
+                # Whole body in one message: compress it and keep a Content-Length
+                data = self.encoder.compress(body) + self.encoder.finish()
+                start["headers"].append((b"content-length", str(len(data)).encode()))
+                _record(len(body), len(data))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": data})
+                return
+            await self._send(start)
+
+        data = self.encoder.compress(body) if body else b""
+        if not more_body:
+            data += self.encoder.finish()
+        self.bytes_in += len(body)
+        self.bytes_out += len(data)
+        if not more_body:
+            _record(self.bytes_in, self.bytes_out)
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def _eligible(self, start: dict) -> bool:
+        if start["status"] < 200 or start["status"] in (204, 206, 304):
+            return False
+        content_type = b""
+        for name, value in start.get("headers", []):
+            name = name.lower()
+            if name in _SKIP_HEADERS:
+                return False
+            if name == b"content-type":
+                content_type = value
+        return _compressible(content_type.decode("latin-1"))
+
+    def _headers(self, start: dict, encoded: bool = False) -> dict:
+        """The start message with Vary set and, when `encoded`, Content-Encoding."""
+        headers = []
+        vary = []
+        for name, value in start.get("headers", []):
+            lower = name.lower()
+            if lower == b"vary":
+                vary.append(value)
+                continue
+            if encoded and lower == b"content-length":
+                continue
+            if encoded and lower == b"etag" and not value.startswith(b"W/"):
+                # The compressed body is another representation of the same resource
+                value = b"W/" + value
+            headers.append((name, value))
+        if not any(b"accept-encoding" in v.lower() for v in vary):
+            vary.append(b"Accept-Encoding")
+        headers.append((b"vary", b", ".join(vary)))
+        if encoded:
+            headers.append((b"content-encoding", self.encoding.encode()))
+        return {**start, "headers": headers}
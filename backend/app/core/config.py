@@ -9,7 +9,213 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# ---------------- STORAGE ----------------
+# "supabase" or "local" (filesystem under LOCAL_STORAGE_ROOT, no network needed)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "./storage_data")
+# Base URL clients use to reach this API; local signed URLs point back at it.
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "http://localhost:8000").rstrip("/")
+
 # ---------------- SUPABASE ----------------
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET")
+
+# ---------------- SIGNED URLS ----------------
+# Lifetime of signed URLs handed to clients, in seconds.
+SIGNED_URL_EXPIRES = int(os.getenv("SIGNED_URL_EXPIRES", "3600"))
+# Cached URLs are re-signed this many seconds before they expire so clients
+# never receive a URL that is about to stop working.
+SIGNED_URL_REFRESH_MARGIN = int(os.getenv("SIGNED_URL_REFRESH_MARGIN", "300"))
+SIGNED_URL_CACHE_SIZE = int(os.getenv("SIGNED_URL_CACHE_SIZE", "50000"))
+# Maximum number of paths signed in a single bulk storage request.
+SIGNED_URL_BATCH_SIZE = int(os.getenv("SIGNED_URL_BATCH_SIZE", "500"))
+
+# ---------------- PAGINATION ----------------
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+# Rows fetched per keyset query while streaming an export.
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "1000"))
+
+# ---------------- UPLOADS ----------------
+# Supabase's TUS endpoint requires 6 MB chunks (only the last one may be smaller);
+# this also bounds the memory an upload holds per request.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(6 * 1024 * 1024)))
+# Resumable upload sessions that see no activity for this long are abandoned.
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+# Seconds between sweeps that remove abandoned sessions and their staged bytes,
+# and how many sessions each sweep transaction takes.
+UPLOAD_CLEANUP_INTERVAL = int(os.getenv("UPLOAD_CLEANUP_INTERVAL", "3600"))
+UPLOAD_CLEANUP_BATCH_SIZE = int(os.getenv("UPLOAD_CLEANUP_BATCH_SIZE", "500"))
+
+# ---------------- STORAGE HTTP CLIENT ----------------
+STORAGE_HTTP2 = os.getenv("STORAGE_HTTP2", "true").lower() in ("1", "true", "yes")
+STORAGE_MAX_CONNECTIONS = int(os.getenv("STORAGE_MAX_CONNECTIONS", "200"))
+STORAGE_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("STORAGE_MAX_KEEPALIVE_CONNECTIONS", "50"))
+STORAGE_KEEPALIVE_EXPIRY = float(os.getenv("STORAGE_KEEPALIVE_EXPIRY", "30"))
+STORAGE_CONNECT_TIMEOUT = float(os.getenv("STORAGE_CONNECT_TIMEOUT", "5"))
+STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", "30"))
+# Chunk uploads move up to UPLOAD_CHUNK_SIZE bytes per call and get more time.
+STORAGE_UPLOAD_TIMEOUT = float(os.getenv("STORAGE_UPLOAD_TIMEOUT", "120"))
+STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", "3"))
+# Base delay in seconds for exponential backoff between retries.
+STORAGE_RETRY_BACKOFF = float(os.getenv("STORAGE_RETRY_BACKOFF", "0.2"))
+
+# ---------------- DEDUPLICATION ----------------
+# Let POST /files/dedup match content uploaded by other users. Off by default:
+# with it on, knowing a file's SHA-256 is enough to get a copy of it.
+DEDUP_CROSS_USER_CLAIM = os.getenv("DEDUP_CROSS_USER_CLAIM", "false").lower() in ("1", "true", "yes")
+
+# ---------------- USER CACHE ----------------
+# Resolved users are cached by id so authenticated requests skip the users
+# query. Entries live at most USER_CACHE_TTL seconds; updates and deletes made
+# through the ORM invalidate them immediately.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Share the cache between workers through Redis (needs the `redis` package).
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL")
+
+# ---------------- DATABASE POOL ----------------
+# Connections kept open per process, and extra ones allowed under bursts.
+# DB_POOL_SIZE=0 disables pooling in the app (NullPool), e.g. when PgBouncer
+# already pools connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Seconds a request waits for a free connection before failing.
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections older than this (seconds) are replaced; keep below server/LB idle timeouts.
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Server-side statement timeout in milliseconds (0 = none).
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# PgBouncer in transaction mode rejects startup options and drops session
+# state between transactions, so the statement timeout is set per transaction.
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+# ---------------- ASYNC DATABASE ----------------
+# Serve the hot routes (listings, search, file actions, folders, shares, auth)
+# from async versions backed by an AsyncSession, so concurrency is bounded by
+# the database pool instead of the threadpool. Needs asyncpg (PostgreSQL) or
+# aiosqlite (SQLite).
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# ---------------- BULK OPERATIONS ----------------
+# Maximum number of files one POST /files/bulk request may touch.
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+
+# ---------------- BACKGROUND JOBS ----------------
+# Worker tasks per process running deferred work (storage cleanup, thumbnails, ...).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# Retry delay is JOB_RETRY_BACKOFF * 2^(attempt-1) seconds with jitter, capped.
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "2"))
+JOB_RETRY_BACKOFF_MAX = float(os.getenv("JOB_RETRY_BACKOFF_MAX", "300"))
+# Keep jobs in the jobs table so they survive restarts and are shared between
+# workers; otherwise they live in an in-process queue.
+JOB_DURABLE = os.getenv("JOB_DURABLE", "false").lower() in ("1", "true", "yes")
+# Durable mode: how often idle workers poll, and how long a claimed job may
+# run before another worker assumes its worker died and retries it.
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+# In-process mode: statuses of this many recent jobs are kept for GET /jobs/{id}.
+JOB_STATUS_RETENTION = int(os.getenv("JOB_STATUS_RETENTION", "10000"))
+# Seconds between sweeps for unreferenced blobs left behind by failed purges.
+BLOB_CLEANUP_INTERVAL = int(os.getenv("BLOB_CLEANUP_INTERVAL", "3600"))
+
+# ---------------- TRASH ----------------
+# Files stay in the trash this many days before they are permanently deleted.
+TRASH_RETENTION_DAYS = int(os.getenv("TRASH_RETENTION_DAYS", "30"))
+TRASH_PURGE_INTERVAL = int(os.getenv("TRASH_PURGE_INTERVAL", "3600"))
+# Rows per purge transaction; keeps row locks short and storage deletes bulk.
+TRASH_PURGE_BATCH_SIZE = int(os.getenv("TRASH_PURGE_BATCH_SIZE", "500"))
+# Pause between batches (seconds) so a large backlog does not crowd out requests.
+TRASH_PURGE_BATCH_PAUSE = float(os.getenv("TRASH_PURGE_BATCH_PAUSE", "0.05"))
+
+# ---------------- DOWNLOADS ----------------
+# Requests asking for more byte ranges than this (after merging overlaps) get
+# the whole object instead of a multipart response.
+DOWNLOAD_MAX_RANGES = int(os.getenv("DOWNLOAD_MAX_RANGES", "16"))
+
+# ---------------- THUMBNAILS ----------------
+# Longest edge (pixels) and JPEG quality of generated previews. Images need
+# Pillow; PDF first-page previews additionally need PyMuPDF (optional).
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "256"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+# Processes decoding images / rendering PDFs, off the event loop and the GIL.
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+# Larger originals are not previewed (the source is read into memory).
+THUMBNAIL_MAX_SOURCE_BYTES = int(os.getenv("THUMBNAIL_MAX_SOURCE_BYTES", str(50 * 1024 * 1024)))
+
+# ---------------- QUOTAS ----------------
+# Default per-user storage quota in bytes (0 = unlimited); user_usage.quota_bytes overrides it.
+USER_QUOTA_BYTES = int(os.getenv("USER_QUOTA_BYTES", str(15 * 1024 ** 3)))
+# Users per transaction when the reconciliation job recomputes usage totals.
+USAGE_RECONCILE_BATCH_SIZE = int(os.getenv("USAGE_RECONCILE_BATCH_SIZE", "500"))
+USAGE_RECONCILE_INTERVAL = int(os.getenv("USAGE_RECONCILE_INTERVAL", str(24 * 3600)))
+
+# ---------------- ADMIN ----------------
+# Comma-separated emails of users allowed to call the /admin routes.
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+# ---------------- PUBLIC LINKS ----------------
+# Resolved /public/{token} links are cached in-process; changes to the linked
+# file (e.g. a rename) can take this long to show on a cached link.
+PUBLIC_LINK_CACHE_TTL = float(os.getenv("PUBLIC_LINK_CACHE_TTL", "60"))
+PUBLIC_LINK_CACHE_SIZE = int(os.getenv("PUBLIC_LINK_CACHE_SIZE", "10000"))
+# Download counts are buffered in memory and written back this often (seconds).
+PUBLIC_LINK_FLUSH_INTERVAL = float(os.getenv("PUBLIC_LINK_FLUSH_INTERVAL", "10"))
+# Link password checks allowed per token and per client IP in each window
+# (seconds) before answering 429; each check is a bcrypt run. Per process.
+PUBLIC_LINK_PASSWORD_ATTEMPTS = int(os.getenv("PUBLIC_LINK_PASSWORD_ATTEMPTS", "20"))
+PUBLIC_LINK_PASSWORD_WINDOW = float(os.getenv("PUBLIC_LINK_PASSWORD_WINDOW", "300"))
+
+# ---------------- PASSWORDS ----------------
+# bcrypt cost factor (2^rounds iterations). Stored hashes with a different
+# cost are rehashed on the user's next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes hashing and verifying passwords, so login bursts use a bounded
+# number of cores instead of the request threadpool.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max((os.cpu_count() or 2) // 2, 1))))
+
+# ---------------- METRICS ----------------
+# Request/DB/storage timing middleware and the /metrics endpoint.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Add a Server-Timing header (app, db and storage time) to every response.
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+# /metrics takes "Authorization: Bearer <METRICS_TOKEN>" (for scrapers) or an
+# admin's access token. METRICS_PUBLIC opens it to anonymous requests, e.g.
+# when only a private network can reach the app.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "false").lower() in ("1", "true", "yes")
+
+# ---------------- SQL PROFILING ----------------
+# Per-request query recording, N+1 detection and slow query EXPLAINs
+# (app/core/sql_profiler.py). For development, CI and debugging.
+SQL_PROFILE = os.getenv("SQL_PROFILE", "false").lower() in ("1", "true", "yes")
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_EXPLAIN_SLOW = os.getenv("SQL_EXPLAIN_SLOW", "true").lower() in ("1", "true", "yes")
+# The same statement shape this many times in one request is logged as an N+1.
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))
+# Raise instead of logging when a route exceeds its @query_budget (tests/CI).
+SQL_QUERY_BUDGET_STRICT = os.getenv("SQL_QUERY_BUDGET_STRICT", "false").lower() in ("1", "true", "yes")
+# Recent request profiles kept for GET /admin/sql-profile.
+SQL_PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "200"))
+
+# ---------------- STARTUP ----------------
+# Apply pending schema migrations (app/migrations.py) when the app starts.
+# Off by default: production runs `python -m app.migrations` before deploying
+# so workers boot without touching the schema.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "false").lower() in ("1", "true", "yes")
+
+# ---------------- RESPONSES ----------------
+# Compress responses for clients that accept it (app/core/compression.py).
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Bodies smaller than this are sent as-is: the framing costs more than it saves.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Server preference when the client accepts several equally; encodings whose
+# library is not installed (brotli, zstandard) are skipped.
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+# Levels tuned for dynamic responses: most of the size win for little CPU.
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
@@ -1,30 +1,42 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
 from uuid import UUID
 
-from app.database import get_db
-from app.core.config import SECRET_KEY, ALGORITHM
-from app.models.user import User
+from app.database import SessionLocal, AsyncSessionLocal
+from app.core.config import SECRET_KEY, ALGORITHM, ADMIN_EMAILS
+from app.core import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-):
+def _token_user_id(token: str) -> UUID:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if not user_id:
             raise HTTPException(status_code=401)
-        user_id = UUID(user_id)
+        return UUID(user_id)
     except (JWTError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid token")
 
-    user = db.query(User).filter(User.id == user_id).first()
+def get_current_user(token: str = Depends(oauth2_scheme)) -> user_cache.CachedUser:
+    # Served from the user cache; a session is only opened on a miss
+    user = user_cache.get_user(SessionLocal, _token_user_id(token))
     if not user:
         raise HTTPException(status_code=401)
 
     return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme)) -> user_cache.CachedUser:
+    # Async routes must not depend on the sync version, which runs in the threadpool
+    user = await user_cache.get_user_async(AsyncSessionLocal, _token_user_id(token))
+    if not user:
+        raise HTTPException(status_code=401)
+
+    return user
+
+def require_admin(user=Depends(get_current_user)) -> user_cache.CachedUser:
+    if user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    return user
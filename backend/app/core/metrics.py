@@ -0,0 +1,294 @@
+"""
+Request, database and storage telemetry in the Prometheus text format.
+
+MetricsMiddleware times every request into per-route histograms (labelled by
+the route template, so /files/{file_id} is one series) and keeps an in-flight
+gauge. While a request runs, the SQLAlchemy cursor hooks below and the
+storage backend hooks (app/services/storage.py) add their time to it. The
+middleware then reports the split as a Server-Timing header
+(app;dur=..., db;dur=...;desc="N queries", storage;dur=...). A slow
+GET /files shows whether it spent its time in the DB, in storage or in our
+own code and serialization.
+
+GET /metrics renders the registry plus the stats() of the caches, pools and
+background services. Metrics are per process; Prometheus sums worker series.
+"""
+
+import bisect
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import METRICS_ENABLED, METRICS_SERVER_TIMING
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+
+# ---------------- primitives ----------------
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.label_names, k)} {_number(v)}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, list(v[0]), v[1]) for k, v in self._series.items())
+        lines = self.header()
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+_registry: List[_Metric] = []
+# name prefix -> stats() of a component, rendered as gauges
+_collectors: Dict[str, Callable[[], dict]] = {}
+
+
+def _register(metric: _Metric):
+    _registry.append(metric)
+    return metric
+
+
+def collector(prefix: str, stats: Callable[[], dict]) -> None:
+    """Export the numeric values of `stats()` as gauges named <prefix>_<key>."""
+    _collectors[prefix] = stats
+
+
+def _flatten(prefix: str, stats: dict) -> Iterable[Tuple[str, float]]:
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for prefix, stats in _collectors.items():
+        try:
+            values = list(_flatten(prefix, stats()))
+        except Exception:
+            continue
+        for name, value in values:
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------------- metrics ----------------
+http_requests = _register(Counter(
+    "http_requests_total", "Requests served.", ("method", "route", "status")))
+http_duration = _register(Histogram(
+    "http_request_duration_seconds", "Request latency until the response is fully sent.", ("method", "route")))
+http_in_flight = _register(Gauge(
+    "http_requests_in_flight", "Requests being served.", ("method",)))
+http_db_seconds = _register(Histogram(
+    "http_request_db_seconds", "Database time per request.", ("method", "route")))
+http_db_queries = _register(Histogram(
+    "http_request_db_queries", "Database queries per request.", ("method", "route"), COUNT_BUCKETS))
+http_storage_seconds = _register(Histogram(
+    "http_request_storage_seconds", "Storage backend time per request.", ("method", "route")))
+db_queries = _register(Counter(
+    "db_queries_total", "SQL statements executed."))
+db_duration = _register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency."))
+storage_duration = _register(Histogram(
+    "storage_operation_duration_seconds", "Storage backend call latency.", ("operation",)))
+storage_errors = _register(Counter(
+    "storage_operation_errors_total", "Storage backend calls that raised.", ("operation",)))
+storage_retries = _register(Counter(
+    "storage_request_retries_total", "Storage API requests retried after a transient failure.", ("method",)))
+
+
+# ---------------- per-request timings ----------------
+class RequestTimings:
+    __slots__ = ("db_queries", "db_seconds", "storage_calls", "storage_seconds")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.storage_calls = 0
+        self.storage_seconds = 0.0
+
+
+# The middleware sets one RequestTimings per request. run_in_threadpool copies
+# the context, so sync routes and DB work in worker threads add to the same one.
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _timings.get()
+
+
+def record_storage(operation: str, seconds: float, failed: bool = False) -> None:
+    storage_duration.observe(seconds, operation)
+    if failed:
+        storage_errors.inc(operation)
+    timings = _timings.get()
+    if timings is not None:
+        timings.storage_calls += 1
+        timings.storage_seconds += seconds
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    db_queries.inc()
+    db_duration.observe(elapsed)
+    timings = _timings.get()
+    if timings is not None:
+        timings.db_queries += 1
+        timings.db_seconds += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _execute_failed(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+# ---------------- middleware ----------------
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one series so scanners cannot explode cardinality
+    return getattr(route, "path", None) or "unmatched"
+
+
+def server_timing(timings: RequestTimings, total: float) -> str:
+    return (
+        f"app;dur={total * 1000:.1f}, "
+        f"db;dur={timings.db_seconds * 1000:.1f};desc=\"{timings.db_queries} queries\", "
+        f"storage;dur={timings.storage_seconds * 1000:.1f};desc=\"{timings.storage_calls} calls\""
+    )
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed responses are not buffered."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+        http_in_flight.inc(method)
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if METRICS_SERVER_TIMING:
+                    value = server_timing(timings, time.perf_counter() - started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec(method)
+            route = _route_label(scope)
+            http_requests.inc(method, route, str(status))
+            http_duration.observe(elapsed, method, route)
+            http_db_seconds.observe(timings.db_seconds, method, route)
+            http_db_queries.observe(timings.db_queries, method, route)
+            http_storage_seconds.observe(timings.storage_seconds, method, route)
+            _timings.reset(token)
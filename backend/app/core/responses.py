@@ -0,0 +1,55 @@
+"""
+JSON responses rendered with orjson.
+
+JSONResponse is the app's default response class. Routes that return plain
+data still go through FastAPI's jsonable_encoder first, which walks every
+value in Python before rendering. List endpoints skip that walk with
+render(): their dicts hold only str/int/bool/None, UUID and datetime, which
+orjson encodes natively in C.
+
+orjson writes UUIDs in canonical form and naive datetimes as isoformat()
+does, so clients see the same values as from the stdlib path.
+"""
+
+from decimal import Decimal
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse as _StarletteJSONResponse
+from pydantic import BaseModel
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+# Headers the returned response sets itself
+_OWN_HEADERS = {b"content-length", b"content-type"}
+
+
+def _default(obj: Any):
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+
+class JSONResponse(_StarletteJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def render(content: Any, response: Optional[Response] = None, status_code: int = 200) -> JSONResponse:
+    """
+    Return `content` as a ready JSONResponse, bypassing jsonable_encoder.
+    FastAPI drops headers set on a route's injected `response` when the route
+    returns its own Response, so they are copied over (X-Next-Cursor etc.).
+    """
+    res = JSONResponse(content, status_code=status_code)
+    if response is not None:
+        res.raw_headers.extend(h for h in response.raw_headers if h[0] not in _OWN_HEADERS)
+    return res
@@ -0,0 +1,249 @@
+"""
+SQL profiling for development, CI and incident debugging (SQL_PROFILE=true).
+
+Every statement a request runs is recorded by its shape: the SQL with
+whitespace collapsed, literals and IN-lists folded. When one shape runs
+SQL_N_PLUS_ONE_THRESHOLD or more times in one request, it is logged as a
+suspected N+1, typically a lazy-loaded relationship or a query inside a loop
+over results. Statements slower than SQL_SLOW_QUERY_MS are logged with their
+EXPLAIN plan. Recent request profiles are served at GET /admin/sql-profile.
+
+Routes declare their expected cost with @query_budget(n). Going over the
+budget is logged, and with SQL_QUERY_BUDGET_STRICT it raises
+QueryBudgetExceeded, which fails the request in tests. Tests can also
+profile directly:
+
+    with sql_profiler.profile() as p:
+        client.get("/files")
+    p.assert_budget(3)
+
+With SQL_PROFILE off the hooks only record into active profile() blocks.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import (
+    SQL_PROFILE,
+    SQL_SLOW_QUERY_MS,
+    SQL_EXPLAIN_SLOW,
+    SQL_N_PLUS_ONE_THRESHOLD,
+    SQL_QUERY_BUDGET_STRICT,
+    SQL_PROFILE_HISTORY,
+)
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})+\s*\)")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@lru_cache(maxsize=4096)
+def statement_shape(statement: str) -> str:
+    shape = _SPACE.sub(" ", statement).strip()
+    shape = _IN_LIST.sub("(...)", shape)
+    return _LITERAL.sub("?", shape)
+
+
+class QueryProfile:
+    """The statements run while it was active, by shape."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.queries: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def record(self, shape: str, seconds: float) -> None:
+        with self._lock:
+            self.queries.append((shape, seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    @property
+    def seconds(self) -> float:
+        return sum(s for _, s in self.queries)
+
+    def repeated(self, threshold: int = SQL_N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Shapes run at least `threshold` times: N+1 suspects, most frequent first."""
+        with self._lock:
+            counts = Counter(shape for shape, _ in self.queries)
+        return [(shape, n) for shape, n in counts.most_common() if n >= threshold]
+
+    def assert_budget(self, max_queries: int) -> None:
+        if self.count > max_queries:
+            raise QueryBudgetExceeded(
+                f"{self.label or 'block'} ran {self.count} queries, budget {max_queries}: "
+                + "; ".join(f"{n}x {shape[:120]}" for shape, n in self.repeated(2)[:3])
+            )
+
+    def summary(self, top: int = 5) -> dict:
+        with self._lock:
+            queries = list(self.queries)
+        by_shape = {}
+        for shape, seconds in queries:
+            entry = by_shape.setdefault(shape, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+        ranked = sorted(by_shape.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return {
+            "label": self.label,
+            "queries": len(queries),
+            "ms": round(sum(s for _, s in queries) * 1000, 2),
+            "top": [{"statement": shape, "count": n, "ms": round(s * 1000, 2)} for shape, (n, s) in ranked],
+            "n_plus_one": [{"statement": shape, "count": n} for shape, n in self.repeated()],
+        }
+
+
+# Profiles of requests in flight (SqlProfilerMiddleware) and of profile() blocks
+_request_profile: ContextVar[Optional[QueryProfile]] = ContextVar("sql_profile", default=None)
+_blocks: List[QueryProfile] = []
+_blocks_lock = threading.Lock()
+_history: Deque[dict] = deque(maxlen=SQL_PROFILE_HISTORY)
+
+
+@contextmanager
+def profile(label: str = "") -> Iterator[QueryProfile]:
+    """Record every statement run in this process while the block is active."""
+    p = QueryProfile(label)
+    with _blocks_lock:
+        _blocks.append(p)
+    try:
+        yield p
+    finally:
+        with _blocks_lock:
+            _blocks.remove(p)
+
+
+def recent() -> List[dict]:
+    return list(_history)
+
+
+def query_budget(max_queries: int):
+    """Declare the most queries a route should run (checked under SQL_PROFILE)."""
+    def decorate(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorate
+
+
+# ---------------- hooks ----------------
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    prefix = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}.get(conn.dialect.name)
+    if prefix is None or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    # A separate DBAPI cursor, so the statement's own results are untouched
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" | ".join(str(col) for col in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def _log_slow(conn, statement: str, parameters, seconds: float, executemany: bool) -> None:
+    plan = None
+    if SQL_EXPLAIN_SLOW and not executemany:
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as exc:
+            plan = f"(EXPLAIN failed: {exc})"
+    profile = _request_profile.get()
+    logger.warning(
+        "Slow query (%.1f ms)%s: %s%s",
+        seconds * 1000,
+        f" in {profile.label}" if profile is not None and profile.label else "",
+        _SPACE.sub(" ", statement).strip(),
+        f"\n{plan}" if plan else "",
+    )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if SQL_PROFILE or _blocks:
+        conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("profiler_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    targets = list(_blocks)
+    request_profile = _request_profile.get()
+    if request_profile is not None:
+        targets.append(request_profile)
+    if targets:
+        shape = statement_shape(statement)
+        for p in targets:
+            p.record(shape, elapsed)
+
+    if SQL_PROFILE and elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+        _log_slow(conn, statement, parameters, elapsed, executemany)
+
+
+@event.listens_for(Engine, "handle_error")
+def _execute_failed(context):
+    started = context.connection.info.get("profiler_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+# ---------------- middleware ----------------
+class SqlProfilerMiddleware:
+    """Profiles each request; added by app/main.py when SQL_PROFILE is on."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+        token = _request_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-sql-queries", str(profile.count).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_profile.reset(token)
+        self._report(scope, profile)
+
+    def _report(self, scope, profile: QueryProfile) -> None:
+        route = getattr(scope.get("route"), "path", None) or scope["path"]
+        profile.label = f"{scope['method']} {route}"
+        _history.append(profile.summary())
+
+        for shape, n in profile.repeated():
+            logger.warning("Possible N+1 in %s: %dx %s", profile.label, n, shape)
+
+        budget = getattr(scope.get("endpoint"), "query_budget", None)
+        if budget is not None and profile.count > budget:
+            if SQL_QUERY_BUDGET_STRICT:
+                profile.assert_budget(budget)
+            logger.error("%s ran %d queries, over its budget of %d", profile.label, profile.count, budget)
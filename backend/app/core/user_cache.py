@@ -0,0 +1,227 @@
+"""
+Cache of authenticated users, keyed by user id. get_current_user resolves the
+JWT subject through it, so steady-state requests never query the users table.
+
+Only the fields routes need are cached (never the password hash). The cache is
+in-process by default; with USER_CACHE_REDIS_URL set it is shared through Redis
+so an invalidation reaches every worker at once. Any change to a User made
+through the ORM invalidates its entry.
+"""
+
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from anyio import to_thread
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.core.config import USER_CACHE_REDIS_URL, USER_CACHE_SIZE, USER_CACHE_TTL
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    id: UUID
+    name: str
+    email: str
+
+    @classmethod
+    def from_model(cls, user: User) -> "CachedUser":
+        return cls(id=user.id, name=user.name, email=user.email)
+
+
+class _LocalBackend:
+    def __init__(self, size: int, ttl: float):
+        self.size = size
+        self.ttl = ttl
+        # user id -> (user, monotonic expiry)
+        self._entries: "OrderedDict[UUID, Tuple[CachedUser, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: UUID) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+    def set(self, user: CachedUser) -> None:
+        with self._lock:
+            self._entries[user.id] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, user_id: UUID) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class _RedisBackend:
+    prefix = "user:"
+
+    def __init__(self, url: str, ttl: float):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.ttl = max(int(ttl), 1)
+
+    def get(self, user_id: UUID) -> Optional[CachedUser]:
+        raw = self.client.get(f"{self.prefix}{user_id}")
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return CachedUser(id=UUID(data["id"]), name=data["name"], email=data["email"])
+
+    def set(self, user: CachedUser) -> None:
+        data = {**asdict(user), "id": str(user.id)}
+        self.client.set(f"{self.prefix}{user.id}", json.dumps(data), ex=self.ttl)
+
+    def delete(self, user_id: UUID) -> None:
+        self.client.delete(f"{self.prefix}{user_id}")
+
+    def __len__(self) -> int:
+        return 0
+
+
+def _make_backend():
+    if USER_CACHE_REDIS_URL:
+        try:
+            return _RedisBackend(USER_CACHE_REDIS_URL, USER_CACHE_TTL)
+        except ImportError:
+            logger.warning("USER_CACHE_REDIS_URL is set but redis is not installed; using in-process cache")
+    return _LocalBackend(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+_backend = _make_backend()
+_stats = {"hits": 0, "misses": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _cached(user_id: UUID) -> Optional[CachedUser]:
+    try:
+        user = _backend.get(user_id)
+    except Exception:
+        logger.exception("User cache lookup failed")
+        _count("errors")
+        user = None
+    _count("hits" if user is not None else "misses")
+    return user
+
+
+def _store(user: CachedUser) -> None:
+    try:
+        _backend.set(user)
+    except Exception:
+        logger.exception("User cache store failed")
+        _count("errors")
+
+
+def get_user(db_factory, user_id: UUID) -> Optional[CachedUser]:
+    """
+    Return the user with `user_id`, from the cache when possible. `db_factory`
+    opens a Session and is only called on a miss. Cache failures (e.g. Redis
+    being down) fall through to the database.
+    """
+    user = _cached(user_id)
+    if user is not None:
+        return user
+
+    db = db_factory()
+    try:
+        model = db.query(User).filter(User.id == user_id).first()
+        if model is None:
+            return None
+        user = CachedUser.from_model(model)
+    finally:
+        db.close()
+
+    _store(user)
+    return user
+
+
+async def get_user_async(session_factory, user_id: UUID) -> Optional[CachedUser]:
+    """get_user for async routes; `session_factory` opens an AsyncSession."""
+    if isinstance(_backend, _LocalBackend):
+        user = _cached(user_id)
+    else:
+        # Redis calls block; keep them off the event loop
+        user = await to_thread.run_sync(_cached, user_id)
+    if user is not None:
+        return user
+
+    async with session_factory() as db:
+        model = (await db.execute(select(User).where(User.id == user_id))).scalar_one_or_none()
+        if model is None:
+            return None
+        user = CachedUser.from_model(model)
+
+    if isinstance(_backend, _LocalBackend):
+        _store(user)
+    else:
+        await to_thread.run_sync(_store, user)
+    return user
+
+
+def invalidate(user_id: UUID) -> None:
+    try:
+        _backend.delete(user_id)
+    except Exception:
+        logger.exception("User cache invalidation failed for %s", user_id)
+        _count("errors")
+
+
+def stats() -> Dict[str, float]:
+    with _stats_lock:
+        hits, misses, errors = _stats["hits"], _stats["misses"], _stats["errors"]
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "errors": errors,
+        "hit_ratio": hits / lookups if lookups else 0.0,
+        "size": len(_backend),
+    }
+
+
+# ---------------- invalidation ----------------
+# Drop the entry when the row is flushed, and again after commit so a request
+# that re-cached the old row in between cannot keep it.
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate(target.id)
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_user_ids", set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    for user_id in session.info.pop("changed_user_ids", ()):
+        invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("changed_user_ids", None)
@@ -1,9 +1,100 @@
-from sqlalchemy import create_engine
+import time
+import uuid
+import threading
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from app.core.config import (
+    DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS,
+    DB_PGBOUNCER,
+    DB_ASYNC,
+)
+
+# ---------------- POOL INSTRUMENTATION ----------------
+_wait_lock = threading.Lock()
+_waits = {"count": 0, "seconds_total": 0.0, "seconds_max": 0.0, "timeouts": 0}
+
+
+class _WaitTimingMixin:
+    """Records how long pool checkouts wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with _wait_lock:
+                _waits["timeouts"] += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with _wait_lock:
+                _waits["count"] += 1
+                _waits["seconds_total"] += waited
+                _waits["seconds_max"] = max(_waits["seconds_max"], waited)
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _engine_options(url, is_async: bool = False) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {}
+
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if DB_POOL_SIZE <= 0:
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    if url.get_backend_name() != "postgresql":
+        return options
+
+    if is_async:
+        connect_args = {}
+        if DB_PGBOUNCER:
+            # Transaction pooling breaks asyncpg's named prepared statements
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        elif DB_STATEMENT_TIMEOUT_MS > 0:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        options["connect_args"] = connect_args
+    elif DB_STATEMENT_TIMEOUT_MS > 0 and not DB_PGBOUNCER:
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
 
-from app.core.config import DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+def _set_statement_timeout(conn):
+    conn.execute(text(f"SET LOCAL statement_timeout = {DB_STATEMENT_TIMEOUT_MS}"))
+
+
+_url = make_url(DATABASE_URL)
+_per_transaction_timeout = _url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS > 0 and DB_PGBOUNCER
+
+engine = create_engine(_url, **_engine_options(_url))
+if _per_transaction_timeout:
+    event.listen(engine, "begin", _set_statement_timeout)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -19,3 +110,58 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------- ASYNC ----------------
+# Only built with DB_ASYNC, so asyncpg/aiosqlite stay optional.
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _async_url = _url.set(drivername=f"{_url.get_backend_name()}+{_ASYNC_DRIVERS[_url.get_backend_name()]}")
+    async_engine = create_async_engine(_async_url, **_engine_options(_async_url, is_async=True))
+    if _per_transaction_timeout:
+        event.listen(async_engine.sync_engine, "begin", _set_statement_timeout)
+
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _pool_usage(pool) -> dict:
+    usage = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        usage.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+    return usage
+
+
+def pool_stats() -> dict:
+    """Connection pool usage for the metrics endpoint."""
+    stats = _pool_usage(engine.pool)
+    if async_engine is not None:
+        stats["async"] = _pool_usage(async_engine.pool)
+    with _wait_lock:
+        stats.update(
+            checkout_count=_waits["count"],
+            checkout_wait_seconds_total=round(_waits["seconds_total"], 6),
+            checkout_wait_seconds_max=round(_waits["seconds_max"], 6),
+            checkout_timeouts=_waits["timeouts"],
+        )
+    return stats
@@ -1,68 +1,126 @@
 import os
 import logging
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
 
-from app.database import Base, engine
-from app.routes import auth, folders, files, shares, public_links
+from app.database import async_engine
+from app.core.config import STORAGE_BACKEND, DB_ASYNC, SQL_PROFILE, AUTO_MIGRATE
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.responses import JSONResponse
+from app.core.sql_profiler import SqlProfilerMiddleware
+from app.services import jobs, link_shares, thumbnails, trash, usage  # noqa: F401 (trash and usage register jobs)
+from app.services.storage import close_storage
+from app.utils import hashing
+from app.routes import admin, auth, folders, files, shares, public_links, uploads, local_storage
+from app.routes import jobs as jobs_routes, metrics as metrics_routes
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-# Ensure DB tables exist (use migrations in production)
-Base.metadata.create_all(bind=engine)
-
-# Ensure the files.storage_path column exists (safe quick fix if migrations not applied).
-# This uses a non-destructive ALTER TABLE IF NOT EXISTS for immediate recovery.
-try:
-    with engine.begin() as conn:
-        logger.info("Ensuring storage_path column exists on files table...")
-        # Use driver-level SQL to be compatible with SQLAlchemy versions
-        conn.exec_driver_sql(
-            "ALTER TABLE files ADD COLUMN IF NOT EXISTS storage_path TEXT;"
-        )
-        logger.info("storage_path column ensured.")
-except Exception as exc:
-    # Log but do not crash -- if your DB is in a state where this fails you should inspect logs.
-    logger.exception("Error ensuring storage_path column exists: %s", exc)
-
-app = FastAPI(title="CloudVault API")
-
-# Allow list for CORS. You can set FRONTEND_ORIGINS as a comma-separated list in Render env.
-# Example: FRONTEND_ORIGINS="https://cloud-vault-psi.vercel.app,https://cloud-vault-weld.vercel.app"
-_frontend_env = os.getenv("FRONTEND_ORIGINS", "")
-if _frontend_env:
-    allowed_origins: List[str] = [o.strip() for o in _frontend_env.split(",") if o.strip()]
-else:
+
+def _allowed_origins() -> List[str]:
+    # Allow list for CORS. You can set FRONTEND_ORIGINS as a comma-separated list in Render env.
+    # Example: FRONTEND_ORIGINS="https://cloud-vault-psi.vercel.app,https://cloud-vault-weld.vercel.app"
+    frontend_env = os.getenv("FRONTEND_ORIGINS", "")
+    if frontend_env:
+        return [o.strip() for o in frontend_env.split(",") if o.strip()]
     # sensible defaults for local dev + common Vercel preview host(s)
-    allowed_origins = [
+    return [
         "http://localhost:5173",
         "http://localhost:3000",
         "https://cloud-vault-psi.vercel.app",
         "https://cloud-vault-weld.vercel.app",
     ]
 
-logger.info("CORS allowed_origins: %s", allowed_origins)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,  # use explicit origins; do NOT use ["*"] with credentials=True
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup does no DDL and opens no connections: the DB engine and the
+    # storage client connect on first use. Run `python -m app.migrations`
+    # before deploying, or set AUTO_MIGRATE for local development.
+    if AUTO_MIGRATE:
+        from app import migrations
+        await run_in_threadpool(migrations.upgrade)
+
+    await jobs.start()
+    await link_shares.start()
+    # Spawns the bcrypt workers in the background instead of on the first login
+    hashing.warm_up()
+    try:
+        yield
+    finally:
+        # Before the storage client closes: queued jobs may still need it
+        await jobs.stop()
+        thumbnails.shutdown()
+        # Write back buffered public link download counts
+        await link_shares.stop()
+        hashing.shutdown()
+        # Drain pooled keep-alive connections to storage
+        await close_storage()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="CloudVault API", lifespan=lifespan, default_response_class=JSONResponse)
+
+    allowed_origins = _allowed_origins()
+    logger.info("CORS allowed_origins: %s", allowed_origins)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins,  # use explicit origins; do NOT use ["*"] with credentials=True
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[
+            "X-Next-Cursor", "Location", "Upload-Offset", "Upload-Length",
+            "ETag", "Content-Range", "Accept-Ranges", "Content-Disposition", "Server-Timing",
+            "X-SQL-Queries",
+        ],
+    )
+    if SQL_PROFILE:
+        app.add_middleware(SqlProfilerMiddleware)
+    app.add_middleware(CompressionMiddleware)
+    # Added last so it is outermost and times the whole stack
+    app.add_middleware(MetricsMiddleware)
+
+    # Include routers after middleware is configured
+    if DB_ASYNC:
+        # Async handlers come first so they shadow the sync ones on the same paths;
+        # routes they don't cover fall through to the sync routers below
+        from app.routes import auth_async, files_async, folders_async, shares_async
+
+        app.include_router(files_async.router)
+        app.include_router(auth_async.router)
+        app.include_router(folders_async.router)
+        app.include_router(shares_async.router)
+
+    app.include_router(files.router)
+    app.include_router(auth.router)
+    app.include_router(folders.router)
+    app.include_router(shares.router)
+    app.include_router(public_links.router)
+    app.include_router(public_links.public_router)
+    app.include_router(uploads.router)
+    app.include_router(jobs_routes.router)
+    app.include_router(admin.router)
+    app.include_router(metrics_routes.router)
+    if STORAGE_BACKEND == "local":
+        # Serves the signed URLs handed out by the local filesystem backend
+        app.include_router(local_storage.router)
+
+    @app.get("/")
+    def root():
+        return {"status": "CloudVault backend running"}
 
-# Include routers after middleware is configured
-app.include_router(files.router)
-app.include_router(auth.router)
-app.include_router(folders.router)
-app.include_router(shares.router)
-app.include_router(public_links.router)
+    return app
 
 
-@app.get("/")
-def root():
-    return {"status": "CloudVault backend running"}
\ No newline at end of file
+# `uvicorn app.main:app`; tests and tools can build their own with create_app()
+app = create_app()
@@ -0,0 +1,205 @@
+"""
+Versioned schema migrations, run out of band before a deploy:
+
+    cd backend
+    python -m app.migrations            # apply pending migrations
+    python -m app.migrations status     # list applied and pending versions
+
+Applied versions are recorded in schema_migrations. Each migration runs in its
+own transaction together with its version row. On PostgreSQL an advisory lock
+makes concurrent runs wait for each other, so several deploy jobs racing are
+safe. App processes never touch the schema unless AUTO_MIGRATE is set (handy
+for local development), so booting a worker costs no DDL.
+
+Version 1 creates every table from the models. Later versions upgrade
+databases created before a column or index existed. They are written to be
+idempotent, so databases that got them from the old startup patches pass
+through unchanged. A schema change is a new Migration at the end of the list;
+never edit one that has shipped.
+"""
+
+import argparse
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select
+from sqlalchemy.engine import Connection
+
+from app.database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key: "cloudvault migrations"
+_LOCK_ID = 0x636C6F7564
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: Tuple[str, ...] = ()
+    run: Optional[Callable[[Connection], None]] = None
+    # Raw SQL is written for PostgreSQL; SQLite databases get the current
+    # schema from version 1 and only record the later versions.
+    postgres_only: bool = True
+    # Failure is logged and the version recorded, instead of aborting the run
+    optional: bool = False
+
+
+def _create_tables(conn: Connection) -> None:
+    # Every model must be imported so the metadata is complete
+    from app.models import blob, file, folder, job, link_share, share, upload_session, usage, user  # noqa: F401
+    Base.metadata.create_all(bind=conn)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create tables", run=_create_tables, postgres_only=False),
+    Migration(2, "file storage paths and owner listing index", (
+        "ALTER TABLE files ADD COLUMN IF NOT EXISTS storage_path TEXT;",
+        "CREATE INDEX IF NOT EXISTS ix_files_owner_deleted_created ON files (owner_id, is_deleted, created_at, id);",
+        "ALTER TABLE files ALTER COLUMN size TYPE BIGINT;",
+    )),
+    Migration(3, "content-addressed blobs", (
+        "ALTER TABLE files ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64) REFERENCES blobs(hash);",
+        "CREATE INDEX IF NOT EXISTS ix_files_content_hash ON files (content_hash);",
+    )),
+    # Trigram indexes serve ILIKE '%q%' name search (app/services/search.py);
+    # managed databases without pg_trgm fall back to sequential scans
+    Migration(4, "trigram name search indexes", (
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+        "CREATE INDEX IF NOT EXISTS ix_files_name_trgm ON files USING gin (name gin_trgm_ops);",
+        "CREATE INDEX IF NOT EXISTS ix_folders_name_trgm ON folders USING gin (name gin_trgm_ops);",
+    ), optional=True),
+    # Materialized folder paths (app/services/folder_tree.py), backfilled from parent_id
+    Migration(5, "materialized folder paths", (
+        "ALTER TABLE folders ADD COLUMN IF NOT EXISTS path TEXT;",
+        "ALTER TABLE folders ADD COLUMN IF NOT EXISTS depth INTEGER NOT NULL DEFAULT 0;",
+        "WITH RECURSIVE tree AS ("
+        " SELECT id, '/' || replace(id::text, '-', '') || '/' AS path, 0 AS depth"
+        " FROM folders WHERE parent_id IS NULL"
+        " UNION ALL"
+        " SELECT f.id, tree.path || replace(f.id::text, '-', '') || '/', tree.depth + 1"
+        " FROM folders f JOIN tree ON f.parent_id = tree.id"
+        ") UPDATE folders SET path = tree.path, depth = tree.depth"
+        " FROM tree WHERE folders.id = tree.id AND folders.path IS NULL;",
+        "CREATE INDEX IF NOT EXISTS ix_folders_owner_path ON folders (owner_id, path text_pattern_ops);",
+    )),
+    # Trash retention (app/services/trash.py); files already in the trash start their clock now
+    Migration(6, "trash timestamps", (
+        "ALTER TABLE files ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;",
+        "UPDATE files SET deleted_at = now() WHERE is_deleted AND deleted_at IS NULL;",
+        "CREATE INDEX IF NOT EXISTS ix_files_trash_deleted_at ON files (deleted_at) WHERE is_deleted;",
+    )),
+    Migration(7, "thumbnails", (
+        "ALTER TABLE files ADD COLUMN IF NOT EXISTS thumbnail_path TEXT;",
+    )),
+    # Usage counters (app/services/usage.py) for users who had files before they existed
+    Migration(8, "usage counter backfill", (
+        "INSERT INTO user_usage (user_id, bytes_used, file_count, updated_at)"
+        " SELECT owner_id, COALESCE(SUM(size), 0), COUNT(*), CURRENT_TIMESTAMP FROM files GROUP BY owner_id"
+        " ON CONFLICT (user_id) DO NOTHING;",
+    )),
+    # Share lookups (app/services/permissions.py) and folder listings
+    Migration(9, "share and folder listing indexes", (
+        "CREATE INDEX IF NOT EXISTS ix_shares_user_id ON shares (user_id);",
+        "CREATE INDEX IF NOT EXISTS ix_shares_file_id ON shares (file_id);",
+        "CREATE INDEX IF NOT EXISTS ix_shares_folder_id ON shares (folder_id);",
+        "CREATE INDEX IF NOT EXISTS ix_files_folder_deleted_created ON files (folder_id, is_deleted, created_at, id);",
+    )),
+    # Public links (app/services/link_shares.py)
+    Migration(10, "public link owners and download counts", (
+        "ALTER TABLE link_shares ADD COLUMN IF NOT EXISTS owner_id UUID REFERENCES users(id);",
+        "ALTER TABLE link_shares ADD COLUMN IF NOT EXISTS download_count BIGINT NOT NULL DEFAULT 0;",
+        "CREATE INDEX IF NOT EXISTS ix_link_shares_file_id ON link_shares (file_id);",
+        "CREATE INDEX IF NOT EXISTS ix_link_shares_folder_id ON link_shares (folder_id);",
+    )),
+]
+
+
+def _apply(conn: Connection, migration: Migration) -> None:
+    if migration.postgres_only and conn.dialect.name != "postgresql":
+        return
+    if migration.run is not None:
+        migration.run(conn)
+    for statement in migration.statements:
+        conn.exec_driver_sql(statement)
+
+
+def applied_versions(conn: Connection) -> List[int]:
+    _metadata.create_all(bind=conn)
+    return [v for (v,) in conn.execute(select(schema_migrations.c.version).order_by(schema_migrations.c.version))]
+
+
+def upgrade(bind=None) -> List[int]:
+    """Apply pending migrations in order; returns the versions applied."""
+    bind = bind or engine
+    postgres = bind.dialect.name == "postgresql"
+    done: List[int] = []
+
+    with bind.connect() as conn:
+        if postgres:
+            conn.exec_driver_sql(f"SELECT pg_advisory_lock({_LOCK_ID})")
+        try:
+            applied = set(applied_versions(conn))
+            conn.commit()
+
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                logger.info("Applying migration %d: %s", migration.version, migration.name)
+                with conn.begin():
+                    if migration.optional:
+                        try:
+                            with conn.begin_nested():
+                                _apply(conn, migration)
+                        except Exception:
+                            logger.exception("Optional migration %d (%s) failed; skipping it", migration.version, migration.name)
+                    else:
+                        _apply(conn, migration)
+                    conn.execute(schema_migrations.insert().values(
+                        version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+                    ))
+                done.append(migration.version)
+        finally:
+            if postgres:
+                conn.exec_driver_sql(f"SELECT pg_advisory_unlock({_LOCK_ID})")
+                conn.commit()
+    return done
+
+
+def pending(bind=None) -> List[Migration]:
+    with (bind or engine).connect() as conn:
+        applied = set(applied_versions(conn))
+        conn.commit()
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "status":
+        waiting = {m.version for m in pending()}
+        for m in MIGRATIONS:
+            print(f"{m.version:>4}  {'pending' if m.version in waiting else 'applied'}  {m.name}")
+        return
+
+    done = upgrade()
+    print(f"Applied {len(done)} migration(s)" + (f": {', '.join(map(str, done))}" if done else ""))
+
+
+if __name__ == "__main__":
+    main()
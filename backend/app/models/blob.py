@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, BigInteger, Integer
+from datetime import datetime
+
+from app.database import Base
+
+class Blob(Base):
+    """
+    A stored object, identified by the SHA-256 of its content. File rows point at
+    blobs through content_hash; ref_count is the number of File rows (and
+    nothing else) referencing it, and the object is removed when it drops to 0.
+    """
+    __tablename__ = "blobs"
+
+    hash = Column(String(64), primary_key=True)
+    storage_path = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
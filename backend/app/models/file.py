@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, BigInteger, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -11,11 +11,32 @@ class File(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     mime_type = Column(String)
-    size = Column(Integer)
+    size = Column(BigInteger)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True)
     storage_path = Column(String, nullable=True)  
+    # Generated preview (app/services/thumbnails.py); None until rendered or if unsupported
+    thumbnail_path = Column(String, nullable=True)
+    # SHA-256 of the content; files uploaded before deduplication have none
+    content_hash = Column(String(64), ForeignKey("blobs.hash"), nullable=True, index=True)
     is_starred = Column(Boolean, default=False)
     is_deleted = Column(Boolean, default=False)
+    # When the file was moved to the trash; drives the retention purge
+    deleted_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Backs keyset pagination of My Drive / Trash / search listings:
+        # equality on (owner_id, is_deleted), range scan on (created_at, id).
+        Index("ix_files_owner_deleted_created", "owner_id", "is_deleted", "created_at", "id"),
+        # Same for the files of one folder (owner's or shared)
+        Index("ix_files_folder_deleted_created", "folder_id", "is_deleted", "created_at", "id"),
+        # Expired-trash scan of the purge job; only trashed rows are indexed
+        Index(
+            "ix_files_trash_deleted_at",
+            "deleted_at",
+            postgresql_where=text("is_deleted"),
+            sqlite_where=text("is_deleted"),
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -14,4 +14,14 @@ class Folder(Base):
     parent_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True)
     owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
 
+    # Materialized path "/<root hex>/.../<own hex>/": the ids of every ancestor
+    # and of the folder itself, so a subtree is one prefix scan. Maintained by
+    # app/services/folder_tree.py on create and move.
+    path = Column(String, nullable=True)
+    depth = Column(Integer, nullable=False, default=0)
+
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_folders_owner_path", "owner_id", "path", postgresql_ops={"path": "text_pattern_ops"}),
+    )
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text, JSON, Index
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+
+from app.database import Base
+
+class Job(Base):
+    """A queued background job; only used when JOB_DURABLE is enabled (see app/services/jobs.py)."""
+    __tablename__ = "jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    name = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False, default=dict)
+    # User the job runs on behalf of, if any; they may read its status
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+
+    # queued -> running -> succeeded | failed (queued again between retries)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # A running job whose lease expired (worker died) is picked up again
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy import Column, String, DateTime, ForeignKey, BigInteger
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -11,11 +11,13 @@ class LinkShare(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
     token = Column(String, unique=True, index=True)
-    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id"), nullable=True)
-    folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True)
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id"), nullable=True, index=True)
+    folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True, index=True)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
 
+    # bcrypt hash (links created before hashing hold plaintext until first use)
     password = Column(String, nullable=True)
     expires_at = Column(DateTime, nullable=True)
+    download_count = Column(BigInteger, nullable=False, default=0)
 
     created_at = Column(DateTime, default=datetime.utcnow)
-
@@ -10,10 +10,12 @@ class Share(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
 
-    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id"), nullable=True)
-    folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True)
+    # Indexed: "shared with me" and ACL loading go by user_id, listing and
+    # cleaning up a resource's shares by file_id / folder_id
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id"), nullable=True, index=True)
+    folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True, index=True)
 
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"))
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), index=True)
     role = Column(Enum("owner", "editor", "viewer", name="share_role"))
 
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, DateTime, ForeignKey, BigInteger
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+import uuid
+
+from app.database import Base
+
+class UploadSession(Base):
+    """An in-progress resumable upload; becomes a File row once all bytes arrive."""
+    __tablename__ = "upload_sessions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    owner_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
+    folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True)
+
+    name = Column(String, nullable=False)
+    mime_type = Column(String)
+    size = Column(BigInteger, nullable=False)
+    offset = Column(BigInteger, nullable=False, default=0)
+
+    storage_path = Column(String, nullable=False)
+    # Backend handle for the resumable upload (TUS URL for Supabase)
+    upload_ref = Column(String, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
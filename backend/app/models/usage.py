@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, ForeignKey, BigInteger, Integer
+from sqlalchemy.dialects.postgresql import UUID
+from datetime import datetime
+
+from app.database import Base
+
+class UserUsage(Base):
+    """
+    Storage a user consumes: the sizes of all their files, trash included.
+    Maintained incrementally (app/services/usage.py) so quota checks are a
+    primary-key lookup; the reconciliation job recomputes it from files.
+    """
+    __tablename__ = "user_usage"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    bytes_used = Column(BigInteger, nullable=False, default=0)
+    file_count = Column(Integer, nullable=False, default=0)
+    # Per-user override of USER_QUOTA_BYTES (0 = unlimited)
+    quota_bytes = Column(BigInteger, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,10 +1,36 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.database import get_db
+from app.core import sql_profiler
+from app.core.config import SQL_PROFILE
+from app.core.deps import require_admin
 from app.models.user import User
+from app.models.usage import UserUsage
+from app.services import jobs
 
-router = APIRouter(prefix="/admin", tags=["Admin"])
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
 
 @router.get("/users")
+@sql_profiler.query_budget(3)
 def get_all_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+    rows = db.query(User, UserUsage).outerjoin(UserUsage, UserUsage.user_id == User.id).all()
+    return [
+        {
+            "id": str(user.id),
+            "name": user.name,
+            "email": user.email,
+            "bytes_used": usage.bytes_used if usage else 0,
+            "file_count": usage.file_count if usage else 0,
+        }
+        for user, usage in rows
+    ]
+
+@router.post("/usage/reconcile", status_code=202)
+def reconcile_usage(user=Depends(require_admin)):
+    """Recompute every user's usage totals from their files, in the background."""
+    return {"job_id": str(jobs.enqueue("reconcile_usage", owner_id=user.id))}
+
+@router.get("/sql-profile")
+def sql_profile():
+    """Query counts, slowest statement shapes and N+1 suspects of recent requests (SQL_PROFILE)."""
+    return {"enabled": SQL_PROFILE, "requests": sql_profiler.recent()}
@@ -1,37 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.user import User
 from app.schemas.auth import RegisterRequest, LoginRequest
-from app.utils.hashing import hash_password, verify_password
+from app.utils.hashing import hash_password_async, verify_and_update_async
 from app.core.security import create_access_token
 from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# bcrypt runs in the password hashing process pool; only the short DB work
+# uses the request threadpool
+
 @router.post("/register")
-def register(data: RegisterRequest, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == data.email).first():
+async def register(data: RegisterRequest, db: Session = Depends(get_db)):
+    def email_taken():
+        return db.query(User.id).filter(User.email == data.email).first() is not None
+
+    if await run_in_threadpool(email_taken):
         raise HTTPException(status_code=400, detail="Email already exists")
 
     user = User(
         name=data.name,
         email=data.email,
-        password_hash=hash_password(data.password)
+        password_hash=await hash_password_async(data.password)
     )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+
+    def save():
+        db.add(user)
+        db.commit()
+
+    await run_in_threadpool(save)
 
     return {"message": "User registered successfully"}
 
 @router.post("/login")
-def login(data: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    if not user or not verify_password(data.password, user.password_hash):
+async def login(data: LoginRequest, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.email == data.email).first())
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    ok, new_hash = await verify_and_update_async(data.password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        def rehash():
+            user.password_hash = new_hash
+            db.commit()
+
+        await run_in_threadpool(rehash)
+
     token = create_access_token(
         {"sub": str(user.id)},
         ACCESS_TOKEN_EXPIRE_MINUTES
@@ -0,0 +1,54 @@
+"""Async /auth routes (DB_ASYNC); included ahead of routes/auth.py."""
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.models.user import User
+from app.schemas.auth import RegisterRequest, LoginRequest
+from app.utils.hashing import hash_password_async, verify_and_update_async
+from app.core.security import create_access_token
+from app.core.config import ACCESS_TOKEN_EXPIRE_MINUTES
+
+router = APIRouter(prefix="/auth", tags=["Auth"])
+
+# bcrypt is deliberately slow; it runs in the password hashing process pool
+
+@router.post("/register")
+async def register(data: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.execute(select(User.id).where(User.email == data.email))
+    if existing.first():
+        raise HTTPException(status_code=400, detail="Email already exists")
+
+    user = User(
+        name=data.name,
+        email=data.email,
+        password_hash=await hash_password_async(data.password)
+    )
+    db.add(user)
+    await db.commit()
+
+    return {"message": "User registered successfully"}
+
+@router.post("/login")
+async def login(data: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == data.email))).scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    ok, new_hash = await verify_and_update_async(data.password, user.password_hash)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made
+        user.password_hash = new_hash
+        await db.commit()
+
+    token = create_access_token(
+        {"sub": str(user.id)},
+        ACCESS_TOKEN_EXPIRE_MINUTES
+    )
+
+    return {"access_token": token}
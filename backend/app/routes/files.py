@@ -1,122 +1,428 @@
-from fastapi import APIRouter, Depends, UploadFile, File as FastAPIFile, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, UploadFile, File as FastAPIFile, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from anyio import from_thread
+from sqlalchemy.orm import Session, Query as OrmQuery
 from uuid import UUID
-from typing import List, Optional
+from typing import Callable, Iterator, List, Literal, Optional, Tuple
 import logging
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
+from app.core import responses
 from app.core.deps import get_current_user
+from app.core.sql_profiler import query_budget
+from app.core.config import (
+    SIGNED_URL_BATCH_SIZE,
+    DEDUP_CROSS_USER_CLAIM,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    STREAM_BATCH_SIZE,
+)
 from app.models.file import File as FileModel
-from app.utils.supabase import (
-    upload_file_to_supabase,
-    generate_signed_url,
-    delete_file_from_supabase,
+from app.services import dedup, downloads, file_service, folder_tree, link_shares, search, signed_urls, thumbnails, usage
+from app.services.pagination import (
+    encode_cursor,
+    decode_cursor,
+    encode_offset_cursor,
+    decode_offset_cursor,
+    keyset_page,
 )
+from app.services.permissions import Acl, get_acl
+from app.services.storage import StorageError, get_storage, iter_upload_file, upload_length
+from app.schemas.file import BulkFileRequest, DedupRequest
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/files", tags=["Files"])
 
 
-def file_to_dict(f: FileModel) -> dict:
-    """Convert SQLAlchemy File model to JSON-serializable dict, including signed URL when possible."""
-    url = None
-    if getattr(f, "storage_path", None):
-        try:
-            url = generate_signed_url(f.storage_path)
-        except Exception:
-            # Log but do not fail the whole request if signed URL creation fails
-            logger.exception("Failed to create signed URL for %s", f.storage_path)
-
+def file_to_dict(f: FileModel, url: Optional[str] = None, thumbnail_url: Optional[str] = None) -> dict:
+    """
+    Convert SQLAlchemy File model to a response dict. Signed URLs are passed in
+    by the caller. UUIDs and datetimes are left for the encoder (orjson renders
+    them natively; jsonable_encoder as str/isoformat).
+    """
     return {
-        "id": str(f.id),
+        "id": f.id,
         "name": f.name,
         "mime_type": f.mime_type,
         "size": f.size,
-        "owner_id": str(f.owner_id) if f.owner_id else None,
-        "folder_id": str(f.folder_id) if f.folder_id else None,
+        "owner_id": f.owner_id,
+        "folder_id": f.folder_id,
         "storage_path": f.storage_path,
         "url": url,
+        "thumbnail_url": thumbnail_url,
         "is_starred": bool(f.is_starred),
         "is_deleted": bool(f.is_deleted),
-        "created_at": f.created_at.isoformat() if f.created_at else None,
-        "updated_at": f.updated_at.isoformat() if f.updated_at else None,
+        "deleted_at": f.deleted_at,
+        "created_at": f.created_at,
+        "updated_at": f.updated_at,
     }
 
 
+def _url_paths(files: List[FileModel]) -> List[str]:
+    # Originals and thumbnails are signed in the same batch
+    return [f.storage_path for f in files] + [f.thumbnail_path for f in files if f.thumbnail_path]
+
+
+def files_to_dicts(files: List[FileModel], include_urls: bool = True) -> List[dict]:
+    """
+    Serialize a listing. Signed URLs for the whole page are resolved with one
+    cache lookup plus bulk signing of the misses; with include_urls=False the
+    "url" field is null and clients sign lazily through POST /files/urls.
+
+    Runs in a threadpool worker (sync routes, streamed bodies); signing hops
+    onto the event loop where the pooled storage client lives.
+    """
+    urls = {}
+    if include_urls and files:
+        urls = from_thread.run(signed_urls.get_signed_urls, _url_paths(files))
+    return [file_to_dict(f, urls.get(f.storage_path), urls.get(f.thumbnail_path)) for f in files]
+
+
+async def files_to_dicts_async(files: List[FileModel], include_urls: bool = True) -> List[dict]:
+    """files_to_dicts for code already running on the event loop."""
+    urls = {}
+    if include_urls and files:
+        urls = await signed_urls.get_signed_urls(_url_paths(files))
+    return [file_to_dict(f, urls.get(f.storage_path), urls.get(f.thumbnail_path)) for f in files]
+
+
+def get_owned_file(db: Session, file_id: UUID, user_id) -> FileModel:
+    file = (
+        db.query(FileModel)
+        .filter(FileModel.id == file_id, FileModel.owner_id == user_id)
+        .first()
+    )
+    if not file:
+        raise HTTPException(404, "File not found")
+    return file
+
+
+def get_readable_file(db: Session, file_id: UUID, acl: Acl) -> FileModel:
+    """A file the caller owns or has been shared (directly or through a folder)."""
+    return acl.require_file(db.query(FileModel).filter(FileModel.id == file_id).first())
+
+
+def readable_storage_paths(db: Session, file_ids: List[UUID], acl: Acl) -> List[Tuple[UUID, str]]:
+    """(id, storage_path) of the files in `file_ids` the caller may read; others are left out."""
+    files = db.query(FileModel).filter(FileModel.id.in_(file_ids)).all()
+    return [(f.id, f.storage_path) for f in files if acl.can_read(f)]
+
+
+StreamFormat = Literal["ndjson", "json"]
+
+
+def _stream_files(
+    build_query: Callable[[Session], OrmQuery],
+    include_urls: bool,
+    fmt: StreamFormat,
+) -> Iterator[bytes]:
+    """
+    Yield every matching file in keyset batches of STREAM_BATCH_SIZE. Uses its
+    own session because the request-scoped one is closed before the body is sent.
+    """
+    db = SessionLocal()
+    try:
+        after = None
+        first = True
+        if fmt == "json":
+            yield b"["
+        while True:
+            rows, after = keyset_page(build_query(db), FileModel, after, STREAM_BATCH_SIZE)
+            items = [responses.dumps(item) for item in files_to_dicts(rows, include_urls)]
+            if items:
+                if fmt == "ndjson":
+                    yield b"\n".join(items) + b"\n"
+                else:
+                    yield (b"" if first else b",") + b",".join(items)
+                first = False
+            # Keep memory flat: the identity map would otherwise grow with the export
+            db.expunge_all()
+            if after is None:
+                break
+        if fmt == "json":
+            yield b"]"
+    finally:
+        db.close()
+
+
+def paginated_files(
+    build_query: Callable[[Session], OrmQuery],
+    db: Session,
+    response: Response,
+    cursor: Optional[str],
+    limit: int,
+    include_urls: bool,
+    stream: Optional[StreamFormat],
+):
+    """
+    Shared body of the listing endpoints. Returns one keyset page as a JSON
+    array with the next page's cursor in the X-Next-Cursor header, or, when
+    `stream` is set, the whole result set as a streamed NDJSON/JSON array.
+    """
+    if stream:
+        media_type = "application/x-ndjson" if stream == "ndjson" else "application/json"
+        return StreamingResponse(_stream_files(build_query, include_urls, stream), media_type=media_type)
+
+    after = decode_cursor(cursor) if cursor else None
+    files, next_key = keyset_page(build_query(db), FileModel, after, limit)
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_key)
+    return responses.render(files_to_dicts(files, include_urls=include_urls), response)
+
+
 # ---------------- LIST FILES (My Drive) ----------------
 @router.get("")
+@query_budget(3)
 def list_files(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    urls: bool = True,
+    stream: Optional[StreamFormat] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    files = (
-        db.query(FileModel)
-        .filter(FileModel.owner_id == user.id, FileModel.is_deleted == False)
-        .order_by(FileModel.created_at.desc())
-        .all()
-    )
-    return [file_to_dict(f) for f in files]
+    def build_query(session: Session) -> OrmQuery:
+        return session.query(FileModel).filter(
+            FileModel.owner_id == user.id, FileModel.is_deleted == False
+        )
+
+    return paginated_files(build_query, db, response, cursor, limit, urls, stream)
+
+
+# ---------------- USAGE ----------------
+@router.get("/usage")
+def get_usage(
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    return usage.usage_to_dict(db, user.id)
 
 
 # ---------------- UPLOAD ----------------
 @router.post("/upload")
-def upload_file(
+async def upload_file(
     file: UploadFile = FastAPIFile(...),
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    # Upload file to Supabase storage (returns storage_path)
-    storage_path = upload_file_to_supabase(file, str(user.id))
+    length = upload_length(file)
+    if not length:
+        raise HTTPException(400, "Uploaded file is empty")
+    await run_in_threadpool(usage.check_quota, db, user.id, length)
 
+    # Stream file to storage in chunks, hashing on the way; the backend reports the bytes written
+    try:
+        staged = await dedup.stage_upload(iter_upload_file(file), length, file.content_type)
+        blob = await dedup.publish(db, staged)
+    except StorageError:
+        logger.exception("Failed to upload %s", file.filename)
+        raise HTTPException(500, "Failed to upload file to storage")
+
+    storage_path = blob.storage_path
     new_file = FileModel(
         name=file.filename,
         owner_id=user.id,
         mime_type=file.content_type,
-        size=getattr(file, "size", None) or 0,
+        size=staged.size,
         storage_path=storage_path,
+        content_hash=blob.hash,
         is_deleted=False,
         is_starred=False,
     )
 
-    db.add(new_file)
-    db.commit()
-    db.refresh(new_file)
+    def save():
+        db.add(new_file)
+        usage.record_upload(db, user.id, new_file.size)
+        thumbnails.schedule(db, new_file)
+        db.commit()
+        db.refresh(new_file)
+
+    await run_in_threadpool(save)
 
     # Return file metadata + signed URL for frontend to fetch
-    return file_to_dict(new_file)
+    url = None
+    try:
+        url = await signed_urls.get_signed_url(storage_path)
+    except Exception:
+        # The upload itself succeeded; the client can sign lazily later
+        logger.exception("Failed to create signed URL for %s", storage_path)
+    return file_to_dict(new_file, url)
+
+
+# ---------------- DEDUP (hash first) ----------------
+@router.post("/dedup")
+async def create_from_hash(
+    data: DedupRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Create a file from content the server already stores, identified by its
+    SHA-256, so the client can skip the upload. Answers 404 when the content
+    is unknown and has to be uploaded normally.
+
+    Unless DEDUP_CROSS_USER_CLAIM is enabled, only content the caller already
+    has a file for is matched: otherwise knowing a hash would be enough to
+    obtain someone else's file.
+    """
+    def claim():
+        if data.folder_id:
+            folder_tree.get_owned_folder(db, data.folder_id, user.id)
+        if not DEDUP_CROSS_USER_CLAIM:
+            owned = (
+                db.query(FileModel.id)
+                .filter(FileModel.owner_id == user.id, FileModel.content_hash == data.sha256)
+                .first()
+            )
+            if owned is None:
+                return None
+
+        usage.check_quota(db, user.id, data.size)
+        blob = dedup.add_reference(db, data.sha256)
+        if blob is None or blob.size != data.size:
+            db.rollback()
+            return None
+
+        new_file = FileModel(
+            name=data.name,
+            owner_id=user.id,
+            folder_id=data.folder_id,
+            mime_type=data.mime_type,
+            size=blob.size,
+            storage_path=blob.storage_path,
+            content_hash=blob.hash,
+            is_deleted=False,
+            is_starred=False,
+        )
+        db.add(new_file)
+        usage.record_upload(db, user.id, new_file.size)
+        thumbnails.schedule(db, new_file)
+        db.commit()
+        db.refresh(new_file)
+        return new_file
+
+    new_file = await run_in_threadpool(claim)
+    if new_file is None:
+        raise HTTPException(404, "Content not found; upload the file")
+
+    url = None
+    try:
+        url = await signed_urls.get_signed_url(new_file.storage_path)
+    except Exception:
+        logger.exception("Failed to create signed URL for %s", new_file.storage_path)
+    response.status_code = 201
+    return file_to_dict(new_file, url)
+
+
+# ---------------- SIGNED URLS (lazy) ----------------
+@router.post("/urls")
+async def sign_file_urls(
+    file_ids: List[UUID],
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
+):
+    """
+    Sign URLs for a set of files in one call, for listings fetched with
+    urls=false. Shared files are signed too; ids the caller cannot read are
+    left out of the result.
+    """
+    if len(file_ids) > SIGNED_URL_BATCH_SIZE:
+        raise HTTPException(400, f"At most {SIGNED_URL_BATCH_SIZE} files per request")
+
+    rows = await run_in_threadpool(readable_storage_paths, db, file_ids, acl)
+    urls = await signed_urls.get_signed_urls(path for _, path in rows)
+    return {str(file_id): urls.get(path) for file_id, path in rows}
+
+
+# ---------------- BULK ----------------
+@router.post("/bulk")
+async def bulk_files(
+    data: BulkFileRequest,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Apply one action to many files in a single transaction. Every id gets a
+    result ("ok" or "not_found"); storage of permanently deleted files is
+    removed afterwards by a background job (see GET /jobs/{job_id}).
+    """
+    file_ids = list(dict.fromkeys(data.file_ids))
+
+    if data.action == "delete":
+        def remove_rows():
+            deleted, orphans, legacy_paths = file_service.bulk_delete(db, file_ids, user.id)
+            job_id = dedup.schedule_purge(db, orphans, legacy_paths, owner_id=user.id)
+            db.commit()
+            return deleted, job_id
+
+        deleted, job_id = await run_in_threadpool(remove_rows)
+        results = file_service.bulk_results(file_ids, deleted)
+        results["job_id"] = str(job_id) if job_id else None
+        return results
+
+    def apply():
+        if data.action == "move" and data.folder_id:
+            folder_tree.get_owned_folder(db, data.folder_id, user.id)
+        changed = file_service.bulk_update(db, data.action, file_ids, user.id, data.folder_id)
+        db.commit()
+        return changed
+
+    return file_service.bulk_results(file_ids, await run_in_threadpool(apply))
 
 
 # ---------------- SEARCH ----------------
 @router.get("/search")
 def search_files(
-    q: str,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=search.MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    urls: bool = True,
+    stream: Optional[StreamFormat] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    files = (
-        db.query(FileModel)
-        .filter(
+    def build_query(session: Session) -> OrmQuery:
+        return session.query(FileModel).filter(
             FileModel.owner_id == user.id,
             FileModel.is_deleted == False,
-            FileModel.name.ilike(f"%{q}%"),
         )
-        .all()
-    )
-    return [file_to_dict(f) for f in files]
+
+    if stream:
+        # Exports are unranked, newest first like every other listing
+        def matching(session: Session) -> OrmQuery:
+            return build_query(session).filter(search.name_matches(FileModel, q))
+
+        return paginated_files(matching, db, response, cursor, limit, urls, stream)
+
+    # Ranked results; the cursor is an offset into the ranking
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    files, next_offset = search.search(db, build_query(db), FileModel, user.id, q, offset, limit)
+    if next_offset is not None:
+        response.headers["X-Next-Cursor"] = encode_offset_cursor(next_offset)
+    return responses.render(files_to_dicts(files, include_urls=urls), response)
 
 
 # ---------------- TRASH ----------------
 @router.get("/trash")
 def list_trash(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    urls: bool = True,
+    stream: Optional[StreamFormat] = None,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    files = (
-        db.query(FileModel)
-        .filter(FileModel.owner_id == user.id, FileModel.is_deleted == True)
-        .all()
-    )
-    return [file_to_dict(f) for f in files]
+    def build_query(session: Session) -> OrmQuery:
+        return session.query(FileModel).filter(
+            FileModel.owner_id == user.id, FileModel.is_deleted == True
+        )
+
+    return paginated_files(build_query, db, response, cursor, limit, urls, stream)
 
 
 # ---------------- STAR / UNSTAR ----------------
@@ -161,7 +467,9 @@ def move_to_trash(
     if not file:
         raise HTTPException(404, "File not found")
 
-    file.is_deleted = True
+    file_service.soft_delete_file(file)
+    # Public links to a trashed file stop resolving
+    link_shares.invalidate_files(db, [file.id])
     db.commit()
 
     return {"message": "Moved to trash"}
@@ -187,7 +495,7 @@ def restore_file(
     if not file:
         raise HTTPException(404, "File not found in trash")
 
-    file.is_deleted = False
+    file_service.restore_file(file)
     db.commit()
 
     return {"message": "Restored"}
@@ -200,43 +508,87 @@ def permanent_delete(
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    file = (
-        db.query(FileModel)
-        .filter(FileModel.id == file_id, FileModel.owner_id == user.id)
-        .first()
-    )
+    file = get_owned_file(db, file_id, user.id)
 
-    if not file:
+    # Drop the row and its blob reference; removing the object (only once no
+    # other file references the same content) is queued as a background job
+    deleted, orphans, legacy_paths = file_service.bulk_delete(db, [file.id], user.id)
+    if not deleted:
+        # Removed by a concurrent delete since it was loaded
         raise HTTPException(404, "File not found")
-
-    # delete from supabase then DB row
-    try:
-        delete_file_from_supabase(file.storage_path)
-    except Exception:
-        logger.exception("Failed to delete from supabase: %s", file.storage_path)
-        raise HTTPException(500, "Failed to delete file from storage")
-
-    db.delete(file)
+    job_id = dedup.schedule_purge(db, orphans, legacy_paths, owner_id=user.id)
     db.commit()
 
-    return {"message": "Permanently deleted"}
+    return {"message": "Permanently deleted", "job_id": str(job_id) if job_id else None}
 
 
 # ---------------- VIEW / DOWNLOAD ----------------
 @router.get("/{file_id}/view")
-def view_file(
+async def view_file(
     file_id: UUID,
     db: Session = Depends(get_db),
-    user=Depends(get_current_user),
+    acl: Acl = Depends(get_acl),
 ):
-    file = (
-        db.query(FileModel)
-        .filter(FileModel.id == file_id, FileModel.owner_id == user.id)
-        .first()
+    file = await run_in_threadpool(get_readable_file, db, file_id, acl)
+
+    try:
+        signed_url = await signed_urls.get_signed_url(file.storage_path)
+    except Exception:
+        raise HTTPException(500, "Failed to create signed URL")
+    return {"url": signed_url}
+
+@router.api_route("/{file_id}/download", methods=["GET", "HEAD"])
+async def download_file(
+    file_id: UUID,
+    request: Request,
+    inline: bool = False,
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
+):
+    """
+    Stream the file through the API with Range (including multipart ranges),
+    ETag / If-None-Match and If-Range support. Clients revalidate on every use
+    and get a 304 while the content is unchanged.
+    """
+    file = await run_in_threadpool(get_readable_file, db, file_id, acl)
+
+    size = file.size
+    if size is None:
+        stat = await get_storage().stat(file.storage_path)
+        if stat is None:
+            raise HTTPException(404, "File content not found")
+        size = stat.size
+
+    headers = {
+        "cache-control": "private, no-cache",
+        "content-disposition": downloads.content_disposition(file.name, inline),
+    }
+    return downloads.ranged_response(
+        request, file.storage_path, size, downloads.file_etag(file), file.mime_type, headers
     )
 
-    if not file:
-        raise HTTPException(404, "File not found")
 
-    signed_url = generate_signed_url(file.storage_path)
-    return {"url": signed_url}
\ No newline at end of file
+@router.get("/{file_id}/thumbnail")
+async def get_thumbnail(
+    file_id: UUID,
+    request: Request,
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
+):
+    """The file's preview image, rendered now if the background job has not made it yet."""
+    file = await run_in_threadpool(get_readable_file, db, file_id, acl)
+
+    path = file.thumbnail_path
+    if path is None:
+        if not thumbnails.supported(file.mime_type, file.size):
+            raise HTTPException(404, "No preview available for this file")
+        path = await thumbnails.generate(file.storage_path, file.mime_type, file.content_hash)
+        if path is None:
+            raise HTTPException(404, "No preview available for this file")
+
+    stat = await get_storage().stat(path)
+    if stat is None:
+        raise HTTPException(404, "No preview available for this file")
+    # Thumbnails change only with the content, so clients can cache them a while
+    headers = {"cache-control": "private, max-age=86400"}
+    return downloads.ranged_response(request, path, stat.size, stat.etag, "image/jpeg", headers)
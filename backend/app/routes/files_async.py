@@ -0,0 +1,230 @@
+"""
+Async versions of the hot /files routes, served from an AsyncSession when
+DB_ASYNC is enabled. main.py includes this router ahead of routes/files.py,
+so these handlers shadow their sync counterparts; everything not defined here
+(uploads, dedup, ...) is still served by the sync router.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, Query as OrmQuery
+from uuid import UUID
+from typing import List, Optional
+import logging
+
+from app.database import get_async_db
+from app.core import responses
+from app.core.deps import get_current_user_async
+from app.core.config import SIGNED_URL_BATCH_SIZE, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.models.file import File as FileModel
+from app.routes.files import (
+    StreamFormat,
+    files_to_dicts_async,
+    get_readable_file,
+    paginated_files,
+    readable_storage_paths,
+)
+from app.services import dedup, file_service, link_shares, search, signed_urls
+from app.services.permissions import Acl
+from app.services.pagination import (
+    encode_cursor,
+    decode_cursor,
+    encode_offset_cursor,
+    decode_offset_cursor,
+    keyset_page_async,
+)
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/files", tags=["Files"])
+
+
+async def get_owned_file(db: AsyncSession, file_id: UUID, user_id, *filters) -> FileModel:
+    stmt = select(FileModel).where(FileModel.id == file_id, FileModel.owner_id == user_id, *filters)
+    file = (await db.execute(stmt)).scalar_one_or_none()
+    if not file:
+        raise HTTPException(404, "File not found")
+    return file
+
+
+async def paginated_files_async(
+    filters: list,
+    db: AsyncSession,
+    response: Response,
+    cursor: Optional[str],
+    limit: int,
+    include_urls: bool,
+    stream: Optional[StreamFormat],
+):
+    """Async paginated_files; streamed exports still run on the sync path."""
+    if stream:
+        def build_query(session: Session) -> OrmQuery:
+            return session.query(FileModel).filter(*filters)
+
+        return paginated_files(build_query, None, response, cursor, limit, include_urls, stream)
+
+    after = decode_cursor(cursor) if cursor else None
+    files, next_key = await keyset_page_async(db, select(FileModel).where(*filters), FileModel, after, limit)
+    if next_key is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(*next_key)
+    return responses.render(await files_to_dicts_async(files, include_urls=include_urls), response)
+
+
+# ---------------- LIST FILES (My Drive) ----------------
+@router.get("")
+async def list_files(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    urls: bool = True,
+    stream: Optional[StreamFormat] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    filters = [FileModel.owner_id == user.id, FileModel.is_deleted == False]
+    return await paginated_files_async(filters, db, response, cursor, limit, urls, stream)
+
+
+# ---------------- SIGNED URLS (lazy) ----------------
+@router.post("/urls")
+async def sign_file_urls(
+    file_ids: List[UUID],
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    if len(file_ids) > SIGNED_URL_BATCH_SIZE:
+        raise HTTPException(400, f"At most {SIGNED_URL_BATCH_SIZE} files per request")
+
+    rows = await db.run_sync(lambda session: readable_storage_paths(session, file_ids, Acl(session, user.id)))
+    urls = await signed_urls.get_signed_urls(path for _, path in rows)
+    return {str(file_id): urls.get(path) for file_id, path in rows}
+
+
+# ---------------- SEARCH ----------------
+@router.get("/search")
+async def search_files(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=search.MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    urls: bool = True,
+    stream: Optional[StreamFormat] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    filters = [FileModel.owner_id == user.id, FileModel.is_deleted == False]
+    if stream:
+        filters.append(search.name_matches(FileModel, q))
+        return await paginated_files_async(filters, db, response, cursor, limit, urls, stream)
+
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    # The search service is written against Query; run_sync drives it on the
+    # async connection without leaving the event loop
+    files, next_offset = await db.run_sync(
+        lambda session: search.search(
+            session, session.query(FileModel).filter(*filters), FileModel, user.id, q, offset, limit
+        )
+    )
+    if next_offset is not None:
+        response.headers["X-Next-Cursor"] = encode_offset_cursor(next_offset)
+    return responses.render(await files_to_dicts_async(files, include_urls=urls), response)
+
+
+# ---------------- TRASH ----------------
+@router.get("/trash")
+async def list_trash(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    urls: bool = True,
+    stream: Optional[StreamFormat] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    filters = [FileModel.owner_id == user.id, FileModel.is_deleted == True]
+    return await paginated_files_async(filters, db, response, cursor, limit, urls, stream)
+
+
+# ---------------- STAR / UNSTAR ----------------
+@router.patch("/{file_id}/star")
+async def toggle_star(
+    file_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    file = await get_owned_file(db, file_id, user.id)
+    file.is_starred = not file.is_starred
+    await db.commit()
+
+    return {"starred": file.is_starred}
+
+
+# ---------------- MOVE TO TRASH ----------------
+@router.delete("/{file_id}")
+async def move_to_trash(
+    file_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    file = await get_owned_file(db, file_id, user.id, FileModel.is_deleted == False)
+    file_service.soft_delete_file(file)
+    # Public links to a trashed file stop resolving
+    await db.run_sync(link_shares.invalidate_files, [file.id])
+    await db.commit()
+
+    return {"message": "Moved to trash"}
+
+
+# ---------------- RESTORE ----------------
+@router.patch("/{file_id}/restore")
+async def restore_file(
+    file_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    try:
+        file = await get_owned_file(db, file_id, user.id, FileModel.is_deleted == True)
+    except HTTPException:
+        raise HTTPException(404, "File not found in trash")
+    file_service.restore_file(file)
+    await db.commit()
+
+    return {"message": "Restored"}
+
+
+# ---------------- PERMANENT DELETE ----------------
+@router.delete("/{file_id}/permanent")
+async def permanent_delete(
+    file_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    file = await get_owned_file(db, file_id, user.id)
+
+    def remove_row(session: Session):
+        deleted, orphans, legacy_paths = file_service.bulk_delete(session, [file.id], user.id)
+        if not deleted:
+            # Removed by a concurrent delete since it was loaded
+            raise HTTPException(404, "File not found")
+        return dedup.schedule_purge(session, orphans, legacy_paths, owner_id=user.id)
+
+    job_id = await db.run_sync(remove_row)
+    await db.commit()
+
+    return {"message": "Permanently deleted", "job_id": str(job_id) if job_id else None}
+
+
+# ---------------- VIEW / DOWNLOAD ----------------
+@router.get("/{file_id}/view")
+async def view_file(
+    file_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user_async),
+):
+    file = await db.run_sync(lambda session: get_readable_file(session, file_id, Acl(session, user.id)))
+
+    try:
+        signed_url = await signed_urls.get_signed_url(file.storage_path)
+    except Exception:
+        raise HTTPException(500, "Failed to create signed URL")
+    return {"url": signed_url}
@@ -1,55 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, Query as OrmQuery
+from typing import Optional
 from uuid import UUID
 
-from app.database import SessionLocal
+from app.database import get_db
+from app.models.file import File as FileModel
 from app.models.folder import Folder
-from app.schemas.folder import FolderCreate, FolderResponse
+from app.schemas.folder import FolderCreate, FolderMove, FolderResponse
 from app.core.deps import get_current_user
+from app.core.sql_profiler import query_budget
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.routes.files import StreamFormat, paginated_files
+from app.services import folder_tree, search
+from app.services.pagination import encode_offset_cursor, decode_offset_cursor
+from app.services.permissions import Acl, get_acl
 
 router = APIRouter(prefix="/folders", tags=["Folders"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=FolderResponse)
 def create_folder(
     data: FolderCreate,
     db: Session = Depends(get_db),
     user = Depends(get_current_user)
 ):
-    folder = Folder(
-        name=data.name,
-        parent_id=data.parent_id,
-        owner_id=user.id
-    )
-    db.add(folder)
+    folder = folder_tree.create_folder(db, data.name, data.parent_id, user.id)
     db.commit()
     db.refresh(folder)
     return folder
 
-@router.get("/{folder_id}", response_model=list[FolderResponse])
-def list_subfolders(
-    folder_id: UUID,
+@router.get("/tree")
+def full_tree(
+    sizes: bool = False,
     db: Session = Depends(get_db),
     user = Depends(get_current_user)
 ):
-    return db.query(Folder).filter(
-        Folder.parent_id == folder_id,
-        Folder.owner_id == user.id
-    ).all()
+    """Every folder of the user, nested, in one query (plus one for sizes)."""
+    folders = db.query(Folder).filter(Folder.owner_id == user.id).all()
+    totals = folder_tree.recursive_sizes(db, user.id) if sizes else None
+    return folder_tree.build_tree(folders, totals)
 
-@router.get("/search")
+# Declared before /{folder_id} so "search" is not parsed as a folder id
+@router.get("/search", response_model=list[FolderResponse])
 def search_folders(
-    q: str,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=search.MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    query = db.query(Folder).filter(Folder.owner_id == user.id)
+    folders, next_offset = search.search(db, query, Folder, user.id, q, offset, limit)
+    if next_offset is not None:
+        response.headers["X-Next-Cursor"] = encode_offset_cursor(next_offset)
+    return folders
+
+@router.get("/{folder_id}/tree")
+def subtree(
+    folder_id: UUID,
+    depth: Optional[int] = Query(None, ge=0),
+    sizes: bool = False,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """The folder and its descendants (down to `depth` levels), nested."""
+    folder = folder_tree.get_owned_folder(db, folder_id, user.id)
+    folders = folder_tree.subtree(db, folder, depth)
+    totals = folder_tree.recursive_sizes(db, user.id, folder.path) if sizes else None
+    return folder_tree.build_tree(folders, totals)[0]
+
+@router.get("/{folder_id}/ancestors")
+def breadcrumbs(
+    folder_id: UUID,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """Path from the top level down to the folder itself."""
+    folder = folder_tree.get_owned_folder(db, folder_id, user.id)
+    return [folder_tree.folder_to_dict(f) for f in folder_tree.ancestors(db, folder)]
+
+@router.get("/{folder_id}/size")
+def folder_size(
+    folder_id: UUID,
     db: Session = Depends(get_db),
     user = Depends(get_current_user)
 ):
-    return db.query(Folder).filter(
-        Folder.owner_id == user.id,
-        Folder.name.ilike(f"%{q}%")
-    ).all()
+    """Total size and file count, including subfolders."""
+    folder = folder_tree.get_owned_folder(db, folder_id, user.id)
+    totals = folder_tree.recursive_sizes(db, user.id, folder.path)
+    return {"id": str(folder.id), **totals[folder.id]}
+
+@router.patch("/{folder_id}/move", response_model=FolderResponse)
+def move_folder(
+    folder_id: UUID,
+    data: FolderMove,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    folder = folder_tree.get_owned_folder(db, folder_id, user.id)
+    new_parent = folder_tree.get_owned_folder(db, data.parent_id, user.id) if data.parent_id else None
+    folder_tree.move_folder(db, folder, new_parent)
+    db.commit()
+    db.refresh(folder)
+    return folder
+
+@router.get("/{folder_id}/files")
+@query_budget(4)
+def list_folder_files(
+    folder_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    urls: bool = True,
+    stream: Optional[StreamFormat] = None,
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl)
+):
+    """Files directly in a folder the caller owns or has been shared."""
+    owner_id = acl.require_folder(db.query(Folder).filter(Folder.id == folder_id).first()).owner_id
+
+    def build_query(session: Session) -> OrmQuery:
+        # Only the folder owner's files: a row pointing here from another account is not part of it
+        return session.query(FileModel).filter(
+            FileModel.folder_id == folder_id, FileModel.owner_id == owner_id, FileModel.is_deleted == False
+        )
+
+    return paginated_files(build_query, db, response, cursor, limit, urls, stream)
+
+@router.get("/{folder_id}", response_model=list[FolderResponse])
+@query_budget(4)
+def list_subfolders(
+    folder_id: UUID,
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl)
+):
+    # Subfolders always belong to the parent's owner, so access to the parent covers them
+    acl.require_folder(db.query(Folder).filter(Folder.id == folder_id).first())
+    return db.query(Folder).filter(Folder.parent_id == folder_id).all()
@@ -0,0 +1,79 @@
+"""Async /folders routes (DB_ASYNC); included ahead of routes/folders.py."""
+
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional
+from uuid import UUID
+
+from app.database import get_async_db
+from app.models.folder import Folder
+from app.schemas.folder import FolderCreate, FolderResponse
+from app.core.deps import get_current_user_async
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services import folder_tree, search
+from app.services.pagination import encode_offset_cursor, decode_offset_cursor
+from app.services.permissions import Acl
+
+router = APIRouter(prefix="/folders", tags=["Folders"])
+
+@router.post("/", response_model=FolderResponse)
+async def create_folder(
+    data: FolderCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    folder = await db.run_sync(
+        lambda session: folder_tree.create_folder(session, data.name, data.parent_id, user.id)
+    )
+    await db.commit()
+    await db.refresh(folder)
+    return folder
+
+# Literal paths are declared before /{folder_id}: this router is included
+# ahead of the sync one, so its /{folder_id} would otherwise claim them
+@router.get("/tree")
+async def full_tree(
+    sizes: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    """Every folder of the user, nested, in one query (plus one for sizes)."""
+    def load(session: Session):
+        folders = session.query(Folder).filter(Folder.owner_id == user.id).all()
+        totals = folder_tree.recursive_sizes(session, user.id) if sizes else None
+        return folder_tree.build_tree(folders, totals)
+
+    return await db.run_sync(load)
+
+@router.get("/search", response_model=list[FolderResponse])
+async def search_folders(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=search.MAX_QUERY_LENGTH),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    folders, next_offset = await db.run_sync(
+        lambda session: search.search(
+            session, session.query(Folder).filter(Folder.owner_id == user.id), Folder, user.id, q, offset, limit
+        )
+    )
+    if next_offset is not None:
+        response.headers["X-Next-Cursor"] = encode_offset_cursor(next_offset)
+    return folders
+
+@router.get("/{folder_id}", response_model=list[FolderResponse])
+async def list_subfolders(
+    folder_id: UUID,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    def load(session: Session):
+        acl = Acl(session, user.id)
+        acl.require_folder(session.query(Folder).filter(Folder.id == folder_id).first())
+        return session.query(Folder).filter(Folder.parent_id == folder_id).all()
+
+    return await db.run_sync(load)
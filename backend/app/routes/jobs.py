@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Depends, HTTPException
+from uuid import UUID
+
+from app.core.deps import get_current_user
+from app.services import jobs
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+@router.get("/{job_id}")
+def get_job(job_id: UUID, user=Depends(get_current_user)):
+    """Status of a background job started by one of the caller's requests."""
+    status = jobs.get_status(job_id, user.id)
+    if status is None:
+        raise HTTPException(404, "Job not found")
+    return status
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Request
+
+from app.services.downloads import ranged_response
+from app.services.storage import StorageError, get_storage
+from app.utils.local_storage import verify_signature
+
+router = APIRouter(prefix="/storage/local", tags=["Storage"])
+
+
+# ---------------- SIGNED DOWNLOAD (local backend) ----------------
+@router.api_route("/{path:path}", methods=["GET", "HEAD"])
+async def serve_local_object(
+    path: str,
+    request: Request,
+    expires: int,
+    signature: str,
+):
+    if not verify_signature(path, expires, signature):
+        raise HTTPException(403, "Invalid or expired signature")
+
+    storage = get_storage()
+    try:
+        stat = await storage.stat(path)
+    except StorageError:
+        stat = None
+    if stat is None:
+        raise HTTPException(404, "Object not found")
+
+    return ranged_response(request, path, stat.size, stat.etag, stat.content_type)
@@ -0,0 +1,39 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app import database
+from app.core import compression, metrics, user_cache
+from app.core.config import METRICS_TOKEN, METRICS_PUBLIC
+from app.core.deps import get_current_user, require_admin
+from app.services import jobs, link_shares, trash
+
+router = APIRouter(tags=["Metrics"])
+
+metrics.collector("user_cache", user_cache.stats)
+metrics.collector("db_pool", database.pool_stats)
+metrics.collector("jobs", jobs.stats)
+metrics.collector("trash_purge", trash.stats)
+metrics.collector("public_links", link_shares.stats)
+metrics.collector("compression", compression.stats)
+
+
+def _authorize(authorization: Optional[str]) -> None:
+    """The METRICS_TOKEN bearer or an admin's access token, unless METRICS_PUBLIC."""
+    if METRICS_PUBLIC:
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(401, "Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    if METRICS_TOKEN and hmac.compare_digest(token, METRICS_TOKEN):
+        return
+    require_admin(get_current_user(token))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text exposition of this process's metrics."""
+    _authorize(authorization)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,36 +1,167 @@
-from fastapi import APIRouter, Depends
+import secrets
+from datetime import timezone
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from uuid import uuid4
 
-from app.database import SessionLocal
+from app.database import get_db
+from app.models.file import File as FileModel
+from app.models.folder import Folder
 from app.models.link_share import LinkShare
 from app.schemas.link_share import LinkShareCreate
+from app.services import downloads, link_shares, signed_urls
+from app.services.link_shares import LinkedFile, ResolvedLink
+from app.services.permissions import Acl, get_acl
+from app.services.storage import get_storage
+from app.utils.hashing import hash_password_async
 
 router = APIRouter(prefix="/public-link", tags=["Public Sharing"])
+public_router = APIRouter(prefix="/public", tags=["Public Sharing"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+# ---------------- MANAGE ----------------
 @router.post("/")
-def create_public_link(
+async def create_public_link(
     data: LinkShareCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
 ):
-    token = str(uuid4())
+    """Create a public link to a file or folder the caller owns."""
+    def check_owner():
+        if data.file_id:
+            acl.require_file(db.query(FileModel).filter(FileModel.id == data.file_id).first(), "delete")
+        else:
+            acl.require_folder(db.query(Folder).filter(Folder.id == data.folder_id).first(), "delete")
+
+    await run_in_threadpool(check_owner)
+
+    password = await hash_password_async(data.password) if data.password else None
+    expires_at = data.expires_at
+    if expires_at is not None and expires_at.tzinfo is not None:
+        # Stored naive UTC like every other timestamp
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
 
+    token = secrets.token_urlsafe(32)
     link = LinkShare(
         token=token,
         file_id=data.file_id,
         folder_id=data.folder_id,
-        password=data.password,
-        expires_at=data.expires_at
+        owner_id=acl.user_id,
+        password=password,
+        expires_at=expires_at,
     )
 
-    db.add(link)
+    def save():
+        db.add(link)
+        db.commit()
+
+    await run_in_threadpool(save)
+    return {"public_url": f"/public/{token}", "token": token}
+
+
+@router.delete("/{token}")
+def delete_public_link(
+    token: str,
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
+):
+    link = db.query(LinkShare).filter(LinkShare.token == token).first()
+    if link is None:
+        raise HTTPException(404, "Link not found")
+    if link.owner_id != acl.user_id:
+        # Links made before owner_id existed: fall back to owning the target
+        if link.file_id:
+            acl.require_file(db.query(FileModel).filter(FileModel.id == link.file_id).first(), "delete")
+        else:
+            acl.require_folder(db.query(Folder).filter(Folder.id == link.folder_id).first(), "delete")
+
+    db.delete(link)
     db.commit()
+    return {"message": "Link deleted"}
+
+
+# ---------------- RESOLVE ----------------
+async def _open_link(request: Request, token: str, password: Optional[str]) -> ResolvedLink:
+    link = await link_shares.resolve(token)
+    if link is None:
+        raise HTTPException(404, "Link not found")
+    if link.expired:
+        raise HTTPException(410, "Link has expired")
+    client = request.client.host if request.client else None
+    if not await link_shares.check_password(link, password, client):
+        raise HTTPException(401, "Password required" if not password else "Wrong password")
+    return link
+
+
+async def _serve(request: Request, link: ResolvedLink, file: LinkedFile, download: bool):
+    # Count whole downloads: not HEADs, revalidations or resumed ranges
+    range_header = request.headers.get("range")
+    if request.method == "GET" and (not range_header or range_header.replace(" ", "").startswith("bytes=0-")):
+        if request.headers.get("if-none-match") != downloads.file_etag(file):
+            link_shares.record_download(link.id)
+
+    if not download:
+        try:
+            url = await signed_urls.get_signed_url(file.storage_path)
+        except Exception:
+            raise HTTPException(500, "Failed to create signed URL")
+        return RedirectResponse(url, status_code=302, headers={"cache-control": "no-store"})
+
+    size = file.size
+    if size is None:
+        stat = await get_storage().stat(file.storage_path)
+        if stat is None:
+            raise HTTPException(404, "File content not found")
+        size = stat.size
+
+    headers = {
+        "cache-control": "private, no-cache",
+        "content-disposition": downloads.content_disposition(file.name),
+    }
+    return downloads.ranged_response(
+        request, file.storage_path, size, downloads.file_etag(file), file.mime_type, headers
+    )
+
+
+@public_router.api_route("/{token}", methods=["GET", "HEAD"])
+async def open_public_link(
+    token: str,
+    request: Request,
+    download: bool = False,
+    x_link_password: Optional[str] = Header(None),
+):
+    """
+    A file link redirects to a signed URL, or with ?download=true streams the
+    file with Range/ETag support. A folder link lists the folder's files.
+    Password-protected links take the password in the X-Link-Password header,
+    never the query string, which ends up in access and proxy logs.
+    """
+    link = await _open_link(request, token, x_link_password)
+    if link.file is not None:
+        return await _serve(request, link, link.file, download)
+
+    files = await run_in_threadpool(link_shares.list_folder_files, link)
+    return {"folder_id": str(link.folder_id), "files": files}
+
+
+@public_router.api_route("/{token}/files/{file_id}", methods=["GET", "HEAD"])
+async def open_public_folder_file(
+    token: str,
+    file_id: UUID,
+    request: Request,
+    download: bool = False,
+    x_link_password: Optional[str] = Header(None),
+):
+    """A file inside a folder link's folder (or its subfolders)."""
+    link = await _open_link(request, token, x_link_password)
+    if link.folder_id is None:
+        raise HTTPException(404, "File not found")
 
-    return {"public_url": f"/public/{token}"}
+    file = await run_in_threadpool(link_shares.find_folder_file, link, file_id)
+    if file is None:
+        raise HTTPException(404, "File not found")
+    return await _serve(request, link, file, download)
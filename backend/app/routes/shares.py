@@ -1,33 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from typing import Optional
 from uuid import UUID
 
-from app.database import SessionLocal
+from app.database import get_db
+from app.models.file import File as FileModel
+from app.models.folder import Folder
 from app.models.share import Share
+from app.models.user import User
 from app.schemas.share import ShareCreate
+from app.core import responses
 from app.core.deps import get_current_user
+from app.routes.files import files_to_dicts
+from app.services import folder_tree
+from app.services.permissions import Acl, get_acl
 
 router = APIRouter(prefix="/shares", tags=["Sharing"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def share_to_dict(share: Share) -> dict:
+    return {
+        "id": str(share.id),
+        "user_id": str(share.user_id),
+        "file_id": str(share.file_id) if share.file_id else None,
+        "folder_id": str(share.folder_id) if share.folder_id else None,
+        "role": share.role,
+        "created_at": share.created_at.isoformat() if share.created_at else None,
+    }
+
+
+def create_share(db: Session, acl: Acl, data: ShareCreate) -> Share:
+    """Grant (or change) a user's role on a file or folder the caller owns; commits."""
+    if data.user_id == acl.user_id:
+        raise HTTPException(400, "Cannot share with yourself")
+    if db.query(User.id).filter(User.id == data.user_id).first() is None:
+        raise HTTPException(404, "User not found")
+
+    if data.file_id:
+        acl.require_file(db.query(FileModel).filter(FileModel.id == data.file_id).first(), "delete")
+        target = Share.file_id == data.file_id
+    else:
+        acl.require_folder(db.query(Folder).filter(Folder.id == data.folder_id).first(), "delete")
+        target = Share.folder_id == data.folder_id
+
+    share = db.query(Share).filter(Share.user_id == data.user_id, target).first()
+    if share is None:
+        share = Share(user_id=data.user_id, file_id=data.file_id, folder_id=data.folder_id, role=data.role)
+        db.add(share)
+    else:
+        share.role = data.role
+    db.commit()
+    db.refresh(share)
+    return share
+
 
 @router.post("/")
 def share_resource(
     data: ShareCreate,
     db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
+):
+    share = create_share(db, acl, data)
+    return {"message": "Resource shared successfully", "share": share_to_dict(share)}
+
+
+# ---------------- SHARED WITH ME ----------------
+@router.get("/with-me")
+def shared_with_me(
+    urls: bool = True,
+    db: Session = Depends(get_db),
     user = Depends(get_current_user)
 ):
-    share = Share(
-        user_id=data.user_id,
-        file_id=data.file_id,
-        folder_id=data.folder_id,
-        role=data.role
+    """Files and folders shared directly with the caller, with the role granted."""
+    file_rows = (
+        db.query(FileModel, Share.role)
+        .join(Share, Share.file_id == FileModel.id)
+        .filter(Share.user_id == user.id, FileModel.is_deleted == False)
+        .order_by(Share.created_at.desc())
+        .all()
+    )
+    folder_rows = (
+        db.query(Folder, Share.role)
+        .join(Share, Share.folder_id == Folder.id)
+        .filter(Share.user_id == user.id)
+        .order_by(Share.created_at.desc())
+        .all()
     )
-    db.add(share)
+
+    files = files_to_dicts([f for f, _ in file_rows], include_urls=urls)
+    for item, (_, role) in zip(files, file_rows):
+        item["role"] = role
+    folders = [{**folder_tree.folder_to_dict(f), "owner_id": str(f.owner_id), "role": role} for f, role in folder_rows]
+    return responses.render({"files": files, "folders": folders})
+
+
+# ---------------- MANAGE ----------------
+@router.get("/")
+def list_shares(
+    file_id: Optional[UUID] = Query(None),
+    folder_id: Optional[UUID] = Query(None),
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
+):
+    """Who a file or folder of the caller is shared with."""
+    if (file_id is None) == (folder_id is None):
+        raise HTTPException(400, "Pass exactly one of file_id or folder_id")
+    if file_id:
+        acl.require_file(db.query(FileModel).filter(FileModel.id == file_id).first(), "delete")
+        target = Share.file_id == file_id
+    else:
+        acl.require_folder(db.query(Folder).filter(Folder.id == folder_id).first(), "delete")
+        target = Share.folder_id == folder_id
+    return [share_to_dict(s) for s in db.query(Share).filter(target).order_by(Share.created_at)]
+
+
+@router.delete("/{share_id}")
+def revoke_share(
+    share_id: UUID,
+    db: Session = Depends(get_db),
+    acl: Acl = Depends(get_acl),
+):
+    """Remove a share: its owner revokes it, or its recipient leaves it."""
+    share = db.query(Share).filter(Share.id == share_id).first()
+    if share is None:
+        raise HTTPException(404, "Share not found")
+
+    if share.user_id != acl.user_id:
+        if share.file_id:
+            acl.require_file(db.query(FileModel).filter(FileModel.id == share.file_id).first(), "delete")
+        else:
+            acl.require_folder(db.query(Folder).filter(Folder.id == share.folder_id).first(), "delete")
+
+    db.delete(share)
     db.commit()
-    return {"message": "Resource shared successfully"}
+    return {"message": "Share removed"}
@@ -0,0 +1,21 @@
+"""Async /shares routes (DB_ASYNC); included ahead of routes/shares.py."""
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.schemas.share import ShareCreate
+from app.core.deps import get_current_user_async
+from app.routes.shares import create_share, share_to_dict
+from app.services.permissions import Acl
+
+router = APIRouter(prefix="/shares", tags=["Sharing"])
+
+@router.post("/")
+async def share_resource(
+    data: ShareCreate,
+    db: AsyncSession = Depends(get_async_db),
+    user = Depends(get_current_user_async)
+):
+    share = await db.run_sync(lambda session: create_share(session, Acl(session, user.id), data))
+    return {"message": "Resource shared successfully", "share": share_to_dict(share)}
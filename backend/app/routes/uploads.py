@@ -0,0 +1,306 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from uuid import UUID
+import hashlib
+import logging
+
+from app.database import get_db
+from app.core.deps import get_current_user
+from app.core.config import UPLOAD_CHUNK_SIZE
+from app.models.file import File as FileModel
+from app.models.upload_session import UploadSession
+from app.schemas.upload import UploadCreate
+from app.routes.files import file_to_dict
+from app.services import dedup, folder_tree, signed_urls, thumbnails, upload_sessions, usage
+from app.services.storage import StorageError, get_storage
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/uploads", tags=["Uploads"])
+
+# Resumable uploads, loosely following the TUS protocol:
+#   POST   /uploads        create a session for a file of known size
+#   HEAD   /uploads/{id}   current offset in the Upload-Offset header
+#   PATCH  /uploads/{id}   append bytes starting at the Upload-Offset header
+#   DELETE /uploads/{id}   abandon the upload
+# Bytes are forwarded to storage UPLOAD_CHUNK_SIZE at a time, so a request never
+# holds more than one chunk in memory. Every PATCH body must be a multiple of
+# the chunk size unless it finishes the file; a client that gets cut off
+# re-reads the offset with HEAD and continues from there.
+#
+# Content is hashed as it passes through so the finished upload can be
+# deduplicated. Hash state lives in this process only; if a session continues
+# on another worker or after a restart, the completed object is read back
+# from storage to hash it instead.
+
+_MAX_HASHERS = 1024
+# upload id -> (offset hashed so far, sha256 state)
+_hashers: "OrderedDict[UUID, Tuple[int, Any]]" = OrderedDict()
+
+
+def _take_hasher(session: UploadSession) -> Optional[Any]:
+    entry = _hashers.pop(session.id, None)
+    if session.offset == 0:
+        return hashlib.sha256()
+    if entry is not None and entry[0] == session.offset:
+        return entry[1]
+    return None
+
+
+def _keep_hasher(session: UploadSession, hasher: Optional[Any]) -> None:
+    if hasher is None:
+        return
+    _hashers[session.id] = (session.offset, hasher)
+    while len(_hashers) > _MAX_HASHERS:
+        _hashers.popitem(last=False)
+
+
+def upload_to_dict(session: UploadSession) -> dict:
+    return {
+        "id": str(session.id),
+        "name": session.name,
+        "size": session.size,
+        "offset": session.offset,
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+    }
+
+
+def _offset_headers(session: UploadSession) -> dict:
+    return {"Upload-Offset": str(session.offset), "Upload-Length": str(session.size)}
+
+
+def _get_session(
+    db: Session, upload_id: UUID, user_id, allow_expired: bool = False, lock: bool = False
+) -> UploadSession:
+    query = db.query(UploadSession).filter(UploadSession.id == upload_id, UploadSession.owner_id == user_id)
+    if lock:
+        query = query.with_for_update()
+    session = query.first()
+    if not session:
+        raise HTTPException(404, "Upload not found")
+
+    if not allow_expired and upload_sessions.is_expired(session):
+        raise HTTPException(404, "Upload session expired")
+    return session
+
+
+def _lock_session(db: Session, upload_id: UUID) -> bool:
+    """Lock the session row until the next commit; False if it is gone."""
+    return db.query(UploadSession.id).filter(UploadSession.id == upload_id).with_for_update().first() is not None
+
+
+# ---------------- CREATE ----------------
+@router.post("", status_code=201)
+async def create_upload(
+    data: UploadCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # Reject before any bytes are sent; chunks may never exceed the declared size
+    def check():
+        if data.folder_id:
+            folder_tree.get_owned_folder(db, data.folder_id, user.id)
+        usage.check_quota(db, user.id, data.size)
+
+    await run_in_threadpool(check)
+
+    storage_path = dedup.staging_path()
+    try:
+        upload_ref = await get_storage().start_upload(storage_path, data.size, data.mime_type)
+    except Exception:
+        logger.exception("Failed to start resumable upload for %s", storage_path)
+        raise HTTPException(500, "Failed to start upload")
+
+    session = UploadSession(
+        owner_id=user.id,
+        folder_id=data.folder_id,
+        name=data.name,
+        mime_type=data.mime_type,
+        size=data.size,
+        offset=0,
+        storage_path=storage_path,
+        upload_ref=upload_ref,
+    )
+
+    def save():
+        db.add(session)
+        db.commit()
+        db.refresh(session)
+
+    await run_in_threadpool(save)
+
+    response.headers["Location"] = f"/uploads/{session.id}"
+    response.headers.update(_offset_headers(session))
+    return upload_to_dict(session)
+
+
+# ---------------- STATUS ----------------
+@router.head("/{upload_id}")
+def upload_offset(
+    upload_id: UUID,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    session = _get_session(db, upload_id, user.id)
+    return Response(status_code=200, headers=_offset_headers(session))
+
+
+@router.get("/{upload_id}")
+def get_upload(
+    upload_id: UUID,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    return upload_to_dict(_get_session(db, upload_id, user.id))
+
+
+# ---------------- APPEND ----------------
+@router.patch("/{upload_id}")
+async def upload_chunk(
+    upload_id: UUID,
+    request: Request,
+    upload_offset: int = Header(...),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # The row stays locked until the chunks are committed, so concurrent
+    # PATCHes of one upload run one after the other
+    session = await run_in_threadpool(_get_session, db, upload_id, user.id, lock=True)
+
+    if upload_offset != session.offset:
+        # Our copy of the offset can lag storage if a previous request died
+        # between committing a chunk and saving the session; storage wins.
+        try:
+            session.offset = await get_storage().upload_offset(session.upload_ref)
+        except Exception:
+            logger.exception("Failed to read offset of upload %s", session.id)
+            raise HTTPException(500, "Failed to read upload offset")
+        if upload_offset != session.offset:
+            await run_in_threadpool(db.commit)
+            raise HTTPException(409, "Upload-Offset mismatch", headers=_offset_headers(session))
+
+    remaining = session.size - session.offset
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        length = int(content_length)
+        if length > remaining:
+            raise HTTPException(400, "Body exceeds declared upload size")
+        if length != remaining and length % UPLOAD_CHUNK_SIZE:
+            raise HTTPException(
+                400, f"Body must be a multiple of {UPLOAD_CHUNK_SIZE} bytes unless it completes the upload"
+            )
+
+    storage = get_storage()
+    hasher = _take_hasher(session)
+
+    async def append(chunk: bytes):
+        expected = session.offset + len(chunk)
+        try:
+            session.offset = await storage.write_chunk(session.upload_ref, session.offset, chunk)
+        except StorageError as exc:
+            if exc.status_code == 409:
+                # Another PATCH wrote at this offset first
+                raise HTTPException(409, "Upload-Offset mismatch", headers=_offset_headers(session))
+            raise
+        if session.offset != expected:
+            # Storage moved on without this chunk; the rest of the body belongs elsewhere
+            raise HTTPException(409, "Upload-Offset mismatch", headers=_offset_headers(session))
+        if hasher is not None:
+            hasher.update(chunk)
+
+    buffer = bytearray()
+    try:
+        async for data in request.stream():
+            buffer += data
+            if len(buffer) > session.size - session.offset:
+                raise HTTPException(400, "Body exceeds declared upload size")
+            while len(buffer) >= UPLOAD_CHUNK_SIZE:
+                chunk = bytes(buffer[:UPLOAD_CHUNK_SIZE])
+                del buffer[:UPLOAD_CHUNK_SIZE]
+                await append(chunk)
+
+        # Only the final chunk of the file may be shorter than UPLOAD_CHUNK_SIZE
+        if buffer and session.offset + len(buffer) == session.size:
+            await append(bytes(buffer))
+    except ClientDisconnect:
+        logger.info("Client disconnected from upload %s at offset %d", session.id, session.offset)
+    except HTTPException:
+        raise
+    except Exception:
+        logger.exception("Chunk upload failed for %s at offset %d", session.id, session.offset)
+        raise HTTPException(500, "Failed to upload chunk to storage", headers=_offset_headers(session))
+    finally:
+        await run_in_threadpool(db.commit)
+
+    headers = _offset_headers(session)
+    if session.offset < session.size:
+        _keep_hasher(session, hasher)
+        return Response(status_code=204, headers=headers)
+
+    # Lock the row again for publishing; a PATCH retrying the last chunk may
+    # have finished the upload (and deleted the row) in the meantime
+    if not await run_in_threadpool(_lock_session, db, session.id):
+        raise HTTPException(404, "Upload not found")
+
+    # Complete: publish the content under its hash; the session becomes a regular file
+    try:
+        digest = hasher.hexdigest() if hasher is not None else await dedup.hash_object(session.storage_path)
+        staged = dedup.StagedContent(path=session.storage_path, digest=digest, size=session.size)
+        blob = await dedup.publish(db, staged)
+    except Exception:
+        logger.exception("Failed to publish completed upload %s", session.id)
+        raise HTTPException(500, "Failed to finish upload", headers=headers)
+
+    new_file = FileModel(
+        name=session.name,
+        owner_id=session.owner_id,
+        folder_id=session.folder_id,
+        mime_type=session.mime_type,
+        size=session.size,
+        storage_path=blob.storage_path,
+        content_hash=blob.hash,
+        is_deleted=False,
+        is_starred=False,
+    )
+
+    def finish():
+        db.add(new_file)
+        usage.record_upload(db, new_file.owner_id, new_file.size)
+        thumbnails.schedule(db, new_file)
+        db.delete(session)
+        db.commit()
+        db.refresh(new_file)
+
+    await run_in_threadpool(finish)
+
+    url = None
+    try:
+        url = await signed_urls.get_signed_url(new_file.storage_path)
+    except Exception:
+        logger.exception("Failed to create signed URL for %s", new_file.storage_path)
+
+    return {"offset": session.size, "file": file_to_dict(new_file, url)}
+
+
+# ---------------- ABORT ----------------
+@router.delete("/{upload_id}")
+async def abort_upload(
+    upload_id: UUID,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    # Expired sessions can still be aborted; the expire_uploads job removes the rest
+    session = await run_in_threadpool(_get_session, db, upload_id, user.id, True)
+    upload = (session.upload_ref, session.storage_path)
+
+    def remove_row():
+        db.delete(session)
+        db.commit()
+
+    await run_in_threadpool(remove_row)
+    await upload_sessions.discard([upload])
+    return {"message": "Upload aborted"}
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from uuid import UUID
 
+from app.core.config import BULK_MAX_ITEMS
+
 class FileCreate(BaseModel):
     name: str
     folder_id: Optional[UUID] = None
@@ -16,3 +18,16 @@ class FileResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class DedupRequest(BaseModel):
+    sha256: str = Field(pattern="^[0-9a-f]{64}$")
+    size: int = Field(ge=0)
+    name: str
+    mime_type: Optional[str] = None
+    folder_id: Optional[UUID] = None
+
+class BulkFileRequest(BaseModel):
+    action: Literal["trash", "restore", "star", "unstar", "move", "delete"]
+    file_ids: List[UUID] = Field(min_length=1, max_length=BULK_MAX_ITEMS)
+    # Target of "move"; None moves the files to the top level
+    folder_id: Optional[UUID] = None
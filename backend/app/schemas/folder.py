@@ -13,3 +13,7 @@ class FolderResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class FolderMove(BaseModel):
+    # None moves the folder to the top level
+    parent_id: Optional[UUID] = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from uuid import UUID
 from typing import Optional
 from datetime import datetime
@@ -8,3 +8,9 @@ class LinkShareCreate(BaseModel):
     folder_id: Optional[UUID] = None
     password: Optional[str] = None
     expires_at: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def one_target(self):
+        if (self.file_id is None) == (self.folder_id is None):
+            raise ValueError("Link exactly one of file_id or folder_id")
+        return self
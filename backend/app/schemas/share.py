@@ -1,9 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from uuid import UUID
-from typing import Optional
+from typing import Literal, Optional
 
 class ShareCreate(BaseModel):
     user_id: UUID
     file_id: Optional[UUID] = None
     folder_id: Optional[UUID] = None
-    role: str
+    # Ownership is not transferable through a share
+    role: Literal["editor", "viewer"]
+
+    @model_validator(mode="after")
+    def one_target(self):
+        if (self.file_id is None) == (self.folder_id is None):
+            raise ValueError("Share exactly one of file_id or folder_id")
+        return self
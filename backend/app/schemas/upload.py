@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from uuid import UUID
+
+class UploadCreate(BaseModel):
+    name: str
+    size: int = Field(gt=0)
+    mime_type: Optional[str] = None
+    folder_id: Optional[UUID] = None
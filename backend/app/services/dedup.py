@@ -0,0 +1,289 @@
+"""
+Content-addressed, deduplicated storage.
+
+Uploads are hashed (SHA-256) while they stream to a staging key, then published
+once under cas/<hash> and reference-counted from File rows through Blob, so the
+same bytes uploaded again cost nothing beyond the transfer (and nothing at all
+through the hash-first endpoint). An object is removed only when the last File
+referencing it is permanently deleted.
+
+Concurrency: a Blob row is locked (SELECT ... FOR UPDATE) whenever its
+ref_count changes or its object is removed, so an upload can never gain a
+reference to an object that is being deleted. Uploads take the lock only after
+their storage calls are done (see publish). A blob whose ref_count is 0 is never
+referenced as it is: a purge that deleted its object but failed before deleting
+the row leaves it behind, so an upload of the same content moves its own copy
+into place first.
+"""
+
+import uuid
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import BLOB_CLEANUP_INTERVAL
+from app.database import SessionLocal
+from app.models.blob import Blob
+from app.models.file import File as FileModel
+from app.services import jobs, signed_urls
+from app.services.storage import StorageError, get_storage
+from app.services.thumbnails import thumbnail_path
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StagedContent:
+    path: str
+    digest: str
+    size: int
+
+
+def cas_path(digest: str) -> str:
+    return f"cas/{digest[:2]}/{digest}"
+
+
+def staging_path() -> str:
+    return f"staging/{uuid.uuid4().hex}"
+
+
+async def _hashing(chunks: AsyncIterator[bytes], hasher) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        hasher.update(chunk)
+        yield chunk
+
+
+async def stage_upload(chunks: AsyncIterator[bytes], length: int, content_type: Optional[str] = None) -> StagedContent:
+    """Stream content to a staging key, hashing it on the way through."""
+    hasher = hashlib.sha256()
+    path = staging_path()
+    size = await get_storage().put(path, _hashing(chunks, hasher), length, content_type)
+    return StagedContent(path=path, digest=hasher.hexdigest(), size=size)
+
+
+async def hash_object(path: str) -> str:
+    """Hash an already stored object by streaming it back (bounded memory)."""
+    hasher = hashlib.sha256()
+    async for chunk in get_storage().get(path):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _reference_blob(db: Session, digest: str, restored_path: Optional[str] = None) -> Optional[Blob]:
+    """
+    Lock a blob and add a reference (uncommitted); None if unknown. A blob
+    awaiting purge (ref_count 0) may have lost its object to a purge that failed
+    before deleting the row, so it is only taken back when `restored_path` holds
+    its content again.
+    """
+    blob = db.query(Blob).filter(Blob.hash == digest).with_for_update().first()
+    if blob is None:
+        return None
+    if blob.ref_count > 0:
+        blob.ref_count += 1
+    elif restored_path is not None:
+        blob.storage_path = restored_path
+        blob.ref_count = 1
+    else:
+        return None
+    db.flush()
+    return blob
+
+
+def _insert_blob(db: Session, digest: str, path: str, size: int) -> Blob:
+    blob = Blob(hash=digest, storage_path=path, size=size, ref_count=1)
+    # Savepoint, so losing a race with a concurrent insert only undoes this row
+    with db.begin_nested():
+        db.add(blob)
+    return blob
+
+
+def add_reference(db: Session, digest: str) -> Optional[Blob]:
+    """Add a reference to an existing blob (uncommitted); None if unknown or awaiting purge."""
+    return _reference_blob(db, digest)
+
+
+def _blob_exists(db: Session, digest: str) -> bool:
+    return db.query(Blob.hash).filter(Blob.hash == digest).first() is not None
+
+
+async def _move_to_cas(staged: StagedContent, path: str) -> bool:
+    """Move staged content to its content address; True if the staged copy is left over."""
+    storage = get_storage()
+    try:
+        await storage.move(staged.path, path)
+        return False
+    except StorageError:
+        # A concurrent upload of the same content may have published it first
+        existing = await storage.stat(path)
+        if existing is None or existing.size != staged.size:
+            raise
+        return True
+
+
+def _discard_staged(db: Session, staged: StagedContent) -> None:
+    # After the caller commits, so no storage call runs while the blob row is locked
+    jobs.enqueue("discard_staged", {"path": staged.path}, db=db)
+
+
+async def publish(db: Session, staged: StagedContent) -> Blob:
+    """
+    Turn staged content into a referenced Blob. The new reference is flushed but
+    not committed: the caller adds the File row and commits both together.
+
+    Storage calls all happen before the blob row is locked, so the lock lasts
+    only until the caller's commit and concurrent uploads of the same content
+    never wait on storage latency. A leftover staged copy is removed by a job
+    released on that commit.
+    """
+    if await run_in_threadpool(_blob_exists, db, staged.digest):
+        blob = await run_in_threadpool(_reference_blob, db, staged.digest)
+        if blob is not None:
+            _discard_staged(db, staged)
+            return blob
+        # Purged since the check, or awaiting purge (its row stays locked until
+        # the caller commits, so no purge removes the copy moved there below)
+
+    path = cas_path(staged.digest)
+    staged_left = await _move_to_cas(staged, path)
+    try:
+        blob = await run_in_threadpool(_insert_blob, db, staged.digest, path, staged.size)
+    except IntegrityError:
+        blob = await run_in_threadpool(_reference_blob, db, staged.digest, path)
+        if blob is None:
+            raise
+
+    if staged_left:
+        _discard_staged(db, staged)
+    return blob
+
+
+def release_files(db: Session, files: Iterable[FileModel]) -> Tuple[List[str], List[str]]:
+    """
+    Drop the blob references held by `files` (uncommitted; the caller deletes
+    the rows and commits). Returns (digests of blobs that are now unreferenced,
+    storage paths of pre-dedup files that own their object outright); both need
+    purging from storage once the transaction commits, see schedule_purge.
+    """
+    counts = Counter()
+    legacy_paths = []
+    for f in files:
+        if f.content_hash:
+            counts[f.content_hash] += 1
+        elif f.storage_path:
+            legacy_paths.append(f.storage_path)
+
+    if not counts:
+        return [], legacy_paths
+
+    # One executemany; sorted so concurrent releases lock rows in the same order
+    table = Blob.__table__
+    db.execute(
+        table.update()
+        .where(table.c.hash == bindparam("b_hash"))
+        .values(ref_count=table.c.ref_count - bindparam("b_count")),
+        [{"b_hash": digest, "b_count": n} for digest, n in sorted(counts.items())],
+    )
+    orphans = [
+        digest
+        for (digest,) in db.query(Blob.hash).filter(Blob.hash.in_(list(counts)), Blob.ref_count <= 0)
+    ]
+    return orphans, legacy_paths
+
+
+async def purge_blobs(digests: List[str]) -> int:
+    """
+    Remove unreferenced blobs: lock the rows, delete their objects in one storage
+    call (with their thumbnails), then the rows. Blobs that gained a reference
+    meanwhile are skipped.
+    Returns the number of blobs removed.
+    """
+    if not digests:
+        return 0
+
+    db = SessionLocal()
+    try:
+        def lock():
+            return (
+                db.query(Blob)
+                .filter(Blob.hash.in_(digests), Blob.ref_count <= 0)
+                .with_for_update()
+                .all()
+            )
+
+        blobs = await run_in_threadpool(lock)
+        if not blobs:
+            await run_in_threadpool(db.rollback)
+            return 0
+
+        paths = [b.storage_path for b in blobs]
+        paths += [thumbnail_path(p) for p in paths]
+        await get_storage().delete(paths)
+        signed_urls.invalidate(*paths)
+
+        def remove_rows():
+            for blob in blobs:
+                db.delete(blob)
+            db.commit()
+
+        await run_in_threadpool(remove_rows)
+        return len(blobs)
+    finally:
+        await run_in_threadpool(db.close)
+
+
+def schedule_purge(db: Session, orphans: List[str], legacy_paths: List[str], owner_id=None) -> Optional[uuid.UUID]:
+    """
+    Queue storage cleanup for release_files' result. The job is released when
+    `db` commits, so objects go only once the rows are really gone.
+    """
+    if not orphans and not legacy_paths:
+        return None
+    payload = {"digests": orphans, "paths": legacy_paths}
+    return jobs.enqueue("purge_storage", payload, owner_id=owner_id, db=db)
+
+
+async def purge_storage(digests: List[str], legacy_paths: List[str]) -> int:
+    """Remove what release_files released, after commit; returns the number of objects deleted."""
+    removed = await purge_blobs(digests)
+    if legacy_paths:
+        paths = legacy_paths + [thumbnail_path(p) for p in legacy_paths]
+        await get_storage().delete(paths)
+        signed_urls.invalidate(*paths)
+    return removed + len(legacy_paths)
+
+
+@jobs.job("purge_storage")
+async def _purge_storage(payload: dict) -> None:
+    await purge_storage(payload["digests"], payload["paths"])
+
+
+@jobs.job("discard_staged")
+async def _discard_staged_job(payload: dict) -> None:
+    await get_storage().delete([payload["path"]])
+
+
+@jobs.job("cleanup_blobs", concurrency=1)
+async def _cleanup_blobs(payload: dict) -> None:
+    """Purge blobs left unreferenced by purges that ran out of retries."""
+    def orphaned():
+        db = SessionLocal()
+        try:
+            return [digest for (digest,) in db.query(Blob.hash).filter(Blob.ref_count <= 0).limit(1000)]
+        finally:
+            db.close()
+
+    digests = await run_in_threadpool(orphaned)
+    if digests:
+        removed = await purge_blobs(digests)
+        logger.info("Cleaned up %d unreferenced blobs", removed)
+
+
+jobs.every(BLOB_CLEANUP_INTERVAL, "cleanup_blobs")
@@ -0,0 +1,170 @@
+"""
+Conditional and ranged downloads streamed through the API.
+
+ranged_response() answers a GET/HEAD for one stored object: If-None-Match
+gives a 304, Range gives a 206 (one range) or a multipart/byteranges body
+(several), If-Range falls back to the full object once the ETag has changed,
+and an unsatisfiable range gives a 416. Bodies stream from the storage
+backend in bounded chunks; the local backend serves single ranges with
+sendfile through LocalFileResponse.
+"""
+
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request
+from starlette.responses import Response, StreamingResponse
+
+from app.core.config import DOWNLOAD_MAX_RANGES
+from app.models.file import File
+from app.services.storage import get_storage
+
+ByteRange = Tuple[int, int]
+
+
+def file_etag(file: File) -> str:
+    """Strong ETag: the content hash, or for pre-dedup files the id plus last change."""
+    if file.content_hash:
+        return f'"{file.content_hash}"'
+    stamp = file.updated_at or file.created_at
+    version = f"-{int(stamp.timestamp() * 1_000_000):x}" if stamp else ""
+    return f'"{file.id.hex}{version}"'
+
+
+def content_disposition(name: str, inline: bool = False) -> str:
+    kind = "inline" if inline else "attachment"
+    fallback = name.encode("ascii", "replace").decode("ascii").replace('"', "'")
+    return f"{kind}; filename=\"{fallback}\"; filename*=UTF-8''{quote(name)}"
+
+
+def parse_ranges(header: str, size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a Range header into sorted, merged inclusive (start, end) pairs. None
+    means the header should be ignored (malformed, not bytes, or too many
+    ranges); an empty list means nothing in it is satisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+
+    ranges: List[ByteRange] = []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else max(start, size - 1)
+                if end < start:
+                    return None
+            else:
+                # Suffix range: the last N bytes
+                length = int(last)
+                if length == 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    merged: List[ByteRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > DOWNLOAD_MAX_RANGES:
+        return None
+    return merged
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+async def _multipart_body(path: str, ranges: List[ByteRange], part_headers: List[bytes], closing: bytes) -> AsyncIterator[bytes]:
+    storage = get_storage()
+    for (start, end), head in zip(ranges, part_headers):
+        yield head
+        async for chunk in storage.get(path, start, end):
+            yield chunk
+        yield b"\r\n"
+    yield closing
+
+
+def ranged_response(
+    request: Request,
+    path: str,
+    size: int,
+    etag: Optional[str],
+    media_type: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Build the response for a GET/HEAD of the stored object `path` (`size` bytes)."""
+    media_type = media_type or "application/octet-stream"
+    headers = {**(headers or {}), "accept-ranges": "bytes"}
+    if etag:
+        headers["etag"] = etag
+
+    if_none_match = request.headers.get("if-none-match")
+    if etag and if_none_match and _etag_matches(if_none_match, etag, weak=True):
+        return Response(status_code=304, headers=headers)
+
+    ranges = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or (etag and _etag_matches(if_range, etag, weak=False))):
+        ranges = parse_ranges(range_header, size)
+        if ranges == []:
+            raise HTTPException(416, "Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+    head_only = request.method == "HEAD"
+    storage = get_storage()
+
+    if ranges is not None and len(ranges) > 1:
+        boundary = uuid.uuid4().hex
+        part_headers = [
+            f"--{boundary}\r\nContent-Type: {media_type}\r\nContent-Range: bytes {s}-{e}/{size}\r\n\r\n".encode()
+            for s, e in ranges
+        ]
+        closing = f"--{boundary}--\r\n".encode()
+        length = sum(len(h) + (e - s + 1) + 2 for h, (s, e) in zip(part_headers, ranges)) + len(closing)
+        headers["content-length"] = str(length)
+        multipart_type = f"multipart/byteranges; boundary={boundary}"
+        if head_only:
+            return Response(status_code=206, headers=headers, media_type=multipart_type)
+        return StreamingResponse(
+            _multipart_body(path, ranges, part_headers, closing),
+            status_code=206,
+            headers=headers,
+            media_type=multipart_type,
+        )
+
+    start, end, status = 0, size - 1, 200
+    if ranges:
+        (start, end), status = ranges[0], 206
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    local_path = getattr(storage, "local_path", None)
+    if local_path is not None:
+        from app.utils.local_storage import LocalFileResponse
+
+        return LocalFileResponse(local_path(path), start, end, status_code=status, headers=headers, media_type=media_type)
+
+    headers["content-length"] = str(max(end - start + 1, 0))
+    if head_only or size == 0:
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    return StreamingResponse(storage.get(path, start, end), status_code=status, headers=headers, media_type=media_type)
@@ -1,7 +1,90 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
 from app.models.file import File
+from app.services import dedup, link_shares, permissions, usage
 
 def soft_delete_file(file: File):
     file.is_deleted = True
+    file.deleted_at = datetime.utcnow()
 
 def restore_file(file: File):
     file.is_deleted = False
+    file.deleted_at = None
+
+
+# ---------------- BULK ----------------
+# Each action is one set-based statement over the caller's files. Ids that
+# are not the caller's, or not in the state the action applies to (e.g.
+# restoring a file that is not in the trash), are reported as not found,
+# exactly like the single-file routes.
+
+_BULK_UPDATES = {
+    "trash": ([File.is_deleted == False], {"is_deleted": True}),
+    "restore": ([File.is_deleted == True], {"is_deleted": False, "deleted_at": None}),
+    "star": ([], {"is_starred": True}),
+    "unstar": ([], {"is_starred": False}),
+}
+
+
+def bulk_update(db: Session, action: str, file_ids: List[UUID], owner_id, folder_id=None) -> List[UUID]:
+    """Apply a flag change or move in one UPDATE (uncommitted); returns the ids changed."""
+    if action == "move":
+        conditions, values = [File.is_deleted == False], {"folder_id": folder_id}
+    else:
+        conditions, values = _BULK_UPDATES[action]
+    if action == "trash":
+        values = {**values, "deleted_at": datetime.utcnow()}
+
+    stmt = (
+        update(File)
+        .where(File.id.in_(file_ids), File.owner_id == owner_id, *conditions)
+        .values(**values)
+        .returning(File.id)
+    )
+    changed = list(db.execute(stmt, execution_options={"synchronize_session": False}).scalars())
+    if action == "trash":
+        link_shares.invalidate_files(db, changed)
+    return changed
+
+
+def bulk_delete(db: Session, file_ids: List[UUID], owner_id) -> Tuple[List[UUID], List[str], List[str]]:
+    """
+    Permanently delete the caller's files in one DELETE (uncommitted), releasing
+    their blob references. Returns (deleted ids, orphaned blob digests, legacy
+    storage paths) for dedup.schedule_purge.
+
+    Only the rows this DELETE actually removed are released: a concurrent
+    delete of the same files (a double submit, the single-file route, the
+    trash purge) waits on the row locks and then removes nothing, so blob
+    references and usage are never released twice.
+    """
+    owned = list(db.execute(
+        select(File.id).where(File.id.in_(file_ids), File.owner_id == owner_id)
+    ).scalars())
+    if not owned:
+        return [], [], []
+
+    permissions.drop_file_shares(db, owned)
+    stmt = (
+        delete(File)
+        .where(File.id.in_(owned), File.owner_id == owner_id)
+        .returning(File.id, File.owner_id, File.size, File.content_hash, File.storage_path)
+    )
+    rows = db.execute(stmt, execution_options={"synchronize_session": False}).all()
+    if not rows:
+        return [], [], []
+
+    orphans, legacy_paths = dedup.release_files(db, rows)
+    usage.release(db, rows)
+    return [row.id for row in rows], orphans, legacy_paths
+
+
+def bulk_results(file_ids: List[UUID], changed: List[UUID]) -> Dict:
+    done = set(changed)
+    results = [{"id": str(i), "status": "ok" if i in done else "not_found"} for i in file_ids]
+    return {"succeeded": len(done), "failed": len(file_ids) - len(done), "results": results}
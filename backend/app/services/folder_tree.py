@@ -0,0 +1,150 @@
+"""
+Folder hierarchy on top of the materialized path column.
+
+Every folder stores "/<root hex>/.../<own hex>/". A subtree is then a single
+indexed prefix scan (path LIKE '<path>%'), ancestors are parsed out of the
+path and fetched by primary key, and moving a folder rewrites its subtree's
+paths with one UPDATE.
+"""
+
+import uuid
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import func, literal
+from sqlalchemy.orm import Session
+
+from app.models.file import File as FileModel
+from app.models.folder import Folder
+
+
+def child_path(parent: Optional[Folder], folder_id: UUID) -> str:
+    return f"{parent.path if parent else '/'}{folder_id.hex}/"
+
+
+def path_ids(path: str) -> List[UUID]:
+    """Folder ids along a path, root first."""
+    return [UUID(part) for part in path.strip("/").split("/") if part]
+
+
+def get_owned_folder(db: Session, folder_id: UUID, owner_id) -> Folder:
+    folder = db.query(Folder).filter(Folder.id == folder_id, Folder.owner_id == owner_id).first()
+    if not folder:
+        raise HTTPException(404, "Folder not found")
+    return folder
+
+
+def _subtree_query(db: Session, folder: Folder):
+    return db.query(Folder).filter(Folder.owner_id == folder.owner_id, Folder.path.like(f"{folder.path}%"))
+
+
+def create_folder(db: Session, name: str, parent_id: Optional[UUID], owner_id) -> Folder:
+    """Add a folder (uncommitted) with its path set."""
+    parent = get_owned_folder(db, parent_id, owner_id) if parent_id else None
+    folder_id = uuid.uuid4()
+    folder = Folder(
+        id=folder_id,
+        name=name,
+        parent_id=parent_id,
+        owner_id=owner_id,
+        path=child_path(parent, folder_id),
+        depth=parent.depth + 1 if parent else 0,
+    )
+    db.add(folder)
+    return folder
+
+
+def move_folder(db: Session, folder: Folder, new_parent: Optional[Folder]) -> None:
+    """Re-parent `folder`, rewriting the paths of its whole subtree in one UPDATE (uncommitted)."""
+    if new_parent is not None and new_parent.path.startswith(folder.path):
+        raise HTTPException(400, "Cannot move a folder into itself or one of its subfolders")
+
+    old_path = folder.path
+    new_path = child_path(new_parent, folder.id)
+    depth_delta = (new_parent.depth + 1 if new_parent else 0) - folder.depth
+    if new_path == old_path:
+        return
+
+    db.query(Folder).filter(
+        Folder.owner_id == folder.owner_id,
+        Folder.path.like(f"{old_path}%"),
+    ).update(
+        {
+            Folder.path: literal(new_path) + func.substr(Folder.path, len(old_path) + 1),
+            Folder.depth: Folder.depth + depth_delta,
+        },
+        synchronize_session=False,
+    )
+    folder.parent_id = new_parent.id if new_parent else None
+    db.flush()
+    db.expire(folder)
+
+
+def folder_to_dict(folder: Folder) -> dict:
+    return {
+        "id": str(folder.id),
+        "name": folder.name,
+        "parent_id": str(folder.parent_id) if folder.parent_id else None,
+        "depth": folder.depth,
+    }
+
+
+def build_tree(folders: List[Folder], sizes: Optional[Dict[UUID, dict]] = None) -> List[dict]:
+    """Nest folders (any order) under their parents, children by name; returns the top-level nodes."""
+    folders = sorted(folders, key=lambda f: (f.depth, f.name.lower()))
+    nodes = {}
+    for folder in folders:
+        node = folder_to_dict(folder)
+        if sizes is not None:
+            node.update(sizes.get(folder.id, {"size": 0, "file_count": 0}))
+        node["children"] = []
+        nodes[folder.id] = node
+
+    roots = []
+    for folder in folders:
+        parent = nodes.get(folder.parent_id)
+        (parent["children"] if parent else roots).append(nodes[folder.id])
+    return roots
+
+
+def subtree(db: Session, folder: Folder, max_depth: Optional[int] = None) -> List[Folder]:
+    """The folder and all of its descendants (optionally at most max_depth levels down)."""
+    query = _subtree_query(db, folder)
+    if max_depth is not None:
+        query = query.filter(Folder.depth <= folder.depth + max_depth)
+    return query.order_by(Folder.path).all()
+
+
+def ancestors(db: Session, folder: Folder) -> List[Folder]:
+    """Breadcrumbs: root first, ending with the folder itself."""
+    ids = path_ids(folder.path)
+    rows = {f.id: f for f in db.query(Folder).filter(Folder.id.in_(ids), Folder.owner_id == folder.owner_id)}
+    return [rows[i] for i in ids if i in rows]
+
+
+def recursive_sizes(db: Session, owner_id, prefix: str = "/") -> Dict[UUID, dict]:
+    """
+    Total size and file count of every folder under `prefix`, including files
+    in subfolders (trashed files excluded). One grouped query; the roll-up to
+    ancestors happens in memory along the paths.
+    """
+    rows = (
+        db.query(Folder.id, Folder.path, func.coalesce(func.sum(FileModel.size), 0), func.count(FileModel.id))
+        .outerjoin(
+            FileModel,
+            (FileModel.folder_id == Folder.id) & (FileModel.owner_id == owner_id) & (FileModel.is_deleted == False),
+        )
+        .filter(Folder.owner_id == owner_id, Folder.path.like(f"{prefix}%"))
+        .group_by(Folder.id, Folder.path)
+        .all()
+    )
+
+    totals = {folder_id: {"size": 0, "file_count": 0} for folder_id, _, _, _ in rows}
+    for _, path, size, count in rows:
+        for ancestor_id in path_ids(path):
+            total = totals.get(ancestor_id)
+            if total is not None:
+                total["size"] += int(size)
+                total["file_count"] += count
+    return totals
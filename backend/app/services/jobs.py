@@ -0,0 +1,404 @@
+"""
+Background jobs: deferred work that should not hold up a request, such as
+storage cleanup or thumbnails.
+
+Handlers are async functions registered with @job("name"). enqueue() hands a
+job to JOB_WORKERS worker tasks on the event loop. Failures are retried with
+exponential backoff and jitter up to JOB_MAX_ATTEMPTS. When enqueue() is
+given the caller's Session, the job is held back until that session commits
+and dropped if it rolls back, so a job never acts on changes that did not
+happen.
+
+By default jobs live in an in-process queue and are lost on restart. With
+JOB_DURABLE they are rows in the jobs table, claimed with SELECT ... FOR
+UPDATE SKIP LOCKED, so they survive restarts and spread across processes.
+Handlers must be idempotent either way: a job can run again after a crash.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    JOB_WORKERS,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF,
+    JOB_RETRY_BACKOFF_MAX,
+    JOB_DURABLE,
+    JOB_POLL_INTERVAL,
+    JOB_LEASE_SECONDS,
+    JOB_STATUS_RETENTION,
+)
+from app.database import SessionLocal
+from app.models.job import Job
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+@dataclass
+class _Registration:
+    fn: Handler
+    semaphore: Optional[asyncio.Semaphore]
+
+
+_handlers: Dict[str, _Registration] = {}
+
+
+def job(name: str, concurrency: Optional[int] = None):
+    """Register an async handler taking the job payload; `concurrency` caps parallel runs per process."""
+    def register(fn: Handler) -> Handler:
+        _handlers[name] = _Registration(fn, asyncio.Semaphore(concurrency) if concurrency else None)
+        return fn
+
+    return register
+
+
+@dataclass
+class _MemoryJob:
+    name: str
+    payload: dict
+    owner_id: Optional[UUID]
+    max_attempts: int
+    id: UUID = field(default_factory=uuid4)
+    status: str = "queued"
+    attempts: int = 0
+    last_error: Optional[str] = None
+    run_after: datetime = field(default_factory=datetime.utcnow)
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    updated_at: datetime = field(default_factory=datetime.utcnow)
+
+
+def job_to_dict(j) -> dict:
+    """Status view of a Job row or an in-process job."""
+    return {
+        "id": str(j.id),
+        "name": j.name,
+        "status": j.status,
+        "attempts": j.attempts,
+        "max_attempts": j.max_attempts,
+        "last_error": j.last_error,
+        "run_after": j.run_after.isoformat() if j.run_after else None,
+        "created_at": j.created_at.isoformat() if j.created_at else None,
+        "updated_at": j.updated_at.isoformat() if j.updated_at else None,
+    }
+
+
+# ---------------- runner state ----------------
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_queue: Optional[asyncio.Queue] = None
+_wakeup: Optional[asyncio.Event] = None
+_tasks: List[asyncio.Task] = []
+_backlog: List[_MemoryJob] = []
+_periodic: List[Tuple[float, str, dict]] = []
+
+_statuses: "OrderedDict[UUID, _MemoryJob]" = OrderedDict()
+_lock = threading.Lock()
+_counters = {"enqueued": 0, "succeeded": 0, "retried": 0, "failed": 0}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        _counters[key] += 1
+
+
+def _remember(j: _MemoryJob) -> None:
+    with _lock:
+        _statuses[j.id] = j
+        while len(_statuses) > JOB_STATUS_RETENTION:
+            _statuses.popitem(last=False)
+
+
+def _forget(job_id: UUID) -> None:
+    with _lock:
+        _statuses.pop(job_id, None)
+
+
+def _dispatch(j: _MemoryJob) -> None:
+    # Safe from any thread; jobs enqueued before start() wait in the backlog
+    if _loop is None:
+        _backlog.append(j)
+    else:
+        _loop.call_soon_threadsafe(_queue.put_nowait, j)
+
+
+def _notify() -> None:
+    if _loop is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def _backoff(attempt: int) -> float:
+    delay = min(JOB_RETRY_BACKOFF * 2 ** (attempt - 1), JOB_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+# ---------------- enqueue ----------------
+_PENDING = "pending_jobs"
+
+
+def enqueue(
+    name: str,
+    payload: Optional[dict] = None,
+    *,
+    owner_id: Optional[UUID] = None,
+    db: Optional[Session] = None,
+    max_attempts: Optional[int] = None,
+) -> UUID:
+    """
+    Queue a job and return its id. With `db`, the job is released when that
+    session commits. The payload must be JSON-serializable.
+    """
+    if name not in _handlers:
+        raise KeyError(f"Unknown job {name!r}")
+    payload = payload or {}
+    max_attempts = max_attempts or JOB_MAX_ATTEMPTS
+    _count("enqueued")
+
+    if JOB_DURABLE:
+        row = Job(id=uuid4(), name=name, payload=payload, owner_id=owner_id, status="queued",
+                  attempts=0, max_attempts=max_attempts, run_after=datetime.utcnow())
+        if db is not None:
+            # Same transaction as the caller's change; workers are woken after commit
+            db.add(row)
+            db.info.setdefault(_PENDING, []).append(None)
+        else:
+            session = SessionLocal()
+            try:
+                session.add(row)
+                session.commit()
+            finally:
+                session.close()
+            _notify()
+        return row.id
+
+    j = _MemoryJob(name=name, payload=payload, owner_id=owner_id, max_attempts=max_attempts)
+    _remember(j)
+    if db is not None:
+        db.info.setdefault(_PENDING, []).append(j)
+    else:
+        _dispatch(j)
+    return j.id
+
+
+@event.listens_for(Session, "after_commit")
+def _release_pending(session):
+    for j in session.info.pop(_PENDING, ()):
+        if j is None:
+            _notify()
+        else:
+            _dispatch(j)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    for j in session.info.pop(_PENDING, ()):
+        if j is not None:
+            _forget(j.id)
+
+
+def every(seconds: float, name: str, payload: Optional[dict] = None) -> None:
+    """Enqueue `name` every `seconds` while the runner is started (once per process)."""
+    _periodic.append((seconds, name, payload or {}))
+
+
+# ---------------- execution ----------------
+async def _run_handler(name: str, payload: dict) -> Optional[str]:
+    """Run one attempt; returns an error description, or None on success."""
+    registration = _handlers.get(name)
+    if registration is None:
+        return f"Unknown job {name!r}"
+    try:
+        if registration.semaphore is None:
+            await registration.fn(payload)
+        else:
+            async with registration.semaphore:
+                await registration.fn(payload)
+        return None
+    except Exception as exc:
+        logger.exception("Job %s failed", name)
+        return f"{type(exc).__name__}: {exc}"
+
+
+async def _memory_worker():
+    while True:
+        j = await _queue.get()
+        try:
+            j.status = "running"
+            j.attempts += 1
+            j.updated_at = datetime.utcnow()
+            error = await _run_handler(j.name, j.payload)
+
+            if error is None:
+                j.status = "succeeded"
+                _count("succeeded")
+            elif j.attempts < j.max_attempts:
+                delay = _backoff(j.attempts)
+                j.status, j.last_error = "queued", error
+                j.run_after = datetime.utcnow() + timedelta(seconds=delay)
+                _loop.call_later(delay, _queue.put_nowait, j)
+                _count("retried")
+            else:
+                j.status, j.last_error = "failed", error
+                _count("failed")
+            j.updated_at = datetime.utcnow()
+        finally:
+            _queue.task_done()
+
+
+def _claim() -> Optional[Tuple[UUID, str, dict, int, int]]:
+    """Lock the next due job (or one whose worker died) and mark it running."""
+    db = SessionLocal()
+    try:
+        while True:
+            now = datetime.utcnow()
+            row = (
+                db.query(Job)
+                .filter(or_(
+                    and_(Job.status == "queued", Job.run_after <= now),
+                    and_(Job.status == "running", Job.locked_until < now),
+                ))
+                .order_by(Job.run_after)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if row is None:
+                db.rollback()
+                return None
+
+            if row.status == "running" and row.attempts >= row.max_attempts:
+                row.status, row.locked_until = "failed", None
+                row.last_error = "Worker stopped while running the last attempt"
+                db.commit()
+                _count("failed")
+                continue
+
+            row.status = "running"
+            row.attempts += 1
+            row.locked_until = now + timedelta(seconds=JOB_LEASE_SECONDS)
+            db.commit()
+            return row.id, row.name, row.payload, row.attempts, row.max_attempts
+    finally:
+        db.close()
+
+
+def _finish(job_id: UUID, attempts: int, max_attempts: int, error: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(Job, job_id)
+        if row is None:
+            return
+        row.locked_until = None
+        if error is None:
+            row.status = "succeeded"
+            _count("succeeded")
+        elif attempts < max_attempts:
+            row.status, row.last_error = "queued", error
+            row.run_after = datetime.utcnow() + timedelta(seconds=_backoff(attempts))
+            _count("retried")
+        else:
+            row.status, row.last_error = "failed", error
+            _count("failed")
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _durable_worker():
+    while True:
+        try:
+            _wakeup.clear()
+            claimed = await run_in_threadpool(_claim)
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, name, payload, attempts, max_attempts = claimed
+            error = await _run_handler(name, payload)
+            await run_in_threadpool(_finish, job_id, attempts, max_attempts, error)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Job worker error")
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+
+
+async def _periodic_loop(seconds: float, name: str, payload: dict):
+    while True:
+        await asyncio.sleep(seconds)
+        try:
+            await run_in_threadpool(enqueue, name, payload)
+        except Exception:
+            logger.exception("Failed to enqueue periodic job %s", name)
+
+
+# ---------------- lifecycle ----------------
+async def start() -> None:
+    global _loop, _queue, _wakeup
+    if _tasks:
+        return
+    _loop = asyncio.get_running_loop()
+    _queue = asyncio.Queue()
+    _wakeup = asyncio.Event()
+
+    worker = _durable_worker if JOB_DURABLE else _memory_worker
+    _tasks.extend(asyncio.create_task(worker()) for _ in range(max(JOB_WORKERS, 1)))
+    _tasks.extend(asyncio.create_task(_periodic_loop(*p)) for p in _periodic)
+
+    for j in _backlog:
+        _queue.put_nowait(j)
+    _backlog.clear()
+
+
+async def stop(timeout: float = 10) -> None:
+    """Give in-process jobs `timeout` seconds to drain, then stop the workers."""
+    global _loop
+    if not _tasks:
+        return
+    if not JOB_DURABLE:
+        try:
+            await asyncio.wait_for(_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%d background jobs still queued at shutdown", _queue.qsize())
+
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    _loop = None
+
+
+# ---------------- status ----------------
+def get_status(job_id: UUID, owner_id) -> Optional[dict]:
+    """Status of a job started on behalf of `owner_id`, or None."""
+    if JOB_DURABLE:
+        db = SessionLocal()
+        try:
+            row = db.query(Job).filter(Job.id == job_id, Job.owner_id == owner_id).first()
+            return job_to_dict(row) if row else None
+        finally:
+            db.close()
+
+    with _lock:
+        j = _statuses.get(job_id)
+        return job_to_dict(j) if j is not None and j.owner_id == owner_id else None
+
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        counters = dict(_counters)
+    counters["queued"] = _queue.qsize() if _queue is not None else len(_backlog)
+    return counters
@@ -0,0 +1,404 @@
+"""
+Public link resolution for /public/{token}.
+
+Resolved links are kept in an in-process LRU/TTL cache together with the
+fields needed to serve the linked file, so a hot link costs no database query;
+its signed URL comes from the signed_urls cache. A correct password is
+remembered on the cached entry (as a keyed digest, never the password), so
+bcrypt runs once per password and TTL instead of on every download. Checks
+that do reach bcrypt are limited per token and per client IP, which bounds
+both password guessing and the CPU an unauthenticated caller can burn.
+
+Download counts are added up in memory and written back every
+PUBLIC_LINK_FLUSH_INTERVAL seconds in one batched UPDATE, instead of one
+UPDATE per hit. Counts buffered when a process dies are lost; they are
+statistics, not billing.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, event
+from sqlalchemy.orm import Session, object_session
+
+from app.core.config import (
+    SECRET_KEY,
+    PUBLIC_LINK_CACHE_TTL,
+    PUBLIC_LINK_CACHE_SIZE,
+    PUBLIC_LINK_FLUSH_INTERVAL,
+    PUBLIC_LINK_PASSWORD_ATTEMPTS,
+    PUBLIC_LINK_PASSWORD_WINDOW,
+)
+from app.database import SessionLocal
+from app.models.file import File
+from app.models.folder import Folder
+from app.models.link_share import LinkShare
+from app.utils.hashing import hash_password_async, verify_and_update_async
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LinkedFile:
+    """What serving a file needs; duck-types File for downloads.file_etag."""
+    id: UUID
+    name: str
+    mime_type: Optional[str]
+    size: Optional[int]
+    storage_path: str
+    content_hash: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, f: File) -> "LinkedFile":
+        return cls(
+            id=f.id,
+            name=f.name,
+            mime_type=f.mime_type,
+            size=f.size,
+            storage_path=f.storage_path,
+            content_hash=f.content_hash,
+            created_at=f.created_at,
+            updated_at=f.updated_at,
+        )
+
+
+@dataclass(frozen=True)
+class ResolvedLink:
+    id: UUID
+    token: str
+    password_hash: Optional[str]
+    expires_at: Optional[datetime]
+    file: Optional[LinkedFile] = None
+    folder_id: Optional[UUID] = None
+    folder_path: Optional[str] = None
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= datetime.utcnow()
+
+
+# ---------------- cache ----------------
+# token -> (link, monotonic expiry, digests of passwords verified for it)
+_cache: "OrderedDict[str, Tuple[ResolvedLink, float, Set[str]]]" = OrderedDict()
+_lock = threading.Lock()
+
+_stats = {
+    "hits": 0, "misses": 0, "password_checks": 0, "password_throttled": 0,
+    "downloads": 0, "flushes": 0, "flushed_links": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += n
+
+
+def _cached(token: str) -> Optional[Tuple[ResolvedLink, float, Set[str]]]:
+    with _lock:
+        entry = _cache.get(token)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del _cache[token]
+            return None
+        _cache.move_to_end(token)
+        return entry
+
+
+def _store(link: ResolvedLink) -> None:
+    with _lock:
+        _cache[link.token] = (link, time.monotonic() + PUBLIC_LINK_CACHE_TTL, set())
+        _cache.move_to_end(link.token)
+        while len(_cache) > PUBLIC_LINK_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def invalidate(token: str) -> None:
+    with _lock:
+        _cache.pop(token, None)
+
+
+def _load(token: str) -> Optional[ResolvedLink]:
+    db = SessionLocal()
+    try:
+        link = db.query(LinkShare).filter(LinkShare.token == token).first()
+        if link is None:
+            return None
+        resolved = dict(id=link.id, token=link.token, password_hash=link.password, expires_at=link.expires_at)
+        if link.file_id is not None:
+            file = db.query(File).filter(File.id == link.file_id, File.is_deleted == False).first()
+            if file is None:
+                return None
+            return ResolvedLink(**resolved, file=LinkedFile.from_model(file))
+
+        folder = db.query(Folder).filter(Folder.id == link.folder_id).first()
+        if folder is None:
+            return None
+        return ResolvedLink(**resolved, folder_id=folder.id, folder_path=folder.path)
+    finally:
+        db.close()
+
+
+async def resolve(token: str) -> Optional[ResolvedLink]:
+    """The link for `token` (expired ones included; check .expired), or None."""
+    entry = _cached(token)
+    if entry is not None:
+        _count("hits")
+        return entry[0]
+    _count("misses")
+    link = await run_in_threadpool(_load, token)
+    if link is not None:
+        _store(link)
+    return link
+
+
+# ---------------- passwords ----------------
+def _password_digest(token: str, password: str) -> str:
+    return hmac.new((SECRET_KEY or "").encode(), f"{token}:{password}".encode(), hashlib.sha256).hexdigest()
+
+
+def _store_password_hash(link: ResolvedLink, password_hash: str) -> None:
+    db = SessionLocal()
+    try:
+        db.query(LinkShare).filter(LinkShare.id == link.id).update(
+            {LinkShare.password: password_hash}, synchronize_session=False
+        )
+        invalidate_on_commit(db, [link.token])
+        db.commit()
+    finally:
+        db.close()
+
+
+# key -> (window start, attempts in the window), keyed "token:..." and "ip:..."
+_attempts: Dict[str, Tuple[float, int]] = {}
+_attempts_lock = threading.Lock()
+
+
+def _take_attempt(keys: Tuple[str, ...]) -> Optional[float]:
+    """Count one password check against every key; seconds to wait if any is used up."""
+    now = time.monotonic()
+    with _attempts_lock:
+        if len(_attempts) > 4 * PUBLIC_LINK_CACHE_SIZE:
+            for key in [k for k, (start, _) in _attempts.items() if now - start >= PUBLIC_LINK_PASSWORD_WINDOW]:
+                del _attempts[key]
+        windows = {}
+        for key in keys:
+            start, n = _attempts.get(key, (now, 0))
+            if now - start >= PUBLIC_LINK_PASSWORD_WINDOW:
+                start, n = now, 0
+            if n >= PUBLIC_LINK_PASSWORD_ATTEMPTS:
+                return start + PUBLIC_LINK_PASSWORD_WINDOW - now
+            windows[key] = (start, n)
+        for key, (start, n) in windows.items():
+            _attempts[key] = (start, n + 1)
+    return None
+
+
+async def check_password(link: ResolvedLink, password: Optional[str], client: Optional[str] = None) -> bool:
+    """
+    Whether `password` opens `link`. Raises 429 when the link or the client
+    (an IP address) has used up its checks for the window.
+    """
+    if link.password_hash is None:
+        return True
+    if not password:
+        return False
+
+    digest = _password_digest(link.token, password)
+    entry = _cached(link.token)
+    if entry is not None and digest in entry[2]:
+        return True
+
+    keys = (f"token:{link.token}",) + ((f"ip:{client}",) if client else ())
+    retry_after = _take_attempt(keys)
+    if retry_after is not None:
+        _count("password_throttled")
+        raise HTTPException(429, "Too many password attempts", headers={"Retry-After": str(int(retry_after) + 1)})
+
+    _count("password_checks")
+    stored = link.password_hash
+    if stored.startswith("$2"):
+        ok, new_hash = await verify_and_update_async(password, stored)
+        if new_hash:
+            await run_in_threadpool(_store_password_hash, link, new_hash)
+    else:
+        # Created before link passwords were hashed: compare, then hash it
+        ok = hmac.compare_digest(stored.encode(), password.encode())
+        if ok:
+            await run_in_threadpool(_store_password_hash, link, await hash_password_async(password))
+
+    if ok:
+        entry = _cached(link.token)
+        if entry is not None:
+            entry[2].add(digest)
+    return ok
+
+
+def find_folder_file(link: ResolvedLink, file_id: UUID) -> Optional[LinkedFile]:
+    """A file anywhere under a folder link's folder (not trashed), or None."""
+    db = SessionLocal()
+    try:
+        file = (
+            db.query(File)
+            .join(Folder, Folder.id == File.folder_id)
+            .filter(
+                File.id == file_id,
+                File.owner_id == Folder.owner_id,
+                File.is_deleted == False,
+                Folder.path.like(f"{link.folder_path}%"),
+            )
+            .first()
+        )
+        return LinkedFile.from_model(file) if file else None
+    finally:
+        db.close()
+
+
+def list_folder_files(link: ResolvedLink) -> list:
+    db = SessionLocal()
+    try:
+        files = (
+            db.query(File)
+            .join(Folder, Folder.id == File.folder_id)
+            .filter(Folder.id == link.folder_id, File.owner_id == Folder.owner_id, File.is_deleted == False)
+            .order_by(File.name)
+            .all()
+        )
+        return [{"id": str(f.id), "name": f.name, "mime_type": f.mime_type, "size": f.size} for f in files]
+    finally:
+        db.close()
+
+
+# ---------------- download counters ----------------
+_downloads: Counter = Counter()
+_downloads_lock = threading.Lock()
+_flusher: Optional[asyncio.Task] = None
+
+
+def record_download(link_id: UUID) -> None:
+    with _downloads_lock:
+        _downloads[link_id] += 1
+    _count("downloads")
+
+
+def flush() -> int:
+    """Write buffered download counts back in one executemany; returns the links updated."""
+    with _downloads_lock:
+        pending = dict(_downloads)
+        _downloads.clear()
+    if not pending:
+        return 0
+
+    table = LinkShare.__table__
+    db = SessionLocal()
+    try:
+        db.execute(
+            table.update()
+            .where(table.c.id == bindparam("l_id"))
+            .values(download_count=table.c.download_count + bindparam("l_count")),
+            [{"l_id": link_id, "l_count": n} for link_id, n in sorted(pending.items(), key=lambda i: str(i[0]))],
+        )
+        db.commit()
+    except Exception:
+        # Put the counts back for the next attempt
+        with _downloads_lock:
+            _downloads.update(pending)
+        raise
+    finally:
+        db.close()
+    _count("flushes")
+    _count("flushed_links", len(pending))
+    return len(pending)
+
+
+def stats() -> dict:
+    with _stats_lock:
+        figures = dict(_stats)
+    with _lock:
+        figures["cached_links"] = len(_cache)
+    with _downloads_lock:
+        figures["pending_downloads"] = sum(_downloads.values())
+    return figures
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(PUBLIC_LINK_FLUSH_INTERVAL)
+        try:
+            await run_in_threadpool(flush)
+        except Exception:
+            logger.exception("Failed to write back public link download counts")
+
+
+async def start() -> None:
+    global _flusher
+    if _flusher is None:
+        _flusher = asyncio.create_task(_flush_loop())
+
+
+async def stop() -> None:
+    global _flusher
+    if _flusher is not None:
+        _flusher.cancel()
+        await asyncio.gather(_flusher, return_exceptions=True)
+        _flusher = None
+    try:
+        await run_in_threadpool(flush)
+    except Exception:
+        logger.exception("Failed to write back public link download counts at shutdown")
+
+
+# ---------------- invalidation ----------------
+# Tokens are evicted when the change is made and again once it commits, so a
+# request that reloads the link in between cannot cache the old row.
+_PENDING = "link_shares_invalidate"
+
+
+def invalidate_on_commit(db: Session, tokens: Iterable[str]) -> None:
+    """Evict `tokens` now and after `db` commits. Bulk query.update()/delete()
+    bypass the mapper events below, so callers using them must call this."""
+    tokens = set(tokens)
+    db.info.setdefault(_PENDING, set()).update(tokens)
+    for token in tokens:
+        invalidate(token)
+
+
+def invalidate_files(db: Session, file_ids) -> None:
+    """invalidate_on_commit for every public link to one of `file_ids`."""
+    if file_ids:
+        invalidate_on_commit(db, (t for (t,) in db.query(LinkShare.token).filter(LinkShare.file_id.in_(file_ids))))
+
+
+@event.listens_for(LinkShare, "after_update")
+@event.listens_for(LinkShare, "after_delete")
+def _link_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        invalidate_on_commit(session, [target.token])
+    else:
+        invalidate(target.token)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    for token in session.info.pop(_PENDING, ()):
+        invalidate(token)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop(_PENDING, None)
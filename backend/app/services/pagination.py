@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+A cursor encodes the sort key of the last row of a page, so fetching the next
+page is an index range scan that costs the same at row 10 and row 1,000,000,
+unlike OFFSET which has to walk every skipped row.
+"""
+
+import base64
+import binascii
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query
+
+Cursor = Tuple[datetime, UUID]
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _keyset(query, model, after: Optional[Cursor], limit: int):
+    if after is not None:
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(*after))
+    # Fetch one extra row to learn whether another page exists
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def _split_page(rows: List, limit: int) -> Tuple[List, Optional[Cursor]]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, (last.created_at, last.id)
+
+
+def keyset_page(query: Query, model, after: Optional[Cursor], limit: int) -> Tuple[List, Optional[Cursor]]:
+    """
+    Fetch one page of `query` ordered by (created_at DESC, id DESC) starting
+    after `after`. Returns the rows and the cursor of the next page, or None
+    when this is the last page.
+    """
+    return _split_page(_keyset(query, model, after, limit).all(), limit)
+
+
+async def keyset_page_async(
+    db: AsyncSession, stmt: Select, model, after: Optional[Cursor], limit: int
+) -> Tuple[List, Optional[Cursor]]:
+    """keyset_page for a select() statement on an AsyncSession."""
+    result = await db.execute(_keyset(stmt, model, after, limit))
+    return _split_page(list(result.scalars()), limit)
+
+
+# Ranked results (search) have no stable sort key to seek on, so their cursor
+# carries a plain offset. Search pages are shallow in practice.
+def encode_offset_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f"offset|{offset}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        kind, offset = base64.urlsafe_b64decode(padded).decode("utf-8").split("|", 1)
+        if kind != "offset" or int(offset) < 0:
+            raise ValueError(cursor)
+        return int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -1,4 +1,31 @@
-from fastapi import HTTPException
+"""
+Share-aware access checks.
+
+A user's role on a file is "owner" for their own files, otherwise the highest
+role among shares of the file itself and of any folder above it. Folder
+ancestry comes from the materialized path (app/services/folder_tree.py), so
+resolving a role never walks the parent_id chain: an Acl loads the user's
+shares once (one indexed query on shares.user_id) and checks each file or
+folder against them in memory. get_acl makes one Acl per request.
+"""
+
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from fastapi import Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.deps import get_current_user
+from app.database import get_db
+from app.models.file import File
+from app.models.folder import Folder
+from app.models.link_share import LinkShare
+from app.models.share import Share
+from app.services import link_shares
+from app.services.folder_tree import path_ids
+
+ROLE_RANK = {"viewer": 1, "editor": 2, "owner": 3}
+
 
 def check_permission(role: str, action: str):
     permissions = {
@@ -9,3 +36,94 @@ def check_permission(role: str, action: str):
 
     if action not in permissions.get(role, []):
         raise HTTPException(status_code=403, detail="Permission denied")
+
+
+def highest_role(a: Optional[str], b: Optional[str]) -> Optional[str]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a if ROLE_RANK[a] >= ROLE_RANK[b] else b
+
+
+class Acl:
+    """One user's effective roles, memoized for the life of a request."""
+
+    def __init__(self, db: Session, user_id: UUID):
+        self.db = db
+        self.user_id = user_id
+        self._file_shares: Optional[Dict[UUID, str]] = None
+        self._folder_shares: Dict[UUID, str] = {}
+        self._folder_paths: Dict[UUID, Optional[str]] = {}
+
+    def _load(self) -> None:
+        if self._file_shares is not None:
+            return
+        self._file_shares = {}
+        rows = self.db.query(Share.file_id, Share.folder_id, Share.role).filter(Share.user_id == self.user_id)
+        for file_id, folder_id, role in rows:
+            if file_id is not None:
+                self._file_shares[file_id] = highest_role(self._file_shares.get(file_id), role)
+            elif folder_id is not None:
+                self._folder_shares[folder_id] = highest_role(self._folder_shares.get(folder_id), role)
+
+    def _folder_path(self, folder_id: UUID) -> Optional[str]:
+        if folder_id not in self._folder_paths:
+            row = self.db.query(Folder.path).filter(Folder.id == folder_id).first()
+            self._folder_paths[folder_id] = row[0] if row else None
+        return self._folder_paths[folder_id]
+
+    def _inherited(self, path: Optional[str]) -> Optional[str]:
+        role = None
+        for ancestor_id in path_ids(path or ""):
+            role = highest_role(role, self._folder_shares.get(ancestor_id))
+        return role
+
+    def folder_role(self, folder: Folder) -> Optional[str]:
+        if folder.owner_id == self.user_id:
+            return "owner"
+        self._load()
+        return self._inherited(folder.path) if self._folder_shares else None
+
+    def file_role(self, file: File) -> Optional[str]:
+        if file.owner_id == self.user_id:
+            return "owner"
+        self._load()
+        role = self._file_shares.get(file.id)
+        if file.folder_id is not None and self._folder_shares:
+            role = highest_role(role, self._inherited(self._folder_path(file.folder_id)))
+        return role
+
+    def can_read(self, file: File) -> bool:
+        role = self.file_role(file)
+        # Shared users never see the owner's trash
+        return role is not None and (role == "owner" or not file.is_deleted)
+
+    def require_file(self, file: Optional[File], action: str = "read") -> File:
+        """Return `file` if the user may perform `action` on it; 404 if they cannot see it at all."""
+        role = self.file_role(file) if file is not None else None
+        # Shared users never see the owner's trash
+        if role is None or (role != "owner" and file.is_deleted):
+            raise HTTPException(404, "File not found")
+        check_permission(role, action)
+        return file
+
+    def require_folder(self, folder: Optional[Folder], action: str = "read") -> Folder:
+        role = self.folder_role(folder) if folder is not None else None
+        if role is None:
+            raise HTTPException(404, "Folder not found")
+        check_permission(role, action)
+        return folder
+
+
+def drop_file_shares(db: Session, file_ids: List[UUID]) -> None:
+    """Delete the shares and public links of files being permanently deleted (uncommitted)."""
+    db.query(Share).filter(Share.file_id.in_(file_ids)).delete(synchronize_session=False)
+    # Bulk delete skips the mapper events that evict cached links
+    link_shares.invalidate_files(db, file_ids)
+    db.query(LinkShare).filter(LinkShare.file_id.in_(file_ids)).delete(synchronize_session=False)
+
+
+def get_acl(db: Session = Depends(get_db), user=Depends(get_current_user)) -> Acl:
+    # FastAPI caches dependencies per request, so every check in it shares this Acl
+    return Acl(db, user.id)
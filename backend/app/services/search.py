@@ -0,0 +1,206 @@
+"""
+Name search for files and folders.
+
+On PostgreSQL the pg_trgm GIN indexes on name (see SCHEMA_PATCHES) turn the
+substring match ILIKE '%q%' into an index scan instead of a sequential scan of
+the owner's rows. Results are ranked: exact name, then names starting with the
+query, then names with a word starting with it, then by trigram similarity.
+
+Other databases (SQLite test runs) use an in-process trigram index of
+(id, name) per owner, loaded on first search and kept current by ORM events,
+with the same ranking.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Query, Session
+
+from app.models.file import File as FileModel
+from app.models.folder import Folder
+
+MAX_QUERY_LENGTH = 200
+
+_WORD = re.compile(r"\w+")
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def name_matches(model, q: str):
+    """Case-insensitive substring filter on model.name, safe for any q."""
+    return model.name.ilike(f"%{escape_like(q)}%", escape="\\")
+
+
+# ---------------- PostgreSQL ----------------
+def _pg_search(query: Query, model, q: str, offset: int, limit: int) -> List:
+    lowered = func.lower(model.name)
+    q_lower = escape_like(q.lower())
+    bucket = case(
+        (lowered == q.lower(), 3),
+        (lowered.like(f"{q_lower}%", escape="\\"), 2),
+        (lowered.like(f"% {q_lower}%", escape="\\"), 1),
+        else_=0,
+    )
+    return (
+        query.filter(name_matches(model, q))
+        .order_by(bucket.desc(), func.similarity(model.name, q).desc(), model.name, model.id)
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+
+
+# ---------------- in-process fallback ----------------
+def _substring_trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _word_trigrams(text: str) -> Set[str]:
+    # pg_trgm style: each word padded with two leading blanks and one trailing
+    grams = set()
+    for word in _WORD.findall(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _similarity(a: str, b: str) -> float:
+    ta, tb = _word_trigrams(a), _word_trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def _rank_key(name: str, q: str, row_id: UUID):
+    if name == q:
+        bucket = 3
+    elif name.startswith(q):
+        bucket = 2
+    elif f" {q}" in name:
+        bucket = 1
+    else:
+        bucket = 0
+    return (-bucket, -_similarity(name, q), name, str(row_id))
+
+
+class TrigramIndex:
+    """Trigram postings of lower-cased names, loaded one owner at a time."""
+
+    def __init__(self, model):
+        self.model = model
+        self._names: Dict[UUID, Dict[UUID, str]] = {}
+        self._postings: Dict[UUID, Dict[str, Set[UUID]]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, owner_id: UUID, row_id: UUID, name: str) -> None:
+        name = name.lower()
+        self._names[owner_id][row_id] = name
+        postings = self._postings[owner_id]
+        for gram in _substring_trigrams(name):
+            postings.setdefault(gram, set()).add(row_id)
+
+    def _remove(self, owner_id: UUID, row_id: UUID) -> None:
+        name = self._names[owner_id].pop(row_id, None)
+        if name is None:
+            return
+        postings = self._postings[owner_id]
+        for gram in _substring_trigrams(name):
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del postings[gram]
+
+    def _ensure_loaded(self, db: Session, owner_id: UUID) -> None:
+        if owner_id in self._names:
+            return
+        rows = db.query(self.model.id, self.model.name).filter(self.model.owner_id == owner_id).all()
+        self._names[owner_id] = {}
+        self._postings[owner_id] = {}
+        for row_id, name in rows:
+            self._add(owner_id, row_id, name or "")
+
+    def upsert(self, owner_id: UUID, row_id: UUID, name: Optional[str]) -> None:
+        with self._lock:
+            if owner_id in self._names:
+                self._remove(owner_id, row_id)
+                self._add(owner_id, row_id, name or "")
+
+    def discard(self, owner_id: UUID, row_id: UUID) -> None:
+        with self._lock:
+            if owner_id in self._names:
+                self._remove(owner_id, row_id)
+
+    def match(self, db: Session, owner_id: UUID, q: str) -> List[UUID]:
+        """Ids of the owner's rows whose name contains q, best match first."""
+        q = q.lower()
+        with self._lock:
+            self._ensure_loaded(db, owner_id)
+            names = self._names[owner_id]
+            grams = _substring_trigrams(q)
+            if grams:
+                postings = self._postings[owner_id]
+                sets = sorted((postings.get(g, set()) for g in grams), key=len)
+                candidates = set.intersection(*sets) if sets else set()
+            else:
+                candidates = names.keys()
+            hits = [(row_id, names[row_id]) for row_id in candidates if q in names[row_id]]
+        hits.sort(key=lambda hit: _rank_key(hit[1], q, hit[0]))
+        return [row_id for row_id, _ in hits]
+
+
+_indexes: Dict[type, TrigramIndex] = {FileModel: TrigramIndex(FileModel), Folder: TrigramIndex(Folder)}
+
+
+def _fallback_search(db: Session, query: Query, model, owner_id: UUID, q: str, offset: int, limit: int) -> List:
+    ranked = _indexes[model].match(db, owner_id, q)
+    if not ranked:
+        return []
+    # The index only knows names; the query applies the caller's other filters
+    rows = {row.id: row for row in query.filter(model.id.in_(ranked)).all()}
+    ordered = [rows[row_id] for row_id in ranked if row_id in rows]
+    return ordered[offset:offset + limit + 1]
+
+
+def _on_write(mapper, connection, target):
+    _indexes[mapper.class_].upsert(target.owner_id, target.id, target.name)
+
+
+def _on_delete(mapper, connection, target):
+    _indexes[mapper.class_].discard(target.owner_id, target.id)
+
+
+for _model in _indexes:
+    event.listen(_model, "after_insert", _on_write)
+    event.listen(_model, "after_update", _on_write)
+    event.listen(_model, "after_delete", _on_delete)
+
+
+# ---------------- entry point ----------------
+def search(
+    db: Session,
+    query: Query,
+    model,
+    owner_id: UUID,
+    q: str,
+    offset: int,
+    limit: int,
+) -> Tuple[List, Optional[int]]:
+    """
+    One page of `query` (already filtered to the owner's visible rows)
+    restricted to names containing q, best match first. Returns the rows and
+    the offset of the next page, or None when this is the last page.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        rows = _pg_search(query, model, q, offset, limit)
+    else:
+        rows = _fallback_search(db, query, model, owner_id, q, offset, limit)
+
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], offset + limit
@@ -0,0 +1,112 @@
+"""
+Signed URL service. Signs storage paths in bulk and keeps an LRU/TTL cache
+keyed by storage_path, so listings reuse URLs until shortly before they expire
+instead of making one storage round trip per file.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.core.config import (
+    SIGNED_URL_EXPIRES,
+    SIGNED_URL_REFRESH_MARGIN,
+    SIGNED_URL_CACHE_SIZE,
+    SIGNED_URL_BATCH_SIZE,
+)
+from app.services.storage import StorageError, get_storage
+
+logger = logging.getLogger(__name__)
+
+# storage_path -> (signed url, monotonic deadline after which it must be re-signed)
+_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _reuse_deadline() -> float:
+    return time.monotonic() + max(SIGNED_URL_EXPIRES - SIGNED_URL_REFRESH_MARGIN, 0)
+
+
+def _cache_get(path: str, now: float) -> Optional[str]:
+    entry = _cache.get(path)
+    if entry is None:
+        return None
+    if entry[1] <= now:
+        del _cache[path]
+        return None
+    _cache.move_to_end(path)
+    return entry[0]
+
+
+def _cache_put(urls: Dict[str, str]) -> None:
+    deadline = _reuse_deadline()
+    with _lock:
+        for path, url in urls.items():
+            _cache[path] = (url, deadline)
+            _cache.move_to_end(path)
+        while len(_cache) > SIGNED_URL_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+async def _sign_batch(batch) -> Dict[str, str]:
+    try:
+        signed = await get_storage().sign(batch, SIGNED_URL_EXPIRES)
+    except Exception:
+        logger.exception("Failed to sign batch of %d paths", len(batch))
+        return {}
+    _cache_put(signed)
+    return signed
+
+
+async def get_signed_urls(paths: Iterable[Optional[str]]) -> Dict[str, str]:
+    """
+    Return a mapping of storage_path -> signed URL for every path that could be
+    signed. Cache misses are signed in bulk, SIGNED_URL_BATCH_SIZE paths per
+    storage request, with the batches in flight concurrently. A failed batch is
+    logged and left out of the result so a listing never fails because of signing.
+    """
+    now = time.monotonic()
+    urls: Dict[str, str] = {}
+    missing = []
+
+    with _lock:
+        for path in dict.fromkeys(p for p in paths if p):
+            url = _cache_get(path, now)
+            if url is None:
+                missing.append(path)
+            else:
+                urls[path] = url
+
+    batches = [
+        missing[start:start + SIGNED_URL_BATCH_SIZE]
+        for start in range(0, len(missing), SIGNED_URL_BATCH_SIZE)
+    ]
+    for signed in await asyncio.gather(*(_sign_batch(batch) for batch in batches)):
+        urls.update(signed)
+
+    return urls
+
+
+async def get_signed_url(path: str) -> str:
+    """Return a signed URL for a single path, raising if it cannot be signed."""
+    with _lock:
+        url = _cache_get(path, time.monotonic())
+    if url is not None:
+        return url
+
+    signed = await get_storage().sign([path], SIGNED_URL_EXPIRES)
+    if path not in signed:
+        raise StorageError(f"Could not sign {path}")
+    _cache_put(signed)
+    return signed[path]
+
+
+def invalidate(*paths: Optional[str]) -> None:
+    """Drop cached URLs, e.g. once the underlying object has been deleted."""
+    with _lock:
+        for path in paths:
+            if path:
+                _cache.pop(path, None)
@@ -1,5 +1,186 @@
-def generate_signed_upload_url(filename: str):
-    return f"https://storage.example.com/upload/{filename}"
+"""
+Storage backend interface. Routes and services talk to `get_storage()` instead of
+a specific provider; STORAGE_BACKEND selects Supabase (default) or the local
+filesystem, which needs no network and is what on-prem installs and local
+benchmarks run against.
+"""
 
-def generate_signed_download_url(filename: str):
-    return f"https://storage.example.com/download/{filename}"
+import functools
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from app.core import metrics
+from app.core.config import STORAGE_BACKEND, UPLOAD_CHUNK_SIZE
+
+
+class StorageError(RuntimeError):
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class ObjectStat:
+    path: str
+    size: int
+    content_type: Optional[str] = None
+    modified_at: Optional[datetime] = None
+    etag: Optional[str] = None
+
+
+_TIMED_OPERATIONS = (
+    "put", "get", "move", "delete", "sign", "stat", "list",
+    "start_upload", "upload_offset", "write_chunk", "abort_upload",
+)
+
+
+def _timed(operation: str, fn):
+    """Report each call of a backend operation to app/core/metrics.py."""
+    if operation == "get":
+        # A stream: time it from the first read to the last chunk
+        @functools.wraps(fn)
+        async def stream(self, *args, **kwargs):
+            started = time.perf_counter()
+            failed = False
+            try:
+                async for chunk in fn(self, *args, **kwargs):
+                    yield chunk
+            except Exception:
+                failed = True
+                raise
+            finally:
+                metrics.record_storage(operation, time.perf_counter() - started, failed)
+        return stream
+
+    @functools.wraps(fn)
+    async def call(self, *args, **kwargs):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await fn(self, *args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            metrics.record_storage(operation, time.perf_counter() - started, failed)
+    return call
+
+
+class StorageBackend(ABC):
+    """
+    Object storage operations used by the API. Paths are bucket-relative keys
+    such as "cas/ab/<sha256>". Resumable uploads are identified by an opaque
+    upload reference returned from start_upload.
+
+    Every operation a backend implements is timed automatically.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in _TIMED_OPERATIONS:
+            if name in cls.__dict__:
+                setattr(cls, name, _timed(name, cls.__dict__[name]))
+
+    @abstractmethod
+    async def put(
+        self,
+        path: str,
+        chunks: AsyncIterator[bytes],
+        length: int,
+        content_type: Optional[str] = None,
+    ) -> int:
+        """Store `length` bytes read from `chunks` at `path`; return bytes written."""
+
+    @abstractmethod
+    def get(self, path: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Stream bytes start..end (inclusive, end=None for EOF) of an object."""
+
+    @abstractmethod
+    async def move(self, src: str, dst: str) -> None:
+        """Rename an object within the bucket."""
+
+    @abstractmethod
+    async def delete(self, paths: List[str]) -> None:
+        """Remove objects; missing paths are ignored."""
+
+    @abstractmethod
+    async def sign(self, paths: List[str], expires: int) -> Dict[str, str]:
+        """Return time-limited download URLs for the paths that could be signed."""
+
+    @abstractmethod
+    async def stat(self, path: str) -> Optional[ObjectStat]:
+        """Return object metadata, or None if the object does not exist."""
+
+    @abstractmethod
+    async def list(self, prefix: str = "") -> List[ObjectStat]:
+        """List objects whose path starts with `prefix`."""
+
+    # ---------------- resumable uploads ----------------
+    @abstractmethod
+    async def start_upload(self, path: str, length: int, content_type: Optional[str] = None) -> str:
+        """Begin a resumable upload of `length` bytes to `path`; return its reference."""
+
+    @abstractmethod
+    async def upload_offset(self, upload_ref: str) -> int:
+        """Bytes of a resumable upload committed so far."""
+
+    @abstractmethod
+    async def write_chunk(self, upload_ref: str, offset: int, chunk: bytes) -> int:
+        """
+        Append `chunk` at `offset`; return the new committed offset. Raises
+        StorageError (409) if the upload is no longer at `offset`.
+        """
+
+    @abstractmethod
+    async def abort_upload(self, upload_ref: str) -> None:
+        """Discard a resumable upload."""
+
+    async def close(self) -> None:
+        """Release pooled connections or other resources."""
+
+
+def upload_length(file: UploadFile) -> int:
+    # Starlette spools uploads to a temp file, so the length is a cheap seek away
+    length = file.file.seek(0, os.SEEK_END)
+    file.file.seek(0)
+    return length
+
+
+async def iter_upload_file(file: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    await file.seek(0)
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """Return the configured backend, creating it on first use."""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "local":
+            from app.utils.local_storage import LocalStorageBackend
+            _storage = LocalStorageBackend()
+        elif STORAGE_BACKEND == "supabase":
+            from app.utils.supabase import SupabaseStorageBackend
+            _storage = SupabaseStorageBackend()
+        else:
+            raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND!r}")
+    return _storage
+
+
+async def close_storage() -> None:
+    global _storage
+    if _storage is not None:
+        await _storage.close()
+        _storage = None
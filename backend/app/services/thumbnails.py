@@ -0,0 +1,152 @@
+"""
+Preview thumbnails for images and PDFs.
+
+Uploads queue a "thumbnail" job (see schedule); it renders a small JPEG in a
+process pool and stores it next to the original as "<storage path>.thumb.jpg".
+Every file with the same content then gets thumbnail_path set, and listings
+sign it as thumbnail_url, so grids fetch a few kilobytes per file instead of
+the original. GET /files/{id}/thumbnail renders on first use for files the
+job has not reached yet. Thumbnails of deduplicated content are shared, and
+removed together with the content (dedup.purge_storage).
+"""
+
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import (
+    THUMBNAIL_SIZE,
+    THUMBNAIL_QUALITY,
+    THUMBNAIL_WORKERS,
+    THUMBNAIL_MAX_SOURCE_BYTES,
+)
+from app.database import SessionLocal
+from app.models.file import File
+from app.services import jobs
+from app.services.storage import get_storage
+from app.utils.imaging import render_thumbnail
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SUFFIX = ".thumb.jpg"
+
+
+def thumbnail_path(storage_path: str) -> str:
+    return f"{storage_path}{THUMBNAIL_SUFFIX}"
+
+
+@lru_cache(maxsize=None)
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def supported(mime_type: Optional[str], size: Optional[int] = None) -> bool:
+    """Whether a preview can be made for this kind (and size) of file here."""
+    if not mime_type or (size or 0) > THUMBNAIL_MAX_SOURCE_BYTES or not _installed("PIL"):
+        return False
+    if mime_type == "application/pdf":
+        return _installed("fitz")
+    # SVG is not a raster format Pillow can open
+    return mime_type.startswith("image/") and mime_type != "image/svg+xml"
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs threads (the event loop's
+        # threadpool, DB pool) is unsafe
+        _pool = ProcessPoolExecutor(max(THUMBNAIL_WORKERS, 1), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def schedule(db: Session, file: File) -> None:
+    """
+    Give a new file (not yet committed) its thumbnail: reuse the one made for
+    the same content if there is one, otherwise queue the job for after commit.
+    """
+    if not supported(file.mime_type, file.size):
+        return
+    if file.content_hash:
+        existing = (
+            db.query(File.thumbnail_path)
+            .filter(File.content_hash == file.content_hash, File.thumbnail_path.isnot(None))
+            .first()
+        )
+        if existing is not None:
+            file.thumbnail_path = existing[0]
+            return
+    payload = {"path": file.storage_path, "mime_type": file.mime_type, "hash": file.content_hash}
+    jobs.enqueue("thumbnail", payload, owner_id=file.owner_id, db=db)
+
+
+async def _read_source(storage_path: str):
+    """A local file path when the backend has one, else the content itself."""
+    storage = get_storage()
+    local_path = getattr(storage, "local_path", None)
+    if local_path is not None:
+        return str(local_path(storage_path))
+    return b"".join([chunk async for chunk in storage.get(storage_path)])
+
+
+def _record(storage_path: str, content_hash: Optional[str], thumb: str) -> None:
+    db = SessionLocal()
+    try:
+        match = File.content_hash == content_hash if content_hash else File.storage_path == storage_path
+        db.execute(
+            update(File).where(match, File.thumbnail_path.is_(None)).values(thumbnail_path=thumb),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def generate(storage_path: str, mime_type: str, content_hash: Optional[str] = None) -> Optional[str]:
+    """
+    Make sure the thumbnail for the object at `storage_path` exists and is
+    recorded on its files. Returns its path, or None if the content could not
+    be rendered.
+    """
+    storage = get_storage()
+    thumb = thumbnail_path(storage_path)
+
+    if await storage.stat(thumb) is None:
+        source = await _read_source(storage_path)
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(
+            _executor(), render_thumbnail, source, mime_type, THUMBNAIL_SIZE, THUMBNAIL_QUALITY
+        )
+        if data is None:
+            logger.warning("Could not render a thumbnail for %s (%s)", storage_path, mime_type)
+            return None
+
+        async def body():
+            yield data
+
+        await storage.put(thumb, body(), len(data), "image/jpeg")
+
+    await run_in_threadpool(_record, storage_path, content_hash, thumb)
+    return thumb
+
+
+@jobs.job("thumbnail", concurrency=THUMBNAIL_WORKERS)
+async def _thumbnail(payload: dict) -> None:
+    await generate(payload["path"], payload["mime_type"], payload.get("hash"))
@@ -0,0 +1,138 @@
+"""
+Trash retention: files that have been in the trash for TRASH_RETENTION_DAYS
+are permanently deleted by the periodic purge_trash job.
+
+The purge works through expired rows in batches of TRASH_PURGE_BATCH_SIZE,
+each in its own short transaction: lock the batch (SKIP LOCKED, so rows a
+user is restoring or deleting right now are left for the next run), release
+its blob references, DELETE it by primary key and commit. The batch's storage
+objects are then removed with bulk delete calls. No lock on `files` outlives a
+batch, and concurrent purges (one per process) never wait on each other.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete
+
+from app.core.config import (
+    TRASH_RETENTION_DAYS,
+    TRASH_PURGE_INTERVAL,
+    TRASH_PURGE_BATCH_SIZE,
+    TRASH_PURGE_BATCH_PAUSE,
+)
+from app.database import SessionLocal
+from app.models.file import File
+from app.services import dedup, jobs, permissions, usage
+
+logger = logging.getLogger(__name__)
+
+_stats = {
+    "runs": 0,
+    "batches": 0,
+    "files_purged": 0,
+    "bytes_purged": 0,
+    "objects_deleted": 0,
+    "storage_failures": 0,
+    "last_run_seconds": 0.0,
+    "last_run_files_per_second": 0.0,
+}
+_stats_lock = threading.Lock()
+
+
+def _delete_batch(cutoff: datetime) -> Tuple[int, int, List[str], List[str]]:
+    """
+    Permanently delete one batch of files trashed before `cutoff` and commit.
+    Returns (files deleted, their total size, orphaned blob digests, legacy
+    storage paths).
+    """
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(File.id, File.owner_id, File.size, File.content_hash, File.storage_path)
+            .filter(File.is_deleted == True, File.deleted_at < cutoff)
+            .order_by(File.deleted_at)
+            .limit(TRASH_PURGE_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.rollback()
+            return 0, 0, [], []
+
+        orphans, legacy_paths = dedup.release_files(db, rows)
+        usage.release(db, rows)
+        file_ids = [row.id for row in rows]
+        permissions.drop_file_shares(db, file_ids)
+        db.execute(
+            delete(File).where(File.id.in_(file_ids)),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        return len(rows), sum(row.size or 0 for row in rows), orphans, legacy_paths
+    finally:
+        db.close()
+
+
+async def purge_expired(retention_days: int = TRASH_RETENTION_DAYS) -> Dict[str, float]:
+    """Delete all files trashed more than `retention_days` ago; returns this run's figures."""
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    started = time.monotonic()
+    run = {"batches": 0, "files_purged": 0, "bytes_purged": 0, "objects_deleted": 0, "storage_failures": 0}
+
+    while True:
+        count, size, orphans, legacy_paths = await run_in_threadpool(_delete_batch, cutoff)
+        if not count:
+            break
+        run["batches"] += 1
+        run["files_purged"] += count
+        run["bytes_purged"] += size
+
+        try:
+            run["objects_deleted"] += await dedup.purge_storage(orphans, legacy_paths)
+        except Exception:
+            # The rows are already gone; leave the objects to the retrying purge job
+            logger.exception("Trash purge could not remove storage objects; queueing a retry")
+            run["storage_failures"] += 1
+            await run_in_threadpool(jobs.enqueue, "purge_storage", {"digests": orphans, "paths": legacy_paths})
+
+        if count < TRASH_PURGE_BATCH_SIZE:
+            break
+        await asyncio.sleep(TRASH_PURGE_BATCH_PAUSE)
+
+    elapsed = time.monotonic() - started
+    run["seconds"] = elapsed
+    run["files_per_second"] = run["files_purged"] / elapsed if elapsed > 0 else 0.0
+
+    with _stats_lock:
+        _stats["runs"] += 1
+        for key in ("batches", "files_purged", "bytes_purged", "objects_deleted", "storage_failures"):
+            _stats[key] += run[key]
+        _stats["last_run_seconds"] = elapsed
+        _stats["last_run_files_per_second"] = run["files_per_second"]
+
+    if run["files_purged"]:
+        logger.info(
+            "Purged %d trashed files (%d bytes, %d objects) in %d batches, %.2fs (%.0f files/s)",
+            run["files_purged"], run["bytes_purged"], run["objects_deleted"],
+            run["batches"], elapsed, run["files_per_second"],
+        )
+    return run
+
+
+def stats() -> Dict[str, float]:
+    with _stats_lock:
+        return dict(_stats)
+
+
+@jobs.job("purge_trash", concurrency=1)
+async def _purge_trash(payload: dict) -> None:
+    await purge_expired(payload.get("retention_days", TRASH_RETENTION_DAYS))
+
+
+jobs.every(TRASH_PURGE_INTERVAL, "purge_trash")
@@ -0,0 +1,102 @@
+"""
+Expiry of abandoned resumable uploads.
+
+A session with no activity for UPLOAD_SESSION_TTL_HOURS is expired: the
+upload routes stop accepting it, and the periodic expire_uploads job removes
+it. The job works in batches of UPLOAD_CLEANUP_BATCH_SIZE: lock expired rows
+(SKIP LOCKED, so a session a PATCH holds right now is left alone), delete
+them and commit, then abort the uploads in storage and remove their staged
+objects (present when every byte arrived but publishing failed). The rows go
+first, so a failure in storage can only leak an object, never leave a
+session pointing at one that is gone.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+
+from app.core.config import UPLOAD_SESSION_TTL_HOURS, UPLOAD_CLEANUP_INTERVAL, UPLOAD_CLEANUP_BATCH_SIZE
+from app.database import SessionLocal
+from app.models.upload_session import UploadSession
+from app.services import jobs
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+_last_activity = func.coalesce(UploadSession.updated_at, UploadSession.created_at)
+
+
+def _cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+
+
+def is_expired(session: UploadSession) -> bool:
+    last_activity = session.updated_at or session.created_at
+    return bool(last_activity and last_activity < _cutoff())
+
+
+async def discard(uploads: Iterable[Tuple[str, str]]) -> None:
+    """Abort (upload_ref, storage_path) uploads in storage and delete what they staged."""
+    storage = get_storage()
+    paths = []
+    for upload_ref, storage_path in uploads:
+        paths.append(storage_path)
+        try:
+            await storage.abort_upload(upload_ref)
+        except Exception:
+            # Storage expires unfinished uploads itself
+            logger.exception("Failed to abort resumable upload %s", upload_ref)
+    try:
+        await storage.delete(paths)
+    except Exception:
+        logger.exception("Failed to delete staged uploads %s", paths)
+
+
+def _delete_batch() -> List[Tuple[str, str]]:
+    """Delete one batch of expired sessions and commit; returns their (upload_ref, storage_path)."""
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(UploadSession.id, UploadSession.upload_ref, UploadSession.storage_path)
+            .filter(_last_activity < _cutoff())
+            .limit(UPLOAD_CLEANUP_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            db.rollback()
+            return []
+        db.query(UploadSession).filter(UploadSession.id.in_([row.id for row in rows])).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        return [(row.upload_ref, row.storage_path) for row in rows]
+    finally:
+        db.close()
+
+
+async def expire_sessions() -> int:
+    """Remove every expired upload session; returns how many there were."""
+    removed = 0
+    while True:
+        uploads = await run_in_threadpool(_delete_batch)
+        if not uploads:
+            break
+        removed += len(uploads)
+        await discard(uploads)
+        if len(uploads) < UPLOAD_CLEANUP_BATCH_SIZE:
+            break
+    if removed:
+        logger.info("Removed %d expired upload sessions", removed)
+    return removed
+
+
+@jobs.job("expire_uploads", concurrency=1)
+async def _expire_uploads(payload: dict) -> None:
+    await expire_sessions()
+
+
+jobs.every(UPLOAD_CLEANUP_INTERVAL, "expire_uploads")
@@ -0,0 +1,178 @@
+"""
+Per-user storage accounting and quotas.
+
+user_usage holds each user's running totals (bytes and file count, trash
+included). They change by delta in the same transaction as the files rows
+they describe: up on upload, down on permanent delete and trash purge. A quota
+check is then a primary-key lookup however many files the user has. Uploads
+are checked against the declared size before any bytes reach storage.
+
+The reconcile_usage job recomputes the totals from files, a batch of users per
+transaction, to repair drift (e.g. rows changed outside the API).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.core.config import USER_QUOTA_BYTES, USAGE_RECONCILE_BATCH_SIZE, USAGE_RECONCILE_INTERVAL
+from app.database import SessionLocal
+from app.models.file import File
+from app.models.usage import UserUsage
+from app.models.user import User
+from app.services import jobs
+
+logger = logging.getLogger(__name__)
+
+
+def _dialect_insert(db: Session):
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
+
+
+def _apply(db: Session, deltas: Dict[UUID, Tuple[int, int]]) -> None:
+    """Add (bytes, files) deltas to users' totals (uncommitted), creating missing rows."""
+    insert = _dialect_insert(db)
+    now = datetime.utcnow()
+    # Fixed order, so concurrent multi-user changes lock rows the same way
+    for owner_id in sorted(deltas, key=str):
+        size, count = deltas[owner_id]
+        if not size and not count:
+            continue
+        if insert is not None:
+            stmt = insert(UserUsage).values(user_id=owner_id, bytes_used=size, file_count=count, updated_at=now)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[UserUsage.user_id],
+                set_={
+                    "bytes_used": UserUsage.bytes_used + stmt.excluded.bytes_used,
+                    "file_count": UserUsage.file_count + stmt.excluded.file_count,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+            ))
+            continue
+
+        result = db.execute(
+            update(UserUsage)
+            .where(UserUsage.user_id == owner_id)
+            .values(bytes_used=UserUsage.bytes_used + size, file_count=UserUsage.file_count + count, updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.add(UserUsage(user_id=owner_id, bytes_used=size, file_count=count, updated_at=now))
+            db.flush()
+
+
+def record_upload(db: Session, owner_id: UUID, size: int) -> None:
+    """Count a new file against its owner (uncommitted; commit with the files row)."""
+    _apply(db, {owner_id: (size or 0, 1)})
+
+
+def release(db: Session, files: Iterable) -> None:
+    """Uncount permanently deleted files (rows or tuples with owner_id and size; uncommitted)."""
+    deltas: Dict[UUID, List[int]] = defaultdict(lambda: [0, 0])
+    for f in files:
+        deltas[f.owner_id][0] -= f.size or 0
+        deltas[f.owner_id][1] -= 1
+    _apply(db, {owner_id: tuple(delta) for owner_id, delta in deltas.items()})
+
+
+def _quota(row: Optional[UserUsage]) -> int:
+    return row.quota_bytes if row is not None and row.quota_bytes is not None else USER_QUOTA_BYTES
+
+
+def check_quota(db: Session, owner_id: UUID, incoming: int) -> None:
+    """Reject (413) an upload of `incoming` bytes that would exceed the owner's quota."""
+    row = db.query(UserUsage).filter(UserUsage.user_id == owner_id).first()
+    quota = _quota(row)
+    used = row.bytes_used if row is not None else 0
+    if quota and used + incoming > quota:
+        raise HTTPException(413, f"Storage quota exceeded ({used} of {quota} bytes used)")
+
+
+def usage_to_dict(db: Session, owner_id: UUID) -> dict:
+    row = db.query(UserUsage).filter(UserUsage.user_id == owner_id).first()
+    quota = _quota(row)
+    used = row.bytes_used if row is not None else 0
+    return {
+        "bytes_used": used,
+        "file_count": row.file_count if row is not None else 0,
+        "quota_bytes": quota or None,
+        "bytes_available": max(quota - used, 0) if quota else None,
+    }
+
+
+# ---------------- reconciliation ----------------
+def _reconcile_batch(after: Optional[UUID]) -> Tuple[Optional[UUID], int]:
+    """Recompute the totals of the next batch of users; returns (last user id, rows corrected)."""
+    db = SessionLocal()
+    try:
+        query = db.query(User.id).order_by(User.id)
+        if after is not None:
+            query = query.filter(User.id > after)
+        user_ids = [user_id for (user_id,) in query.limit(USAGE_RECONCILE_BATCH_SIZE)]
+        if not user_ids:
+            return None, 0
+
+        # Lock the batch's rows first: uploads and deletes for these users wait
+        # until the new totals are in, so none of their deltas is overwritten
+        insert = _dialect_insert(db)
+        if insert is not None:
+            db.execute(
+                insert(UserUsage)
+                .values([{"user_id": user_id, "bytes_used": 0, "file_count": 0} for user_id in user_ids])
+                .on_conflict_do_nothing()
+            )
+        existing = {
+            row.user_id: row
+            for row in db.query(UserUsage).filter(UserUsage.user_id.in_(user_ids)).with_for_update()
+        }
+        totals = {
+            owner_id: (int(size), count)
+            for owner_id, size, count in (
+                db.query(File.owner_id, func.coalesce(func.sum(File.size), 0), func.count(File.id))
+                .filter(File.owner_id.in_(user_ids))
+                .group_by(File.owner_id)
+            )
+        }
+
+        corrected = 0
+        for user_id in user_ids:
+            size, count = totals.get(user_id, (0, 0))
+            row = existing.get(user_id)
+            if row is None:
+                if size or count:
+                    db.add(UserUsage(user_id=user_id, bytes_used=size, file_count=count))
+                    corrected += 1
+            elif (row.bytes_used, row.file_count) != (size, count):
+                row.bytes_used, row.file_count = size, count
+                corrected += 1
+        db.commit()
+        return user_ids[-1], corrected
+    finally:
+        db.close()
+
+
+@jobs.job("reconcile_usage", concurrency=1)
+async def _reconcile_usage(payload: dict) -> None:
+    after, corrected = None, 0
+    while True:
+        after, fixed = await run_in_threadpool(_reconcile_batch, after)
+        if after is None:
+            break
+        corrected += fixed
+    logger.info("Usage reconciliation corrected %d users", corrected)
+
+
+jobs.every(USAGE_RECONCILE_INTERVAL, "reconcile_usage")
@@ -1,14 +1,77 @@
+"""
+Password hashing.
+
+bcrypt is deliberately slow (~250 ms of CPU at cost 12), so request handlers
+use the async wrappers, which run it in a dedicated pool of
+PASSWORD_HASH_WORKERS processes: a burst of logins queues for those cores
+instead of filling the request threadpool and holding the GIL while other
+requests wait. The sync functions are what the pool runs.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 
+from app.core.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
 pwd_context = CryptContext(
     schemes=["bcrypt"],
-    deprecated="auto"
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
 )
 
-def hash_password(password: str) -> str:
+def _truncate(password: str) -> str:
     # bcrypt max = 72 bytes
-    password = password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
-    return pwd_context.hash(password)
+    return password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(_truncate(password))
 
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
+
+def verify_and_update(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash if `hashed` was made with another cost factor)."""
+    ok = pwd_context.verify(plain, hashed)
+    if ok and pwd_context.needs_update(hashed):
+        return True, hash_password(plain)
+    return ok, None
+
+
+# ---------------- process pool ----------------
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs threads (the event loop's
+        # threadpool, DB pool) is unsafe
+        _pool = ProcessPoolExecutor(max(PASSWORD_HASH_WORKERS, 1), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+async def _run(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor(), fn, *args)
+
+async def hash_password_async(password: str) -> str:
+    return await _run(hash_password, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await _run(verify_password, plain, hashed)
+
+async def verify_and_update_async(plain: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return await _run(verify_and_update, plain, hashed)
+
+def warm_up() -> None:
+    """Start the worker processes now; spawning them costs the first caller ~0.5 s."""
+    executor = _executor()
+    for _ in range(max(PASSWORD_HASH_WORKERS, 1)):
+        executor.submit(int)
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
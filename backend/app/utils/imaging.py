@@ -0,0 +1,52 @@
+"""
+Thumbnail rendering, run in worker processes by app/services/thumbnails.py.
+Kept free of app imports so spawned workers start quickly.
+"""
+
+from io import BytesIO
+from typing import Optional, Union
+
+Source = Union[str, bytes]
+
+
+def _open_image(source: Source, size: int):
+    from PIL import Image, ImageOps
+
+    image = Image.open(source if isinstance(source, str) else BytesIO(source))
+    # JPEG can decode straight at a fraction of full resolution
+    image.draft("RGB", (size, size))
+    return ImageOps.exif_transpose(image)
+
+
+def _render_pdf_page(source: Source, size: int):
+    import fitz
+    from PIL import Image
+
+    with (fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")) as doc:
+        page = doc.load_page(0)
+        zoom = size / max(page.rect.width, page.rect.height, 1)
+        pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def render_thumbnail(source: Source, mime_type: str, size: int, quality: int) -> Optional[bytes]:
+    """
+    JPEG preview of an image, or of a PDF's first page, whose longest edge is
+    at most `size`. `source` is a local file path or the content itself.
+    Returns None when the content cannot be decoded.
+    """
+    from PIL import Image
+
+    try:
+        if mime_type == "application/pdf":
+            image = _render_pdf_page(source, size)
+        else:
+            image = _open_image(source, size)
+        image.thumbnail((size, size), Image.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = BytesIO()
+        image.save(out, "JPEG", quality=quality, optimize=True)
+        return out.getvalue()
+    except Exception:
+        return None
@@ -0,0 +1,286 @@
+"""
+Local filesystem storage backend. Objects live under LOCAL_STORAGE_ROOT using
+their storage path as the relative file name. Signed URLs point at the
+/storage/local route, which checks an HMAC signature and serves ranged reads
+with sendfile (when the ASGI server offers zero-copy send) or mmap slices.
+"""
+
+import os
+import hmac
+import json
+import mmap
+import time
+import uuid
+import hashlib
+import logging
+import mimetypes
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import quote, urlencode
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from anyio import to_thread
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import LOCAL_STORAGE_ROOT, PUBLIC_API_URL, SECRET_KEY
+from app.services.storage import StorageBackend, StorageError, ObjectStat
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Scratch directories under the root; never valid object paths.
+_TMP_DIR = ".tmp"
+_UPLOADS_DIR = ".uploads"
+
+
+def _signature(path: str, expires_at: int) -> str:
+    message = f"{path}:{expires_at}".encode("utf-8")
+    return hmac.new((SECRET_KEY or "").encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def verify_signature(path: str, expires_at: int, signature: str) -> bool:
+    if expires_at < time.time():
+        return False
+    return hmac.compare_digest(_signature(path, expires_at), signature)
+
+
+def _stat_to_object(path: str, st: os.stat_result) -> ObjectStat:
+    return ObjectStat(
+        path=path,
+        size=st.st_size,
+        content_type=mimetypes.guess_type(path)[0],
+        modified_at=datetime.utcfromtimestamp(st.st_mtime),
+        etag=f'"{st.st_ino:x}-{st.st_size:x}-{int(st.st_mtime_ns):x}"',
+    )
+
+
+def _read_range(file_path: Path, start: int, end: int, chunk_size: int = READ_CHUNK_SIZE):
+    """Yield bytes start..end (inclusive) of a file as copies of mmap slices."""
+    with open(file_path, "rb") as fh:
+        if end < start:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = start
+            while pos <= end:
+                stop = min(pos + chunk_size, end + 1)
+                yield mm[pos:stop]
+                pos = stop
+
+
+class LocalStorageBackend(StorageBackend):
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT):
+        self.root = Path(root).resolve()
+        for sub in (_TMP_DIR, _UPLOADS_DIR):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+
+    def local_path(self, path: str) -> Path:
+        """Absolute file for a storage path, refusing anything outside the root."""
+        file_path = (self.root / path).resolve()
+        if self.root not in file_path.parents or file_path.relative_to(self.root).parts[0] in (_TMP_DIR, _UPLOADS_DIR):
+            raise StorageError(f"Invalid storage path: {path}", 400)
+        return file_path
+
+    # ---------------- objects ----------------
+    async def put(self, path, chunks, length, content_type=None) -> int:
+        target = self.local_path(path)
+        tmp = self.root / _TMP_DIR / uuid.uuid4().hex
+        written = 0
+        try:
+            fh = await to_thread.run_sync(open, tmp, "wb")
+            try:
+                async for chunk in chunks:
+                    await to_thread.run_sync(fh.write, chunk)
+                    written += len(chunk)
+            finally:
+                await to_thread.run_sync(fh.close)
+            if written != length:
+                raise StorageError(f"Expected {length} bytes, got {written}")
+
+            def publish():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp, target)
+
+            await to_thread.run_sync(publish)
+            return written
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+    async def get(self, path, start=0, end=None) -> AsyncIterator[bytes]:
+        file_path = self.local_path(path)
+        try:
+            size = (await to_thread.run_sync(file_path.stat)).st_size
+        except FileNotFoundError:
+            raise StorageError(f"Object not found: {path}", 404)
+
+        reader = _read_range(file_path, start, size - 1 if end is None else min(end, size - 1))
+        sentinel = object()
+        while True:
+            chunk = await to_thread.run_sync(next, reader, sentinel)
+            if chunk is sentinel:
+                return
+            yield chunk
+
+    async def move(self, src, dst):
+        source, target = self.local_path(src), self.local_path(dst)
+
+        def rename():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(source, target)
+
+        try:
+            await to_thread.run_sync(rename)
+        except FileNotFoundError:
+            raise StorageError(f"Object not found: {src}", 404)
+
+    async def delete(self, paths):
+        def remove():
+            for path in paths:
+                self.local_path(path).unlink(missing_ok=True)
+
+        await to_thread.run_sync(remove)
+
+    async def sign(self, paths, expires) -> Dict[str, str]:
+        expires_at = int(time.time()) + expires
+        return {
+            path: (
+                f"{PUBLIC_API_URL}/storage/local/{quote(path)}?"
+                + urlencode({"expires": expires_at, "signature": _signature(path, expires_at)})
+            )
+            for path in paths
+        }
+
+    async def stat(self, path) -> Optional[ObjectStat]:
+        file_path = self.local_path(path)
+        try:
+            st = await to_thread.run_sync(file_path.stat)
+        except FileNotFoundError:
+            return None
+        return _stat_to_object(path, st)
+
+    async def list(self, prefix="") -> List[ObjectStat]:
+        def walk():
+            objects = []
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                if Path(dirpath) == self.root:
+                    dirnames[:] = [d for d in dirnames if d not in (_TMP_DIR, _UPLOADS_DIR)]
+                for name in filenames:
+                    full = Path(dirpath) / name
+                    rel = full.relative_to(self.root).as_posix()
+                    if rel.startswith(prefix):
+                        objects.append(_stat_to_object(rel, full.stat()))
+            return sorted(objects, key=lambda o: o.path)
+
+        return await to_thread.run_sync(walk)
+
+    # ---------------- resumable uploads ----------------
+    def _upload_files(self, upload_ref: str):
+        if not upload_ref.isalnum():
+            raise StorageError("Invalid upload reference", 400)
+        base = self.root / _UPLOADS_DIR / upload_ref
+        return base.with_suffix(".json"), base.with_suffix(".part")
+
+    async def start_upload(self, path, length, content_type=None) -> str:
+        self.local_path(path)
+        upload_ref = uuid.uuid4().hex
+        meta_file, data_file = self._upload_files(upload_ref)
+
+        def create():
+            meta_file.write_text(json.dumps({"path": path, "length": length}))
+            data_file.touch()
+
+        await to_thread.run_sync(create)
+        return upload_ref
+
+    async def upload_offset(self, upload_ref) -> int:
+        meta_file, data_file = self._upload_files(upload_ref)
+
+        def offset():
+            if not data_file.exists():
+                raise StorageError("Upload not found", 404)
+            return data_file.stat().st_size
+
+        return await to_thread.run_sync(offset)
+
+    async def write_chunk(self, upload_ref, offset, chunk) -> int:
+        meta_file, data_file = self._upload_files(upload_ref)
+
+        def append():
+            meta = json.loads(meta_file.read_text())
+            with open(data_file, "ab") as fh:
+                # Concurrent PATCHes at the same offset: only the first may append
+                if fcntl is not None:
+                    fcntl.flock(fh, fcntl.LOCK_EX)
+                fh.seek(0, os.SEEK_END)
+                if fh.tell() != offset:
+                    raise StorageError("Upload-Offset mismatch", 409)
+                fh.write(chunk)
+                new_offset = fh.tell()
+            if new_offset == meta["length"]:
+                target = self.local_path(meta["path"])
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(data_file, target)
+                meta_file.unlink(missing_ok=True)
+            return new_offset
+
+        try:
+            return await to_thread.run_sync(append)
+        except FileNotFoundError:
+            raise StorageError("Upload not found", 404)
+
+    async def abort_upload(self, upload_ref):
+        meta_file, data_file = self._upload_files(upload_ref)
+
+        def remove():
+            data_file.unlink(missing_ok=True)
+            meta_file.unlink(missing_ok=True)
+
+        await to_thread.run_sync(remove)
+
+
+class LocalFileResponse(Response):
+    """
+    Serve bytes start..end (inclusive) of a local file. Uses the ASGI
+    "http.response.zerocopysend" extension (sendfile) when the server offers it,
+    and otherwise streams mmap slices so memory stays bounded.
+    """
+
+    def __init__(self, file_path: Path, start: int, end: int, status_code: int = 200, headers=None, media_type=None):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.file_path = file_path
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(max(end - start + 1, 0))
+        self.headers.setdefault("accept-ranges", "bytes")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.file_path, "rb") as fh:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": fh.fileno(),
+                    "offset": self.start,
+                    "count": self.end - self.start + 1,
+                })
+            return
+
+        reader = _read_range(self.file_path, self.start, self.end)
+        sentinel = object()
+        while True:
+            chunk = await to_thread.run_sync(next, reader, sentinel)
+            if chunk is sentinel:
+                break
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
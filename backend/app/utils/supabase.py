@@ -1,122 +1,430 @@
 """
-Defensive supabase helper. Patches httpx for legacy 'proxy' kwarg (temporary),
-validates required env/config, logs responses, and provides robust upload/delete helpers.
+Async Supabase storage helper. Talks to the storage REST and TUS endpoints over a
+single pooled httpx.AsyncClient (keep-alive, optional HTTP/2), with per-call
+timeouts and retries with exponential backoff, so one worker can keep hundreds
+of storage operations in flight without tying up threadpool workers.
+SupabaseStorageBackend exposes it through the StorageBackend interface.
 """
 
-import os
-import uuid
+import base64
+import random
+import asyncio
 import logging
-import httpx as _httpx
-from typing import Optional
+import httpx
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+
+from app.core.config import (
+    SUPABASE_URL,
+    SUPABASE_SERVICE_ROLE_KEY,
+    SUPABASE_BUCKET,
+    UPLOAD_CHUNK_SIZE,
+    STORAGE_HTTP2,
+    STORAGE_MAX_CONNECTIONS,
+    STORAGE_MAX_KEEPALIVE_CONNECTIONS,
+    STORAGE_KEEPALIVE_EXPIRY,
+    STORAGE_CONNECT_TIMEOUT,
+    STORAGE_TIMEOUT,
+    STORAGE_UPLOAD_TIMEOUT,
+    STORAGE_RETRIES,
+    STORAGE_RETRY_BACKOFF,
+)
+from app.core import metrics
+from app.services.storage import StorageBackend, StorageError, ObjectStat
 
 logger = logging.getLogger(__name__)
 
-# Temporary shim: drop legacy 'proxy' kwarg if passed
-if not getattr(_httpx, "_cv_shim_patched", False):
-    _orig_client_init = _httpx.Client.__init__
+TUS_VERSION = "1.0.0"
 
-    def _patched_client_init(self, *args, **kwargs):
-        kwargs.pop("proxy", None)
-        return _orig_client_init(self, *args, **kwargs)
+# Status codes worth retrying: throttling and transient upstream failures
+_RETRY_STATUS = {429, 500, 502, 503, 504}
 
-    _httpx.Client.__init__ = _patched_client_init
-    _httpx._cv_shim_patched = True
+_client: Optional[httpx.AsyncClient] = None
 
-# Remove proxy env vars only if you are sure you DON'T want system proxies to apply
-for v in ("HTTP_PROXY", "HTTPS_PROXY", "ALL_PROXY", "http_proxy", "https_proxy", "all_proxy"):
-    os.environ.pop(v, None)
 
-# Now import supabase client factory
-from supabase import create_client
-from app.core.config import (
-    SUPABASE_URL,
-    SUPABASE_SERVICE_ROLE_KEY,
-    SUPABASE_BUCKET,
-)
-from fastapi import UploadFile
+def storage_api_url() -> str:
+    # Validate required config and fail fast with clear message
+    if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+        raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in environment/config")
+    if not SUPABASE_BUCKET:
+        raise RuntimeError("SUPABASE_BUCKET must be set in environment/config")
+    return f"{SUPABASE_URL.rstrip('/')}/storage/v1"
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared storage client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=storage_api_url(),
+            headers={
+                "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+                "apikey": SUPABASE_SERVICE_ROLE_KEY,
+            },
+            http2=STORAGE_HTTP2,
+            limits=httpx.Limits(
+                max_connections=STORAGE_MAX_CONNECTIONS,
+                max_keepalive_connections=STORAGE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=STORAGE_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(STORAGE_TIMEOUT, connect=STORAGE_CONNECT_TIMEOUT),
+            # Talk to storage directly rather than through system proxy settings
+            trust_env=False,
+        )
+    return _client
 
-# Validate required config and fail fast with clear message
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-    raise RuntimeError("SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set in environment/config")
-if not SUPABASE_BUCKET:
-    raise RuntimeError("SUPABASE_BUCKET must be set in environment/config")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
-def upload_file_to_supabase(file: UploadFile, user_id: str) -> str:
+async def storage_request(
+    method: str,
+    url: str,
+    *,
+    idempotent: bool = True,
+    timeout: Optional[float] = None,
+    **kwargs,
+) -> httpx.Response:
     """
-    Upload a FastAPI UploadFile to Supabase storage and return the storage path.
-    This reads file bytes (safe for small/medium files). If you need streaming for
-    very large files, adapt to pass file.file but ensure the client accepts a file-like.
+    Send a request to the storage API, retrying up to STORAGE_RETRIES times with
+    exponential backoff and jitter. Connection failures are always retried since
+    the request never reached the server; timeouts and 5xx/429 responses only
+    when the call is idempotent.
     """
-    file_ext = file.filename.rsplit(".", 1)[-1] if "." in (file.filename or "") else ""
-    path = f"{user_id}/{uuid.uuid4().hex}{('.' + file_ext) if file_ext else ''}"
+    if timeout is not None:
+        kwargs["timeout"] = httpx.Timeout(timeout, connect=STORAGE_CONNECT_TIMEOUT)
 
-    # Ensure pointer is at start then read bytes
-    try:
-        file.file.seek(0)
-    except Exception:
-        pass
+    attempt = 0
+    while True:
+        try:
+            res = await get_client().request(method, url, **kwargs)
+            if res.status_code not in _RETRY_STATUS or not idempotent or attempt >= STORAGE_RETRIES:
+                return res
+            logger.warning("Storage %s %s returned %s, retrying", method, url, res.status_code)
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+            if attempt >= STORAGE_RETRIES:
+                raise
+            logger.warning("Storage %s %s failed to connect (%s), retrying", method, url, exc)
+        except httpx.TransportError as exc:
+            if not idempotent or attempt >= STORAGE_RETRIES:
+                raise
+            logger.warning("Storage %s %s failed (%s), retrying", method, url, exc)
 
-    try:
-        content = file.file.read()
-        if not content:
-            raise ValueError("Uploaded file is empty")
-
-        # Build options consistently (avoid passing None)
-        options = {}
-        if getattr(file, "content_type", None):
-            options["content-type"] = file.content_type
-
-        # Perform upload. Some versions accept bytes directly.
-        res = supabase.storage.from_(SUPABASE_BUCKET).upload(path, content, options or None)
-        logger.info("Supabase upload response for %s: %s", path, res)
-
-        # Some client versions return {'error':..., 'data':...}
-        if isinstance(res, dict):
-            # If error field present, raise with details
-            err = res.get("error") or (res.get("data") and res["data"].get("error"))
-            if err:
-                logger.error("Supabase reported error during upload: %s", err)
-                raise RuntimeError(f"Supabase upload failed: {err}")
-
-        # Success: return storage path
-        return path
+        metrics.storage_retries.inc(method)
+        await asyncio.sleep(STORAGE_RETRY_BACKOFF * (2 ** attempt) * (0.5 + random.random()))
+        attempt += 1
 
-    except Exception as exc:
-        logger.exception("Exception while uploading file to Supabase: %s", exc)
-        # Re-raise a clear error for caller (route should map to HTTP 500)
-        raise RuntimeError(f"Supabase upload exception: {exc}") from exc
+
+def _object_url(path: str) -> str:
+    return f"/object/{SUPABASE_BUCKET}/{quote(path)}"
+
+
+def _b64(value: str) -> str:
+    return base64.b64encode(value.encode("utf-8")).decode("ascii")
 
 
-def generate_signed_url(path: str, expires: int = 3600) -> str:
+# ---------------- RESUMABLE (TUS) UPLOADS ----------------
+async def start_resumable_upload(path: str, length: int, content_type: Optional[str] = None) -> str:
+    """Create a TUS upload for `path` and return its upload URL."""
+    metadata = {"bucketName": SUPABASE_BUCKET, "objectName": path}
+    if content_type:
+        metadata["contentType"] = content_type
+
+    res = await storage_request(
+        "POST",
+        "/upload/resumable",
+        idempotent=False,
+        headers={
+            "Tus-Resumable": TUS_VERSION,
+            "Upload-Length": str(length),
+            "Upload-Metadata": ",".join(f"{k} {_b64(v)}" for k, v in metadata.items()),
+            "x-upsert": "false",
+        },
+    )
+    if res.status_code != 201 or "location" not in res.headers:
+        raise StorageError(f"Supabase resumable upload create failed: {res.text}", res.status_code)
+    return str(res.url.join(res.headers["location"]))
+
+
+async def get_resumable_offset(upload_url: str) -> int:
+    """Return how many bytes of a TUS upload the storage backend has committed."""
+    res = await storage_request("HEAD", upload_url, headers={"Tus-Resumable": TUS_VERSION})
+    if res.status_code != 200:
+        raise StorageError("Supabase resumable upload lookup failed", res.status_code)
+    return int(res.headers["upload-offset"])
+
+
+async def upload_resumable_chunk(upload_url: str, offset: int, chunk: bytes) -> int:
+    """
+    Append `chunk` at `offset` and return the new committed offset. Safe to
+    retry: a chunk that already landed makes storage answer 409, in which case
+    the committed offset is read back.
+    """
+    res = await storage_request(
+        "PATCH",
+        upload_url,
+        timeout=STORAGE_UPLOAD_TIMEOUT,
+        content=chunk,
+        headers={
+            "Tus-Resumable": TUS_VERSION,
+            "Upload-Offset": str(offset),
+            "Content-Type": "application/offset+octet-stream",
+        },
+    )
+    if res.status_code == 409:
+        return await get_resumable_offset(upload_url)
+    if res.status_code != 204:
+        raise StorageError(f"Supabase chunk upload failed at offset {offset}: {res.text}", res.status_code)
+    return int(res.headers["upload-offset"])
+
+
+async def abort_resumable_upload(upload_url: str) -> None:
+    res = await storage_request("DELETE", upload_url, headers={"Tus-Resumable": TUS_VERSION})
+    if res.status_code not in (204, 404):
+        raise StorageError("Supabase resumable upload abort failed", res.status_code)
+
+
+# ---------------- OBJECTS ----------------
+async def upload_object(path: str, content: bytes, content_type: Optional[str] = None) -> None:
+    """Upload a small object with a single request."""
+    res = await storage_request(
+        "POST",
+        _object_url(path),
+        idempotent=False,
+        timeout=STORAGE_UPLOAD_TIMEOUT,
+        content=content,
+        headers={
+            "Content-Type": content_type or "application/octet-stream",
+            "x-upsert": "false",
+        },
+    )
+    logger.info("Supabase upload response for %s: %s", path, res.status_code)
+    if res.status_code not in (200, 201):
+        raise StorageError(f"Supabase upload failed: {res.text}", res.status_code)
+
+
+async def download_object(path: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Stream an object (or the inclusive byte range start..end) without buffering it."""
+    headers = {}
+    if start or end is not None:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+
+    url = f"/object/authenticated/{SUPABASE_BUCKET}/{quote(path)}"
+    async with get_client().stream("GET", url, headers=headers) as res:
+        if res.status_code not in (200, 206):
+            await res.aread()
+            raise StorageError(f"Supabase download failed: {res.text}", res.status_code)
+        async for chunk in res.aiter_bytes():
+            yield chunk
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
     try:
-        res = supabase.storage.from_(SUPABASE_BUCKET).create_signed_url(path, expires)
-        logger.debug("create_signed_url response: %s", res)
+        return parsedate_to_datetime(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def stat_object(path: str) -> Optional[ObjectStat]:
+    res = await storage_request("HEAD", f"/object/authenticated/{SUPABASE_BUCKET}/{quote(path)}")
+    if res.status_code in (400, 404):
+        return None
+    if res.status_code != 200:
+        raise StorageError("Supabase stat failed", res.status_code)
+    return ObjectStat(
+        path=path,
+        size=int(res.headers.get("content-length", 0)),
+        content_type=res.headers.get("content-type"),
+        modified_at=_parse_http_date(res.headers.get("last-modified")),
+        etag=res.headers.get("etag"),
+    )
 
-        # handle common shapes
-        url = None
-        if isinstance(res, dict):
-            url = res.get("signedURL") or res.get("signed_url")
-            if not url and "data" in res and isinstance(res["data"], dict):
-                url = res["data"].get("signedURL") or res["data"].get("signed_url")
 
+async def list_objects(prefix: str = "", page_size: int = 1000) -> List[ObjectStat]:
+    """List objects under `prefix` (one folder level, as the storage API does)."""
+    folder, _, name_prefix = prefix.rpartition("/")
+    objects: List[ObjectStat] = []
+    offset = 0
+    while True:
+        res = await storage_request(
+            "POST",
+            f"/object/list/{SUPABASE_BUCKET}",
+            json={"prefix": folder, "search": name_prefix, "limit": page_size, "offset": offset},
+        )
+        if res.status_code != 200:
+            raise StorageError(f"Supabase list failed: {res.text}", res.status_code)
+
+        items = res.json() or []
+        for item in items:
+            metadata = item.get("metadata") or {}
+            objects.append(ObjectStat(
+                path=f"{folder}/{item['name']}" if folder else item["name"],
+                size=int(metadata.get("size") or 0),
+                content_type=metadata.get("mimetype"),
+                modified_at=_parse_http_date(metadata.get("lastModified")),
+                etag=metadata.get("eTag"),
+            ))
+        if len(items) < page_size:
+            return objects
+        offset += page_size
+
+
+def _absolute_signed_url(signed: str) -> str:
+    # The API answers with a path relative to /storage/v1
+    return signed if signed.startswith("http") else f"{storage_api_url()}{signed}"
+
+
+async def generate_signed_url(path: str, expires: int = 3600) -> str:
+    try:
+        res = await storage_request(
+            "POST", f"/object/sign/{SUPABASE_BUCKET}/{quote(path)}", json={"expiresIn": expires}
+        )
+        if res.status_code != 200:
+            raise StorageError(f"create_signed_url failed: {res.text}", res.status_code)
+
+        data = res.json()
+        url = data.get("signedURL") or data.get("signed_url")
         if not url:
-            raise RuntimeError(f"Unexpected create_signed_url response: {res}")
+            raise StorageError(f"Unexpected create_signed_url response: {data}")
 
-        return url
+        return _absolute_signed_url(url)
     except Exception as exc:
         logger.exception("Failed to create signed URL for %s: %s", path, exc)
         raise
 
 
-def delete_file_from_supabase(path: str) -> None:
+async def generate_signed_urls(paths: List[str], expires: int = 3600) -> Dict[str, str]:
+    """
+    Sign many paths with a single storage request. Returns a mapping of
+    path -> signed URL; paths the storage API reports an error for are omitted.
+    """
+    if not paths:
+        return {}
+
     try:
-        res = supabase.storage.from_(SUPABASE_BUCKET).remove([path])
-        logger.info("delete response for %s: %s", path, res)
-        if isinstance(res, dict) and res.get("error"):
-            raise RuntimeError(f"Supabase delete failed: {res['error']}")
-    except Exception:
-        logger.exception("Failed to delete %s from supabase", path)
-        raise
\ No newline at end of file
+        res = await storage_request(
+            "POST", f"/object/sign/{SUPABASE_BUCKET}", json={"expiresIn": expires, "paths": paths}
+        )
+        if res.status_code != 200:
+            raise StorageError(f"create_signed_urls failed: {res.text}", res.status_code)
+
+        urls: Dict[str, str] = {}
+        for item in res.json() or []:
+            if not isinstance(item, dict) or item.get("error"):
+                continue
+            url = item.get("signedURL") or item.get("signed_url")
+            if item.get("path") and url:
+                urls[item["path"]] = _absolute_signed_url(url)
+        return urls
+    except Exception as exc:
+        logger.exception("Failed to create signed URLs for %d paths: %s", len(paths), exc)
+        raise
+
+
+async def move_object(src: str, dst: str) -> None:
+    res = await storage_request(
+        "POST",
+        "/object/move",
+        json={"bucketId": SUPABASE_BUCKET, "sourceKey": src, "destinationKey": dst},
+    )
+    if res.status_code != 200:
+        raise StorageError(f"Supabase move {src} -> {dst} failed: {res.text}", res.status_code)
+
+
+# Supabase removes at most this many objects per request
+DELETE_BATCH_SIZE = 1000
+
+
+async def delete_files_from_supabase(paths: List[str]) -> None:
+    """Remove several objects, DELETE_BATCH_SIZE per request."""
+    for start in range(0, len(paths), DELETE_BATCH_SIZE):
+        batch = paths[start:start + DELETE_BATCH_SIZE]
+        try:
+            res = await storage_request("DELETE", f"/object/{SUPABASE_BUCKET}", json={"prefixes": batch})
+            logger.info("delete response for %d paths: %s", len(batch), res.status_code)
+            if res.status_code != 200:
+                raise StorageError(f"Supabase delete failed: {res.text}", res.status_code)
+        except Exception:
+            logger.exception("Failed to delete %d paths from supabase", len(batch))
+            raise
+
+
+async def delete_file_from_supabase(path: str) -> None:
+    await delete_files_from_supabase([path])
+
+
+class SupabaseStorageBackend(StorageBackend):
+    async def put(self, path, chunks, length, content_type=None) -> int:
+        """
+        Objects up to UPLOAD_CHUNK_SIZE go up in a single request, larger ones
+        through a TUS upload one chunk at a time, so memory is bounded by the
+        chunk size whatever the object size.
+        """
+        try:
+            if length <= UPLOAD_CHUNK_SIZE:
+                content = b"".join([chunk async for chunk in chunks])
+                if len(content) != length:
+                    raise StorageError(f"Expected {length} bytes, got {len(content)}")
+                await upload_object(path, content, content_type)
+                return len(content)
+
+            upload_url = await start_resumable_upload(path, length, content_type)
+            offset = 0
+            buffer = bytearray()
+            async for data in chunks:
+                buffer += data
+                while len(buffer) >= UPLOAD_CHUNK_SIZE:
+                    offset = await upload_resumable_chunk(upload_url, offset, bytes(buffer[:UPLOAD_CHUNK_SIZE]))
+                    del buffer[:UPLOAD_CHUNK_SIZE]
+            if buffer:
+                offset = await upload_resumable_chunk(upload_url, offset, bytes(buffer))
+            if offset != length:
+                raise StorageError(f"Upload ended at {offset} of {length} bytes")
+
+            logger.info("Supabase chunked upload of %s complete (%d bytes)", path, offset)
+            return offset
+        except Exception as exc:
+            logger.exception("Exception while uploading file to Supabase: %s", exc)
+            # Re-raise a clear error for caller (route should map to HTTP 500)
+            if isinstance(exc, StorageError):
+                raise
+            raise StorageError(f"Supabase upload exception: {exc}") from exc
+
+    def get(self, path, start=0, end=None):
+        return download_object(path, start, end)
+
+    async def move(self, src, dst):
+        await move_object(src, dst)
+
+    async def delete(self, paths):
+        await delete_files_from_supabase(paths)
+
+    async def sign(self, paths, expires):
+        return await generate_signed_urls(paths, expires)
+
+    async def stat(self, path):
+        return await stat_object(path)
+
+    async def list(self, prefix=""):
+        return await list_objects(prefix)
+
+    async def start_upload(self, path, length, content_type=None):
+        return await start_resumable_upload(path, length, content_type)
+
+    async def upload_offset(self, upload_ref):
+        return await get_resumable_offset(upload_ref)
+
+    async def write_chunk(self, upload_ref, offset, chunk):
+        return await upload_resumable_chunk(upload_ref, offset, chunk)
+
+    async def abort_upload(self, upload_ref):
+        await abort_resumable_upload(upload_ref)
+
+    async def close(self):
+        await close_client()
@@ -0,0 +1,312 @@
+"""
+API load benchmark.
+
+Runs the FastAPI app in-process (httpx.ASGITransport, no server) against a
+database and the fake storage API in benchmarks/fake_storage.py. It seeds one
+user with N files spread over N/100 folders. Then it drives the listing,
+search, upload, view and login endpoints with a fixed number of requests at a
+fixed concurrency, and reports throughput and p50/p95/p99 latency per scenario
+as JSON. Runs are seeded, so two runs on different commits send the same
+requests. Write each run with --output and pass an older file to --compare to
+see the change.
+
+The default database is a fresh SQLite file; pass --database-url for
+PostgreSQL (pending migrations are applied first; the synthetic user and its
+rows are removed afterwards unless --keep).
+
+    cd backend
+    python -m benchmarks.api_bench --files 100000 --output before.json
+    python -m benchmarks.api_bench --files 100000 --compare before.json
+    python -m benchmarks.api_bench --database-url postgresql://... --files 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+SCENARIOS = ["list", "search", "upload", "view", "login"]
+BENCH_PASSWORD = "bench-password"
+BUCKET = "bench"
+
+
+def configure(args) -> None:
+    """Settings must be in the environment before any app module is imported."""
+    if args.database_url:
+        database_url = args.database_url
+    else:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='api-bench-'), 'bench.db')}"
+    os.environ.update({
+        "DATABASE_URL": database_url,
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or "api-bench",
+        "STORAGE_BACKEND": "supabase",
+        "SUPABASE_URL": "http://fake-storage.invalid",
+        "SUPABASE_SERVICE_ROLE_KEY": "bench",
+        "SUPABASE_BUCKET": BUCKET,
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "DB_ASYNC": "false",
+    })
+
+
+def seed(owner_id, files: int, batch: int, rng: random.Random) -> float:
+    from app.database import engine
+    from app.models.file import File as FileModel
+    from app.models.folder import Folder
+    from benchmarks.search_bench import random_name
+
+    started = time.perf_counter()
+    base = datetime.utcnow()
+
+    # A forest of folders: a tenth are roots, the rest hang under an earlier one
+    folders = []
+    for i in range(max(files // 100, 1)):
+        folder_id = uuid.uuid4()
+        parent = rng.choice(folders) if folders and rng.random() > 0.1 else None
+        folders.append({
+            "id": folder_id,
+            "name": f"folder {i}",
+            "parent_id": parent["id"] if parent else None,
+            "owner_id": owner_id,
+            "path": (parent["path"] if parent else "/") + folder_id.hex + "/",
+            "depth": parent["depth"] + 1 if parent else 0,
+            "created_at": base - timedelta(seconds=i),
+        })
+
+    with engine.begin() as conn:
+        for start in range(0, len(folders), batch):
+            conn.execute(Folder.__table__.insert(), folders[start:start + batch])
+        for start in range(0, files, batch):
+            conn.execute(FileModel.__table__.insert(), [
+                {
+                    "id": uuid.uuid4(),
+                    "name": random_name(rng),
+                    "owner_id": owner_id,
+                    "folder_id": rng.choice(folders)["id"] if rng.random() < 0.7 else None,
+                    "mime_type": "application/octet-stream",
+                    "size": rng.randint(1, 50_000_000),
+                    "storage_path": f"bench/{owner_id}/{start + i}",
+                    "is_deleted": rng.random() < 0.05,
+                    "is_starred": False,
+                    "created_at": base - timedelta(seconds=start + i),
+                }
+                for i in range(min(batch, files - start))
+            ])
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("ANALYZE files")
+            conn.exec_driver_sql("ANALYZE folders")
+    return time.perf_counter() - started
+
+
+def cleanup(owner_id) -> None:
+    from sqlalchemy import select
+
+    from app.database import engine
+    from app.models.blob import Blob
+    from app.models.file import File as FileModel
+    from app.models.folder import Folder
+    from app.models.job import Job
+    from app.models.usage import UserUsage
+    from app.models.user import User
+
+    with engine.begin() as conn:
+        hashes = [h for (h,) in conn.execute(
+            select(FileModel.content_hash).where(FileModel.owner_id == owner_id, FileModel.content_hash.isnot(None))
+        )]
+        conn.execute(FileModel.__table__.delete().where(FileModel.owner_id == owner_id))
+        for start in range(0, len(hashes), 1000):
+            conn.execute(Blob.__table__.delete().where(Blob.hash.in_(hashes[start:start + 1000])))
+        conn.execute(Folder.__table__.delete().where(Folder.owner_id == owner_id))
+        conn.execute(Job.__table__.delete().where(Job.owner_id == owner_id))
+        conn.execute(UserUsage.__table__.delete().where(UserUsage.user_id == owner_id))
+        conn.execute(User.__table__.delete().where(User.id == owner_id))
+
+
+def percentile(samples, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def run_scenario(client, make_request, requests: int, concurrency: int, warmup: int) -> dict:
+    """Send `requests` requests from `concurrency` workers; latencies in ms."""
+    for _ in range(warmup):
+        await make_request(client)
+
+    samples = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            res = await make_request(client)
+            samples.append((time.perf_counter() - started) * 1000)
+            if res.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    samples.sort()
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(percentile(samples, 0.95), 2),
+        "p99_ms": round(percentile(samples, 0.99), 2),
+        "max_ms": round(samples[-1], 2),
+    }
+
+
+def scenarios(email: str, file_ids, rng: random.Random, upload_size: int) -> dict:
+    from benchmarks.search_bench import QUERIES
+
+    async def list_files(client):
+        return await client.get("/files", params={"limit": 50})
+
+    async def search(client):
+        return await client.get("/files/search", params={"q": rng.choice(QUERIES)})
+
+    async def upload(client):
+        content = rng.randbytes(upload_size)
+        return await client.post("/files/upload", files={"file": (f"upload-{rng.random()}.bin", content, "application/octet-stream")})
+
+    async def view(client):
+        return await client.get(f"/files/{rng.choice(file_ids)}/view")
+
+    async def login(client):
+        return await client.post("/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+
+    return {"list": list_files, "search": search, "upload": upload, "view": view, "login": login}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+async def bench(args) -> dict:
+    import httpx
+
+    from app import migrations
+    from app.database import SessionLocal, engine
+    from app.main import app
+    from app.models.file import File as FileModel
+    from app.models.user import User
+    from app.utils.hashing import hash_password
+    from benchmarks.fake_storage import FakeStorage, install
+
+    migrations.upgrade()
+    rng = random.Random(args.seed)
+    email = f"api-bench-{uuid.uuid4().hex}@example.com"
+    db = SessionLocal()
+    owner = User(name="api-bench", email=email, password_hash=hash_password(BENCH_PASSWORD))
+    db.add(owner)
+    db.commit()
+    owner_id = owner.id
+    db.close()
+
+    storage = FakeStorage(BUCKET, latency=args.storage_latency_ms / 1000)
+    try:
+        seed_seconds = seed(owner_id, args.files, args.batch, rng)
+        db = SessionLocal()
+        file_ids = [str(i) for (i,) in db.query(FileModel.id).filter(
+            FileModel.owner_id == owner_id, FileModel.is_deleted == False
+        ).limit(10_000)]
+        db.close()
+
+        await app.router.startup()
+        install(storage)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            token = (await client.post("/auth/login", json={"email": email, "password": BENCH_PASSWORD})).json()["access_token"]
+            client.headers["Authorization"] = f"Bearer {token}"
+
+            results = {}
+            selected = args.scenarios.split(",") if args.scenarios else SCENARIOS
+            for name, make_request in scenarios(email, file_ids, rng, args.upload_size).items():
+                if name not in selected:
+                    continue
+                requests = args.login_requests if name == "login" else args.requests
+                results[name] = await run_scenario(client, make_request, requests, args.concurrency, args.warmup)
+                print(f"{name}: {results[name]}", file=sys.stderr)
+        await app.router.shutdown()
+    finally:
+        if not args.keep and args.database_url:
+            cleanup(owner_id)
+
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat() + "Z",
+        "python": sys.version.split()[0],
+        "dialect": engine.dialect.name,
+        "files": args.files,
+        "concurrency": args.concurrency,
+        "storage_latency_ms": args.storage_latency_ms,
+        "seed_seconds": round(seed_seconds, 1),
+        "storage_requests": storage.requests,
+        "scenarios": results,
+    }
+
+
+def compare(baseline: dict, current: dict) -> str:
+    lines = [f"{'scenario':<8} {'metric':<15} {baseline.get('commit', '?'):>10} {current.get('commit', '?'):>10} {'change':>8}"]
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            change = (now[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+            lines.append(f"{name:<8} {metric:<15} {before[metric]:>10} {now[metric]:>10} {change:>+7.1f}%")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="default: a fresh SQLite file")
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50, help="login requests (bcrypt bound)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--upload-size", type=int, default=64 * 1024)
+    parser.add_argument("--storage-latency-ms", type=float, default=0.0, help="added to every fake storage call")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--scenarios", help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    parser.add_argument("--compare", help="JSON result of an earlier run to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic user and rows (--database-url)")
+    args = parser.parse_args()
+
+    configure(args)
+    result = asyncio.run(bench(args))
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    if args.compare:
+        with open(args.compare) as fh:
+            print(compare(json.load(fh), result), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+In-process stand-in for the Supabase storage API.
+
+FakeStorage answers the storage REST and TUS endpoints app/utils/supabase.py
+calls, keeping objects in memory, behind an httpx.MockTransport. install()
+points the app's shared storage client at it, so benchmarks run the real
+SupabaseStorageBackend code path (request building, retries, signing batches)
+without network access or a storage bill. An optional fixed latency stands in
+for the round trip to the real service.
+"""
+
+import asyncio
+import base64
+import json
+import re
+import uuid
+from typing import Dict, Optional
+from urllib.parse import unquote
+
+import httpx
+
+
+class FakeStorage:
+    def __init__(self, bucket: str, latency: float = 0.0):
+        self.bucket = bucket
+        self.latency = latency
+        self.objects: Dict[str, bytes] = {}
+        self.uploads: Dict[str, dict] = {}
+        self.requests = 0
+
+        b = re.escape(bucket)
+        self._routes = [
+            ("POST", re.compile(rf"/object/sign/{b}/(?P<path>.+)"), self._sign_one),
+            ("POST", re.compile(rf"/object/sign/{b}"), self._sign_many),
+            ("POST", re.compile(rf"/object/list/{b}"), self._list),
+            ("POST", re.compile(r"/object/move"), self._move),
+            ("GET", re.compile(rf"/object/authenticated/{b}/(?P<path>.+)"), self._download),
+            ("HEAD", re.compile(rf"/object/authenticated/{b}/(?P<path>.+)"), self._stat),
+            ("POST", re.compile(rf"/object/{b}/(?P<path>.+)"), self._upload),
+            ("DELETE", re.compile(rf"/object/{b}"), self._delete),
+            ("POST", re.compile(r"/upload/resumable"), self._tus_create),
+            ("HEAD", re.compile(r"/upload/resumable/(?P<ref>[^/]+)"), self._tus_offset),
+            ("PATCH", re.compile(r"/upload/resumable/(?P<ref>[^/]+)"), self._tus_patch),
+            ("DELETE", re.compile(r"/upload/resumable/(?P<ref>[^/]+)"), self._tus_delete),
+        ]
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        await request.aread()
+
+        path = request.url.path.split("/storage/v1", 1)[-1]
+        for method, pattern, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if method == request.method and match:
+                return handler(request, **{k: unquote(v) for k, v in match.groupdict().items()})
+        return httpx.Response(404, json={"error": f"no fake route for {request.method} {path}"})
+
+    # ---------------- objects ----------------
+    def _upload(self, request, path):
+        if request.headers.get("x-upsert") == "false" and path in self.objects:
+            return httpx.Response(400, json={"error": "Duplicate", "statusCode": "409"})
+        self.objects[path] = request.content
+        return httpx.Response(200, json={"Key": f"{self.bucket}/{path}"})
+
+    def _download(self, request, path):
+        data = self.objects.get(path)
+        if data is None:
+            return httpx.Response(404, json={"error": "not_found"})
+        range_header = request.headers.get("range")
+        if not range_header:
+            return httpx.Response(200, content=data)
+        start, _, end = range_header.removeprefix("bytes=").partition("-")
+        start, end = int(start), int(end) if end else len(data) - 1
+        return httpx.Response(206, content=data[start:end + 1])
+
+    def _stat(self, request, path):
+        data = self.objects.get(path)
+        if data is None:
+            return httpx.Response(404)
+        return httpx.Response(200, headers={"content-length": str(len(data)), "content-type": "application/octet-stream"})
+
+    def _signed(self, path: str, expires: int) -> str:
+        return f"/object/sign/{self.bucket}/{path}?token=fake&expires={expires}"
+
+    def _sign_one(self, request, path):
+        expires = json.loads(request.content).get("expiresIn", 3600)
+        return httpx.Response(200, json={"signedURL": self._signed(path, expires)})
+
+    def _sign_many(self, request):
+        body = json.loads(request.content)
+        expires = body.get("expiresIn", 3600)
+        return httpx.Response(200, json=[
+            {"path": p, "signedURL": self._signed(p, expires), "error": None} for p in body.get("paths", [])
+        ])
+
+    def _list(self, request):
+        body = json.loads(request.content)
+        folder = body.get("prefix", "").strip("/")
+        prefix = f"{folder}/" if folder else ""
+        names = sorted(
+            p[len(prefix):] for p in self.objects
+            if p.startswith(prefix) and "/" not in p[len(prefix):] and p[len(prefix):].startswith(body.get("search", ""))
+        )
+        page = names[body.get("offset", 0):body.get("offset", 0) + body.get("limit", 100)]
+        return httpx.Response(200, json=[{"name": n, "metadata": {"size": len(self.objects[prefix + n])}} for n in page])
+
+    def _move(self, request):
+        body = json.loads(request.content)
+        data = self.objects.pop(body["sourceKey"], None)
+        if data is None:
+            return httpx.Response(404, json={"error": "not_found"})
+        self.objects[body["destinationKey"]] = data
+        return httpx.Response(200, json={"message": "Successfully moved"})
+
+    def _delete(self, request):
+        body = json.loads(request.content)
+        removed = [p for p in body.get("prefixes", []) if self.objects.pop(p, None) is not None]
+        return httpx.Response(200, json=[{"name": p} for p in removed])
+
+    # ---------------- resumable (TUS) uploads ----------------
+    def _tus_create(self, request):
+        metadata = {}
+        for item in request.headers.get("upload-metadata", "").split(","):
+            key, _, value = item.partition(" ")
+            metadata[key] = base64.b64decode(value).decode() if value else ""
+        ref = uuid.uuid4().hex
+        self.uploads[ref] = {
+            "path": metadata.get("objectName"),
+            "length": int(request.headers["upload-length"]),
+            "data": bytearray(),
+        }
+        return httpx.Response(201, headers={"location": f"/storage/v1/upload/resumable/{ref}"})
+
+    def _tus_offset(self, request, ref):
+        upload = self.uploads.get(ref)
+        if upload is None:
+            return httpx.Response(404)
+        return httpx.Response(200, headers={"upload-offset": str(len(upload["data"]))})
+
+    def _tus_patch(self, request, ref):
+        upload = self.uploads.get(ref)
+        if upload is None:
+            return httpx.Response(404)
+        if int(request.headers["upload-offset"]) != len(upload["data"]):
+            return httpx.Response(409)
+        upload["data"] += request.content
+        if len(upload["data"]) >= upload["length"]:
+            self.objects[upload["path"]] = bytes(upload["data"])
+        return httpx.Response(204, headers={"upload-offset": str(len(upload["data"]))})
+
+    def _tus_delete(self, request, ref):
+        return httpx.Response(204 if self.uploads.pop(ref, None) is not None else 404)
+
+
+def install(storage: FakeStorage, base_url: Optional[str] = None) -> None:
+    """Route the app's storage client (app/utils/supabase.py) to `storage`."""
+    from app.utils import supabase
+
+    supabase._client = httpx.AsyncClient(
+        base_url=base_url or supabase.storage_api_url(),
+        transport=storage.transport(),
+    )
@@ -0,0 +1,140 @@
+"""
+Search latency benchmark.
+
+Seeds one synthetic user with N files (default 1,000,000) in the database at
+DATABASE_URL, then times app.services.search for a set of queries and prints
+p50/p95/max latencies as JSON. With --seqscan the same queries also run with
+index scans disabled, which is what the old ILIKE search cost.
+
+Pending migrations (including the pg_trgm indexes) are applied first.
+
+    cd backend
+    python -m benchmarks.search_bench --files 1000000
+    python -m benchmarks.search_bench --files 1000000 --seqscan --keep
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app import migrations
+from app.database import SessionLocal, engine
+from app.models.file import File as FileModel
+from app.models.user import User
+from app.services import search
+
+WORDS = [
+    "report", "invoice", "budget", "summary", "draft", "final", "photo", "scan",
+    "contract", "notes", "meeting", "quarterly", "project", "design", "backup",
+    "resume", "presentation", "receipt", "holiday", "plan", "review", "team",
+]
+EXTENSIONS = ["pdf", "docx", "xlsx", "png", "jpg", "txt", "zip", "pptx"]
+QUERIES = ["rep", "report", "invoice 2021", "final.pdf", "quarterly budget", "xqz"]
+
+
+def random_name(rng: random.Random) -> str:
+    words = rng.sample(WORDS, rng.randint(1, 3))
+    return f"{' '.join(words)} {rng.randint(2015, 2025)}.{rng.choice(EXTENSIONS)}"
+
+
+def seed(owner_id, count: int, batch: int, rng: random.Random) -> float:
+    started = time.perf_counter()
+    table = FileModel.__table__
+    base = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, count, batch):
+            rows = [
+                {
+                    "id": uuid.uuid4(),
+                    "name": random_name(rng),
+                    "owner_id": owner_id,
+                    "mime_type": "application/octet-stream",
+                    "size": rng.randint(1, 50_000_000),
+                    "storage_path": f"bench/{owner_id}/{start + i}",
+                    "is_deleted": rng.random() < 0.05,
+                    "is_starred": False,
+                    "created_at": base - timedelta(seconds=start + i),
+                }
+                for i in range(min(batch, count - start))
+            ]
+            conn.execute(table.insert(), rows)
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE files"))
+    return time.perf_counter() - started
+
+
+def time_query(owner_id, q: str, runs: int, limit: int, seqscan: bool) -> dict:
+    samples = []
+    hits = 0
+    for i in range(runs + 1):
+        db = SessionLocal()
+        try:
+            if seqscan:
+                db.execute(text("SET LOCAL enable_indexscan = off"))
+                db.execute(text("SET LOCAL enable_bitmapscan = off"))
+            query = db.query(FileModel).filter(FileModel.owner_id == owner_id, FileModel.is_deleted == False)
+            started = time.perf_counter()
+            rows, _ = search.search(db, query, FileModel, owner_id, q, 0, limit)
+            elapsed = (time.perf_counter() - started) * 1000
+        finally:
+            db.close()
+        if i:  # first run warms caches (and loads the fallback index)
+            samples.append(elapsed)
+            hits = len(rows)
+
+    samples.sort()
+    return {
+        "query": q,
+        "hits": hits,
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        "max_ms": round(samples[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seqscan", action="store_true", help="also time with index scans disabled (PostgreSQL)")
+    parser.add_argument("--keep", action="store_true", help="keep the synthetic user and files afterwards")
+    args = parser.parse_args()
+
+    migrations.upgrade()
+    rng = random.Random(args.seed)
+
+    owner = User(name="search-bench", email=f"search-bench-{uuid.uuid4().hex}@example.invalid", password_hash="!")
+    db = SessionLocal()
+    db.add(owner)
+    db.commit()
+    owner_id = owner.id
+    db.close()
+
+    try:
+        result = {
+            "dialect": engine.dialect.name,
+            "files": args.files,
+            "seed_seconds": round(seed(owner_id, args.files, args.batch, rng), 1),
+            "indexed": [time_query(owner_id, q, args.runs, args.limit, False) for q in QUERIES],
+        }
+        if args.seqscan and engine.dialect.name == "postgresql":
+            result["seqscan"] = [time_query(owner_id, q, args.runs, args.limit, True) for q in QUERIES]
+        print(json.dumps(result, indent=2))
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(FileModel.__table__.delete().where(FileModel.owner_id == owner_id))
+                conn.execute(User.__table__.delete().where(User.id == owner_id))
+
+
+if __name__ == "__main__":
+    main()
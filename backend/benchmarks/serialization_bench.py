@@ -0,0 +1,168 @@
+"""
+Serialization microbenchmark for file listings.
+
+Builds pages of in-memory File rows (no database or storage) and times
+turning them into a response body two ways:
+
+  stdlib  the previous path: file_to_dict with str()/isoformat() per field,
+          then FastAPI's jsonable_encoder, then json.dumps as Starlette
+          renders it
+  orjson  file_to_dict as it is now, rendered by app.core.responses.dumps
+          (what responses.render() sends, skipping jsonable_encoder)
+
+For the orjson body it also reports the compressed size and time per
+encoding at the levels configured for CompressionMiddleware. Results are
+per page (milliseconds, median of --repeat runs) as JSON.
+
+    cd backend
+    python -m benchmarks.serialization_bench --pages 100,1000 --output after.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+
+def configure() -> None:
+    """Settings must be in the environment before any app module is imported."""
+    workdir = tempfile.mkdtemp(prefix="serialization-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.setdefault("SECRET_KEY", "serialization-bench")
+    os.environ.setdefault("STORAGE_BACKEND", "local")
+
+
+def legacy_file_to_dict(f, url=None, thumbnail_url=None) -> dict:
+    """file_to_dict before the orjson fast path."""
+    return {
+        "id": str(f.id),
+        "name": f.name,
+        "mime_type": f.mime_type,
+        "size": f.size,
+        "owner_id": str(f.owner_id) if f.owner_id else None,
+        "folder_id": str(f.folder_id) if f.folder_id else None,
+        "storage_path": f.storage_path,
+        "url": url,
+        "thumbnail_url": thumbnail_url,
+        "is_starred": bool(f.is_starred),
+        "is_deleted": bool(f.is_deleted),
+        "deleted_at": f.deleted_at.isoformat() if f.deleted_at else None,
+        "created_at": f.created_at.isoformat() if f.created_at else None,
+        "updated_at": f.updated_at.isoformat() if f.updated_at else None,
+    }
+
+
+def make_rows(count: int, rng: random.Random) -> list:
+    from app.models.file import File as FileModel
+    from benchmarks.search_bench import random_name
+
+    owner_id = uuid.uuid4()
+    folders = [uuid.uuid4() for _ in range(20)]
+    base = datetime.utcnow()
+    rows = []
+    for i in range(count):
+        created = base - timedelta(seconds=i, microseconds=rng.randint(0, 999_999))
+        rows.append(FileModel(
+            id=uuid.uuid4(),
+            name=random_name(rng),
+            owner_id=owner_id,
+            folder_id=rng.choice(folders) if rng.random() < 0.7 else None,
+            mime_type="application/pdf",
+            size=rng.randint(1, 50_000_000),
+            storage_path=f"cas/{uuid.uuid4().hex[:2]}/{uuid.uuid4().hex}{uuid.uuid4().hex}",
+            is_starred=rng.random() < 0.1,
+            is_deleted=False,
+            created_at=created,
+            updated_at=created,
+        ))
+    return rows
+
+
+def signed_url(f) -> str:
+    # Shaped like a storage signed URL, the longest field in a listing
+    return f"https://project.supabase.co/storage/v1/object/sign/files/{f.storage_path}?token={uuid.uuid4().hex * 4}"
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def bench_page(rows: list, repeat: int) -> dict:
+    from fastapi.encoders import jsonable_encoder
+
+    from app.core import compression, responses
+    from app.routes.files import file_to_dict
+
+    urls = {f.storage_path: signed_url(f) for f in rows}
+
+    def stdlib() -> bytes:
+        items = [legacy_file_to_dict(f, urls[f.storage_path]) for f in rows]
+        return json.dumps(
+            jsonable_encoder(items), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+
+    def fast() -> bytes:
+        return responses.dumps([file_to_dict(f, urls[f.storage_path]) for f in rows])
+
+    body = fast()
+    assert json.loads(body) == json.loads(stdlib()), "orjson output differs from the stdlib path"
+
+    result = {
+        "rows": len(rows),
+        "bytes": len(body),
+        "stdlib_ms": timed(stdlib, repeat),
+        "orjson_ms": timed(fast, repeat),
+    }
+    result["speedup"] = round(result["stdlib_ms"] / result["orjson_ms"], 1) if result["orjson_ms"] else None
+
+    encodings = {}
+    for name, encoder in compression._ENCODERS.items():
+        def compress(encoder=encoder) -> bytes:
+            e = encoder()
+            return e.compress(body) + e.finish()
+
+        size = len(compress())
+        encodings[name] = {"bytes": size, "ratio": round(len(body) / size, 1), "ms": timed(compress, repeat)}
+    result["compression"] = encodings
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", default="100,1000", help="comma-separated page sizes")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    configure()
+    rng = random.Random(args.seed)
+    pages = [int(p) for p in args.pages.split(",")]
+    rows = make_rows(max(pages), rng)
+
+    result = {
+        "python": sys.version.split()[0],
+        "repeat": args.repeat,
+        "pages": [bench_page(rows[:n], args.repeat) for n in pages],
+    }
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cold-start benchmark.
+
+Each run starts a fresh interpreter, so nothing is cached between runs. It
+times three phases: importing app.main (module imports plus create_app()),
+the lifespan startup, and the first request (GET /). It reports the median of
+each phase as JSON. The database is a SQLite file migrated once before the
+runs, since production applies migrations out of band, and the storage
+backend is local. Nothing in the measured path should open a network
+connection.
+
+The process exits non-zero when the median total goes over --budget seconds,
+so CI can hold the line:
+
+    cd backend
+    python -m benchmarks.startup_bench --runs 5 --budget 1.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PHASES = ["import", "startup", "first_request", "total"]
+
+# Runs in the child interpreter; prints one JSON line of phase timings
+_CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import httpx
+from app.main import app
+imported = time.perf_counter()
+
+async def run():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            res = await client.get("/")
+            res.raise_for_status()
+        return ready, time.perf_counter()
+
+ready, answered = asyncio.run(run())
+print(json.dumps({
+    "import": imported - started,
+    "startup": ready - imported,
+    "first_request": answered - ready,
+    "total": answered - started,
+}))
+"""
+
+
+def environment(workdir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "SECRET_KEY": os.environ.get("SECRET_KEY") or "startup-bench",
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_ROOT": os.path.join(workdir, "storage"),
+        "DB_ASYNC": "false",
+        "AUTO_MIGRATE": "false",
+    })
+    return env
+
+
+def run_once(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.5, help="max median total seconds")
+    parser.add_argument("--output", help="also write the JSON result to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="startup-bench-")
+    env = environment(workdir)
+    subprocess.run([sys.executable, "-m", "app.migrations"], env=env, capture_output=True, check=True)
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    medians = {phase: round(statistics.median(r[phase] for r in runs) * 1000, 1) for phase in PHASES}
+    result = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "budget_ms": args.budget * 1000,
+        "median_ms": medians,
+        "max_total_ms": round(max(r["total"] for r in runs) * 1000, 1),
+    }
+
+    output = json.dumps(result, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(output + "\n")
+    if medians["total"] > args.budget * 1000:
+        print(f"Cold start {medians['total']} ms is over the {args.budget * 1000:.0f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
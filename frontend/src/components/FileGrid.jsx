@@ -48,7 +48,16 @@ export default function FileGrid({ files, mode = "drive", onRefresh }) {
               className="h-32 flex items-center justify-center
                          cursor-pointer text-4xl"
             >
-              📄
+              {file.thumbnail_url ? (
+                <img
+                  src={file.thumbnail_url}
+                  alt={file.name}
+                  loading="lazy"
+                  className="h-full w-full object-cover rounded"
+                />
+              ) : (
+                "📄"
+              )}
             </div>
 
             <p className="mt-2 font-medium truncate">{file.name}</p>
@@ -12,7 +12,9 @@ export default function FilePreview({ file, onClose }) {
 
     const fetchFile = async () => {
       try {
-        const response = await api.get(`/files/${fileId}`, {
+        // Streamed through the API; the browser revalidates with the ETag and
+        // reuses its cached copy on a 304
+        const response = await api.get(`/files/${fileId}/download?inline=true`, {
           responseType: 'blob',
         });
         const url = URL.createObjectURL(response.data);
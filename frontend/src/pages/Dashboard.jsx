@@ -1,4 +1,4 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import Sidebar from "../components/Sidebar";
 import TopBar from "../components/TopBar";
 import UploadButton from "../components/UploadButton";
@@ -10,12 +10,17 @@ export default function Dashboard() {
   const [files, setFiles] = useState([]);
   const [loading, setLoading] = useState(true);
   const [searchQuery, setSearchQuery] = useState("");
+  const [nextCursor, setNextCursor] = useState(null);
+  const searchTimer = useRef(null);
 
-  const loadFiles = async (query = "") => {
+  const loadFiles = async (query = "", cursor = null) => {
     try {
-      const url = query ? `/files/search?q=${query}` : "/files";
-      const res = await api.get(url);
-      setFiles(res.data);
+      const url = query ? "/files/search" : "/files";
+      const params = query ? { q: query } : {};
+      if (cursor) params.cursor = cursor;
+      const res = await api.get(url, { params });
+      setFiles((prev) => (cursor ? [...prev, ...res.data] : res.data));
+      setNextCursor(res.headers["x-next-cursor"] || null);
     } catch {
       alert("Failed to load files");
     } finally {
@@ -30,7 +35,9 @@ export default function Dashboard() {
   const handleSearch = (e) => {
     const query = e.target.value;
     setSearchQuery(query);
-    loadFiles(query);
+    // Wait for a pause in typing instead of searching on every keystroke
+    clearTimeout(searchTimer.current);
+    searchTimer.current = setTimeout(() => loadFiles(query.trim()), 250);
   };
 
   return (
@@ -77,6 +84,17 @@ export default function Dashboard() {
           ) : (
             <FileGrid files={files} onRefresh={() => loadFiles(searchQuery)} />
           )}
+
+          {nextCursor && (
+            <div className="text-center">
+              <button
+                onClick={() => loadFiles(searchQuery, nextCursor)}
+                className="px-4 py-2 bg-gray-800 text-white rounded"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -1,7 +1,25 @@
+import { useEffect, useState } from "react";
 import Sidebar from "../components/Sidebar";
 import TopBar from "../components/TopBar";
+import FileGrid from "../components/FileGrid";
+import api from "../services/api";
 
 export default function Shared() {
+  const [files, setFiles] = useState([]);
+  const [folders, setFolders] = useState([]);
+
+  const loadShared = async () => {
+    const res = await api.get("/shares/with-me");
+    setFiles(res.data.files);
+    setFolders(res.data.folders);
+  };
+
+  useEffect(() => {
+    loadShared();
+  }, []);
+
+  const empty = files.length === 0 && folders.length === 0;
+
   return (
     <div className="flex bg-gray-900 min-h-screen">
       <Sidebar />
@@ -14,14 +32,31 @@ export default function Shared() {
             Shared with me
           </h1>
 
-          <div className="bg-gray-800 rounded-xl shadow p-10 text-center text-gray-400">
-            <p className="text-lg">
-              No files have been shared with you yet.
-            </p>
-            <p className="text-sm mt-2">
-              When someone shares a file with you, it will appear here.
-            </p>
-          </div>
+          {empty ? (
+            <div className="bg-gray-800 rounded-xl shadow p-10 text-center text-gray-400">
+              <p className="text-lg">
+                No files have been shared with you yet.
+              </p>
+              <p className="text-sm mt-2">
+                When someone shares a file with you, it will appear here.
+              </p>
+            </div>
+          ) : (
+            <>
+              {folders.length > 0 && (
+                <ul className="mb-6 text-gray-300">
+                  {folders.map((folder) => (
+                    <li key={folder.id}>
+                      📁 {folder.name}{" "}
+                      <span className="text-xs text-gray-500">({folder.role})</span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+
+              <FileGrid files={files} mode="shared" onRefresh={loadShared} />
+            </>
+          )}
         </div>
       </div>
     </div>
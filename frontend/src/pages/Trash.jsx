@@ -8,10 +8,14 @@ import { Navigate } from "react-router-dom";
 
 export default function Trash() {
   const [files, setFiles] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  const loadTrash = async () => {
-    const res = await api.get("/files/trash");
-    setFiles(res.data);
+  const loadTrash = async (cursor = null) => {
+    const res = await api.get("/files/trash", {
+      params: cursor ? { cursor } : {},
+    });
+    setFiles((prev) => (cursor ? [...prev, ...res.data] : res.data));
+    setNextCursor(res.headers["x-next-cursor"] || null);
   };
 
   useEffect(() => {
@@ -41,8 +45,19 @@ export default function Trash() {
           <FileGrid
             files={files}
             mode="trash"
-            onRefresh={loadTrash}
+            onRefresh={() => loadTrash()}
           />
+
+          {nextCursor && (
+            <div className="text-center mt-6">
+              <button
+                onClick={() => loadTrash(nextCursor)}
+                className="px-4 py-2 bg-gray-800 text-white rounded"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>
@@ -19,4 +19,11 @@ export const uploadFile = (file) => {
   formData.append("file", file); // server expects field name "file"
 
   return api.post("/files/upload", formData);
-};
\ No newline at end of file
+};
+
+/**
+ * Apply one action ("trash", "restore", "star", "unstar", "move", "delete")
+ * to many files in a single request. Resolves to per-file results.
+ */
+export const bulkFiles = (action, fileIds, folderId = null) =>
+  api.post("/files/bulk", { action, file_ids: fileIds, folder_id: folderId });